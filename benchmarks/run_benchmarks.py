@@ -0,0 +1,451 @@
+"""
+Benchmarks for every stage of the RAG pipeline, on synthetic deterministic data.
+
+Every run writes its timings and environment to benchmarks/results/ and
+can be compared with an earlier run; a benchmark whose best time grew by
+more than the threshold is reported as a regression and makes the script
+exit with status 1.
+
+Usage:
+    python benchmarks/run_benchmarks.py --profile quick --compare latest
+"""
+
+import os
+import sys
+import json
+import time
+import glob
+import asyncio
+import logging
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+import numpy as np
+from datetime import datetime
+from typing import List, Dict, Any, Optional, Callable, Iterator, Tuple
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if ROOT_DIR not in sys.path:
+    sys.path.insert(0, ROOT_DIR)
+
+from src.data_extraction import DataExtractor  # noqa: E402
+from src.embedding_creation import EmbeddingCreator  # noqa: E402
+from src.document_retrieval import DocumentRetriever  # noqa: E402
+from src.text_processing import TextProcessor  # noqa: E402
+from src.tokenizer import token_cache  # noqa: E402
+from src.utils import format_time  # noqa: E402
+from benchmarks.synthetic import (  # noqa: E402
+    make_vocabulary,
+    make_word_vector_table,
+    make_chunks,
+    make_embeddings,
+    make_wikipedia_html,
+)
+
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+# Relative slowdown of the best time above which a benchmark is a regression
+DEFAULT_THRESHOLD = 0.25
+
+# A single timed repeat loops the benchmark until it takes at least this long
+MIN_REPEAT_TIME = 0.05
+
+VOCABULARY_SIZE = 20000
+VECTOR_SIZE = 100
+
+# Sizes of every suite per profile; "full" has the sizes of the backlog
+# (100k chunks, 1M vectors) and takes several minutes and a few GB of memory
+PROFILES: Dict[str, Dict[str, Any]] = {
+    "quick": {
+        "repeat": 5,
+        "clean_data_sections": [20, 200],
+        "embedding_chunks": [1, 100, 10_000],
+        "retrieval_vectors": [1_000, 100_000],
+        "top_k": [1, 10, 100],
+        "processing_chunks": [10, 1_000],
+    },
+    "full": {
+        "repeat": 10,
+        "clean_data_sections": [20, 200, 2_000],
+        "embedding_chunks": [1, 100, 100_000],
+        "retrieval_vectors": [1_000, 10_000, 100_000, 1_000_000],
+        "top_k": [1, 10, 100],
+        "processing_chunks": [10, 1_000, 10_000],
+    },
+}
+
+# A case is a benchmark name, its parameters, and a setup function returning
+# the callable to time plus an optional teardown
+Case = Tuple[str, Dict[str, Any], Callable[[], Tuple[Callable[[], Any], Callable]]]
+
+
+def measure(
+    func: Callable[[], Any], repeat: int = 5, min_time: float = MIN_REPEAT_TIME
+) -> Dict[str, Any]:
+    """
+    Time a function, after one warmup call.
+
+    Fast functions are called several times per repeat so that timer
+    resolution does not dominate; all times are per call.
+
+    Args:
+        func (Callable[[], Any]): Function to time.
+        repeat (int): Number of timed repeats.
+        min_time (float): Minimum duration of one repeat, in seconds.
+
+    Returns:
+        Dict[str, Any]: Best, median and mean seconds per call, and the repeat and call counts.
+    """
+    start = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - start
+    number = max(1, int(min_time / elapsed)) if elapsed > 0 else 1000
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+    return {
+        "min": min(times),
+        "median": statistics.median(times),
+        "mean": statistics.fmean(times),
+        "repeat": repeat,
+        "number": number,
+    }
+
+
+def _no_teardown() -> None:
+    return None
+
+
+def clean_data_cases(profile: Dict[str, Any]) -> Iterator[Case]:
+    """
+    DataExtractor.clean_data on Wikipedia-like pages of increasing size.
+    """
+    for sections in profile["clean_data_sections"]:
+
+        def setup(sections=sections):
+            extractor = DataExtractor(url="https://en.wikipedia.org/wiki/Synthetic")
+            extractor.raw_content = make_wikipedia_html(sections)
+            return extractor.clean_data, _no_teardown
+
+        yield f"clean_data[sections={sections}]", {"sections": sections}, setup
+
+
+def embedding_cases(profile: Dict[str, Any]) -> Iterator[Case]:
+    """
+    EmbeddingCreator.create_embeddings with a synthetic word vector table, cache disabled.
+    """
+    vocabulary = make_vocabulary(VOCABULARY_SIZE)
+    for count in profile["embedding_chunks"]:
+
+        def setup(count=count):
+            cache_dir = tempfile.TemporaryDirectory()
+            creator = EmbeddingCreator(cache_dir=cache_dir.name, use_cache=False)
+            creator.model = make_word_vector_table(vocabulary, VECTOR_SIZE)
+            creator.vector_size = VECTOR_SIZE
+            chunks = make_chunks(count, vocabulary)
+
+            def run():
+                # Measure tokenization too, not token cache lookups
+                token_cache.clear()
+                return creator.create_embeddings(chunks)
+
+            def teardown():
+                creator.close()
+                cache_dir.cleanup()
+
+            return run, teardown
+
+        yield f"create_embeddings[chunks={count}]", {"chunks": count}, setup
+
+
+def retrieval_cases(profile: Dict[str, Any]) -> Iterator[Case]:
+    """
+    DocumentRetriever.retrieve_documents over indexes of increasing size, for each top_k.
+    """
+    for count in profile["retrieval_vectors"]:
+        for top_k in profile["top_k"]:
+
+            def setup(count=count, top_k=top_k):
+                embeddings = make_embeddings(count, VECTOR_SIZE)
+                chunks = [{"id": chunk_id, "text": ""} for chunk_id in embeddings]
+                retriever = DocumentRetriever(embeddings, chunks)
+                query = make_embeddings(1, VECTOR_SIZE, seed=1)["para-0"]
+                return (
+                    lambda: retriever.retrieve_documents(query, top_k),
+                    retriever.close,
+                )
+
+            yield (
+                f"retrieve_documents[vectors={count},top_k={top_k}]",
+                {"vectors": count, "top_k": top_k},
+                setup,
+            )
+
+
+def processing_cases(profile: Dict[str, Any]) -> Iterator[Case]:
+    """
+    TextProcessor.process_chunks on retrieved chunks, inline and offloaded to workers.
+    """
+    vocabulary = make_vocabulary(VOCABULARY_SIZE)
+    for count in profile["processing_chunks"]:
+
+        def setup(count=count):
+            processor = TextProcessor()
+            chunks = make_chunks(count, vocabulary)
+
+            def run():
+                token_cache.clear()
+                return asyncio.run(processor.process_chunks(chunks))
+
+            return run, processor.close
+
+        yield f"process_chunks[chunks={count}]", {"chunks": count}, setup
+
+
+SUITES: Dict[str, Callable[[Dict[str, Any]], Iterator[Case]]] = {
+    "clean_data": clean_data_cases,
+    "create_embeddings": embedding_cases,
+    "retrieve_documents": retrieval_cases,
+    "process_chunks": processing_cases,
+}
+
+
+def run_benchmarks(
+    profile_name: str = "quick",
+    name_filter: Optional[str] = None,
+    repeat: Optional[int] = None,
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Run every benchmark of a profile.
+
+    Args:
+        profile_name (str): Name of the profile in PROFILES.
+        name_filter (Optional[str]): Only run benchmarks whose name contains this string.
+        repeat (Optional[int]): Number of timed repeats, overriding the profile's.
+
+    Returns:
+        Dict[str, Dict[str, Any]]: Timings and parameters by benchmark name.
+    """
+    logger = logging.getLogger(__name__)
+    profile = PROFILES[profile_name]
+    results = {}
+    for suite in SUITES.values():
+        for name, params, setup in suite(profile):
+            if name_filter and name_filter not in name:
+                continue
+            func, teardown = setup()
+            try:
+                timing = measure(func, repeat or profile["repeat"])
+            finally:
+                teardown()
+            results[name] = {"params": params, **timing}
+            logger.info(
+                f"{name}: min {format_time(timing['min'])}, "
+                f"median {format_time(timing['median'])}"
+            )
+    return results
+
+
+def environment() -> Dict[str, Any]:
+    """
+    Describe the machine and code a run was made on, to tell apart comparable runs.
+    """
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "commit": commit,
+    }
+
+
+def compare_results(
+    baseline: Dict[str, Dict[str, Any]],
+    current: Dict[str, Dict[str, Any]],
+    threshold: float = DEFAULT_THRESHOLD,
+) -> List[Dict[str, Any]]:
+    """
+    Compare the best times of two runs, benchmark by benchmark.
+
+    The best time is the least noisy estimate of the cost of the code, so
+    it is what is compared; benchmarks missing from either run are skipped.
+
+    Args:
+        baseline (Dict[str, Dict[str, Any]]): Results of the earlier run.
+        current (Dict[str, Dict[str, Any]]): Results of the new run.
+        threshold (float): Relative change above which a benchmark is flagged.
+
+    Returns:
+        List[Dict[str, Any]]: Name, both times, ratio and status ("regression",
+            "improvement" or "unchanged") of every benchmark in both runs.
+    """
+    comparison = []
+    for name, result in current.items():
+        if name not in baseline:
+            continue
+        before, after = baseline[name]["min"], result["min"]
+        ratio = after / before if before > 0 else float("inf")
+        if ratio > 1 + threshold:
+            status = "regression"
+        elif ratio < 1 / (1 + threshold):
+            status = "improvement"
+        else:
+            status = "unchanged"
+        comparison.append(
+            {
+                "name": name,
+                "baseline": before,
+                "current": after,
+                "ratio": ratio,
+                "status": status,
+            }
+        )
+    return comparison
+
+
+def save_results(results: Dict[str, Any], path: str) -> None:
+    """
+    Write a run to a JSON file.
+
+    Args:
+        results (Dict[str, Any]): Environment and results of the run.
+        path (str): Destination file.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2)
+
+
+def load_results(path: str, results_dir: str = RESULTS_DIR) -> Dict[str, Any]:
+    """
+    Read a run saved with save_results().
+
+    Args:
+        path (str): File to read, or "latest" for the newest run in results_dir.
+        results_dir (str): Directory searched for "latest".
+
+    Returns:
+        Dict[str, Any]: Environment and results of the run.
+    """
+    if path == "latest":
+        runs = sorted(glob.glob(os.path.join(results_dir, "*.json")))
+        if not runs:
+            raise FileNotFoundError(f"No saved benchmark runs in {results_dir}")
+        path = runs[-1]
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main() -> int:
+    """
+    Run the benchmarks, save them and compare them with an earlier run.
+
+    Returns:
+        int: Exit status, 1 if a regression was found.
+    """
+    parser = argparse.ArgumentParser(description="Benchmarks of the RAG pipeline")
+    parser.add_argument(
+        "--profile",
+        choices=sorted(PROFILES),
+        default="quick",
+        help="Benchmark sizes; 'full' needs several minutes and a few GB of memory",
+    )
+    parser.add_argument(
+        "--filter",
+        type=str,
+        default=None,
+        help="Only run benchmarks whose name contains this string",
+    )
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=None,
+        help="Number of timed repeats per benchmark (defaults to the profile's)",
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        default=None,
+        help="File to save the results to (defaults to a timestamped file in benchmarks/results)",
+    )
+    parser.add_argument(
+        "--no_save", action="store_true", help="Do not save the results"
+    )
+    parser.add_argument(
+        "--compare",
+        type=str,
+        default=None,
+        help="Saved run to compare with, or 'latest' for the newest one",
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=DEFAULT_THRESHOLD,
+        help="Relative slowdown of the best time flagged as a regression",
+    )
+    parser.add_argument(
+        "--log_level",
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level of the benchmark script",
+    )
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING, format="%(message)s")
+    logger = logging.getLogger(__name__)
+    logger.setLevel(args.log_level)
+
+    # Load the baseline first, so "latest" is not the run about to be saved
+    baseline = load_results(args.compare) if args.compare else None
+
+    run = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "profile": args.profile,
+        "environment": environment(),
+        "results": run_benchmarks(args.profile, args.filter, args.repeat),
+    }
+
+    if not args.no_save:
+        output = args.output or os.path.join(
+            RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+        )
+        save_results(run, output)
+        logger.info(f"Results saved to {output}")
+
+    if baseline is None:
+        return 0
+
+    if baseline.get("environment", {}).get("cpu_count") != os.cpu_count():
+        logger.warning("Baseline was run on a different machine; timings may differ")
+    comparison = compare_results(baseline["results"], run["results"], args.threshold)
+    for entry in comparison:
+        logger.info(
+            f"{entry['status']:>11}  {entry['ratio']:6.2f}x  {entry['name']} "
+            f"({format_time(entry['baseline'])} -> {format_time(entry['current'])})"
+        )
+    regressions = [entry for entry in comparison if entry["status"] == "regression"]
+    if regressions:
+        logger.warning(f"{len(regressions)} benchmark(s) regressed")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
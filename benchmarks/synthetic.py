@@ -0,0 +1,196 @@
+import numpy as np
+from typing import List, Dict
+
+from src.word_vectors import WordVectorTable
+
+# Syllables combined into pseudo-words of 2-5 syllables; every generated
+# word is lowercase, alphabetic and 4-15 characters long, so the tokenizer
+# keeps it unchanged
+SYLLABLES = [
+    "ka",
+    "lo",
+    "mi",
+    "ne",
+    "ru",
+    "sa",
+    "ti",
+    "vo",
+    "zen",
+    "tor",
+    "mar",
+    "pel",
+    "dra",
+    "qui",
+    "bex",
+    "hul",
+]
+
+MIN_SYLLABLES, MAX_SYLLABLES = 2, 5
+
+# Largest vocabulary generated, well below the ~1.1M syllable combinations,
+# so drawing distinct words stays fast; GloVe has 400k words
+MAX_VOCABULARY_SIZE = 500_000
+
+# Zipf exponent of the word distribution, close to that of natural language
+ZIPF_EXPONENT = 1.1
+
+
+def make_vocabulary(size: int, seed: int = 0) -> List[str]:
+    """
+    Generate a list of distinct pseudo-words.
+
+    Args:
+        size (int): Number of words.
+        seed (int): Random seed.
+
+    Returns:
+        List[str]: The words, in rank order (most frequent first).
+    """
+    if size > MAX_VOCABULARY_SIZE:
+        raise ValueError(f"Vocabulary size is limited to {MAX_VOCABULARY_SIZE}")
+    rng = np.random.default_rng(seed)
+    words, seen = [], set()
+    syllables = np.asarray(SYLLABLES + [""], dtype=object)
+    while len(words) < size:
+        # Draw candidates in bulk; unused trailing syllables are blanked out
+        batch = 2 * (size - len(words)) + 16
+        parts = rng.integers(0, len(SYLLABLES), (batch, MAX_SYLLABLES))
+        lengths = rng.integers(MIN_SYLLABLES, MAX_SYLLABLES + 1, batch)
+        parts[np.arange(MAX_SYLLABLES) >= lengths[:, None]] = len(SYLLABLES)
+        for word in syllables[parts].sum(axis=1):
+            if word not in seen:
+                seen.add(word)
+                words.append(word)
+                if len(words) == size:
+                    break
+    return words
+
+
+def make_word_vector_table(
+    vocabulary: List[str], vector_size: int = 100, seed: int = 0
+) -> WordVectorTable:
+    """
+    Build a word vector table with random vectors, so no model download is needed.
+
+    Args:
+        vocabulary (List[str]): Words of the table.
+        vector_size (int): Dimensionality of the vectors.
+        seed (int): Random seed.
+
+    Returns:
+        WordVectorTable: The table.
+    """
+    rng = np.random.default_rng(seed)
+    vectors = rng.standard_normal((len(vocabulary), vector_size)).astype(np.float32)
+    return WordVectorTable(list(vocabulary), vectors)
+
+
+def make_texts(
+    count: int, vocabulary: List[str], words_per_text: int = 80, seed: int = 0
+) -> List[str]:
+    """
+    Generate texts whose words follow a Zipf distribution over the vocabulary.
+
+    Args:
+        count (int): Number of texts.
+        vocabulary (List[str]): Words to draw from, most frequent first.
+        words_per_text (int): Number of words per text.
+        seed (int): Random seed.
+
+    Returns:
+        List[str]: The texts.
+    """
+    rng = np.random.default_rng(seed)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1) ** ZIPF_EXPONENT
+    ranks = rng.choice(
+        len(vocabulary), size=(count, words_per_text), p=weights / weights.sum()
+    )
+    words = np.asarray(vocabulary, dtype=object)
+    return [" ".join(row) + "." for row in words[ranks]]
+
+
+def make_chunks(
+    count: int, vocabulary: List[str], words_per_text: int = 80, seed: int = 0
+) -> List[Dict[str, str]]:
+    """
+    Generate chunks in the format produced by DataExtractor.
+
+    Args:
+        count (int): Number of chunks.
+        vocabulary (List[str]): Words to draw from, most frequent first.
+        words_per_text (int): Number of words per chunk.
+        seed (int): Random seed.
+
+    Returns:
+        List[Dict[str, str]]: Dictionaries containing chunk ID and text.
+    """
+    texts = make_texts(count, vocabulary, words_per_text, seed)
+    return [{"id": f"para-{i}", "text": text} for i, text in enumerate(texts)]
+
+
+def make_embeddings(
+    count: int, vector_size: int = 100, seed: int = 0
+) -> Dict[str, np.ndarray]:
+    """
+    Generate random embeddings keyed like make_chunks().
+
+    Args:
+        count (int): Number of embeddings.
+        vector_size (int): Dimensionality of the embeddings.
+        seed (int): Random seed.
+
+    Returns:
+        Dict[str, np.ndarray]: Dictionary mapping chunk IDs to embedding vectors.
+    """
+    rng = np.random.default_rng(seed)
+    matrix = rng.standard_normal((count, vector_size)).astype(np.float32)
+    return {f"para-{i}": row for i, row in enumerate(matrix)}
+
+
+def make_wikipedia_html(
+    num_sections: int,
+    paragraphs_per_section: int = 5,
+    vocabulary_size: int = 2000,
+    seed: int = 0,
+) -> str:
+    """
+    Generate an HTML page with the layout of a Wikipedia article.
+
+    The page has a table of contents, h2 sections of paragraphs with
+    citation markers and links, and the trailing sections that cleaning
+    skips (References, External links).
+
+    Args:
+        num_sections (int): Number of content sections.
+        paragraphs_per_section (int): Paragraphs per section.
+        vocabulary_size (int): Number of distinct words.
+        seed (int): Random seed.
+
+    Returns:
+        str: The HTML document.
+    """
+    vocabulary = make_vocabulary(vocabulary_size, seed)
+    texts = iter(
+        make_texts(num_sections * paragraphs_per_section, vocabulary, 60, seed)
+    )
+    toc = "".join(f"<li>Section {i}</li>" for i in range(num_sections))
+    parts = [
+        '<html><body><div id="mw-content-text">',
+        f'<div class="toc"><h2>Contents</h2><ul>{toc}</ul></div>',
+    ]
+    for i in range(num_sections):
+        parts.append(f'<h2><span class="mw-headline">Section {i}</span></h2>')
+        for j in range(paragraphs_per_section):
+            words = next(texts).split(" ")
+            words[3] = f'<a href="/wiki/{words[3]}">{words[3]}</a>'
+            parts.append(
+                f"<p>{' '.join(words)}<sup>[{i * paragraphs_per_section + j}]</sup></p>"
+            )
+    parts.append(
+        "<h2>References</h2><p>Reference list that cleaning skips entirely.</p>"
+    )
+    parts.append(
+        "<h2>External links</h2><p>Links that cleaning skips entirely too.</p>"
+    )
+    parts.append("</div></body></html>")
+    return "\n".join(parts)
@@ -0,0 +1,620 @@
+import os
+import copy
+import json
+import numpy as np
+import logging
+from typing import List, Dict, Tuple, Any, Callable, Iterable, Optional
+
+try:
+    from .vector_index import top_k_indices
+    from .tokenizer import tokenize, token_cache
+except ImportError:
+    from vector_index import top_k_indices
+    from tokenizer import tokenize, token_cache
+
+# Appends beyond this many posting segments trigger a merge into one
+MAX_SEGMENTS = 8
+
+# Term frequencies are stored as uint16 and clipped to this value
+MAX_TERM_FREQ = np.iinfo(np.uint16).max
+
+
+def term_stats(
+    terms: np.ndarray,
+    tfs: np.ndarray,
+    lengths: np.ndarray,
+    vocab_size: int,
+    base: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Compute per-term statistics of postings, optionally on top of existing ones.
+
+    Args:
+        terms (np.ndarray): Term ID of each posting.
+        tfs (np.ndarray): Term frequency of each posting.
+        lengths (np.ndarray): Length of the document of each posting.
+        vocab_size (int): Number of terms in the vocabulary.
+        base (Optional[Tuple]): Statistics of earlier postings, left unmodified.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray, np.ndarray]: Document frequency, maximum
+            term frequency and minimum document length of each term.
+    """
+    df = np.zeros(vocab_size, dtype=np.int64)
+    max_tf = np.zeros(vocab_size, dtype=np.int32)
+    min_length = np.full(vocab_size, np.iinfo(np.int32).max, dtype=np.int32)
+    if base is not None:
+        size = len(base[0])
+        df[:size], max_tf[:size], min_length[:size] = base
+    df += np.bincount(terms, minlength=vocab_size)
+    np.maximum.at(max_tf, terms, tfs.astype(np.int32))
+    np.minimum.at(min_length, terms, lengths.astype(np.int32))
+    return df, max_tf, min_length
+
+
+class PostingSegment:
+    """
+    Immutable posting lists for a batch of documents, in CSR layout.
+
+    The postings of term t are docs[offsets[t]:offsets[t + 1]] (ascending
+    row numbers) with their term frequencies in tfs, so a posting list is
+    a pair of array slices rather than a Python list.
+    """
+
+    def __init__(self, offsets: np.ndarray, docs: np.ndarray, tfs: np.ndarray):
+        """
+        Initialize the segment from its arrays.
+
+        Args:
+            offsets (np.ndarray): Start of each term's postings, plus the total count.
+            docs (np.ndarray): int32 row numbers, ascending within each term.
+            tfs (np.ndarray): uint16 term frequency of each posting.
+        """
+        self.offsets = offsets
+        self.docs = docs
+        self.tfs = tfs
+
+    @classmethod
+    def from_postings(
+        cls, terms: np.ndarray, docs: np.ndarray, tfs: np.ndarray, vocab_size: int
+    ) -> "PostingSegment":
+        """
+        Build a segment from unordered (term, row, frequency) postings.
+
+        Args:
+            terms (np.ndarray): Term ID of each posting.
+            docs (np.ndarray): Row number of each posting.
+            tfs (np.ndarray): Term frequency of each posting.
+            vocab_size (int): Number of terms in the vocabulary.
+
+        Returns:
+            PostingSegment: The segment.
+        """
+        order = np.lexsort((docs, terms))
+        offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(terms, minlength=vocab_size)))
+        )
+        return cls(
+            offsets,
+            docs[order].astype(np.int32),
+            np.minimum(tfs[order], MAX_TERM_FREQ).astype(np.uint16),
+        )
+
+    def postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return the rows and term frequencies of one term.
+
+        Args:
+            term (int): Term ID.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Rows (ascending) and their term frequencies.
+        """
+        if term + 1 >= len(self.offsets):
+            return self.docs[:0], self.tfs[:0]
+        start, end = self.offsets[term], self.offsets[term + 1]
+        return self.docs[start:end], self.tfs[start:end]
+
+    def triples(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Expand the segment back into (term, row, frequency) postings.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Term IDs, rows and term frequencies.
+        """
+        terms = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+        return terms, self.docs, self.tfs
+
+
+class BM25Index:
+    """
+    Sparse inverted index with Okapi BM25 scoring.
+
+    Documents are tokenized with the same tokenizer used for the
+    embeddings, reusing their cached tokens, and their postings are kept in compact CSR
+    segments. Queries are evaluated term-at-a-time in decreasing order of
+    each term's maximum possible contribution (MaxScore): once the
+    remaining terms together cannot lift an unseen document into the
+    top-k, they are only looked up for the current candidates with a
+    binary search instead of scanning their (typically long) posting
+    lists.
+
+    Like VectorIndex, new documents are appended as a new segment and
+    removed documents are tombstoned; the collection statistics keep
+    counting removed documents until the index is compacted.
+    """
+
+    INDEX_FILE = "bm25.json"
+    IDS_FILE = "ids.txt"
+    VOCABULARY_FILE = "vocabulary.txt"
+
+    def __init__(
+        self,
+        chunks: List[Dict[str, str]],
+        k1: float = 1.2,
+        b: float = 0.75,
+        tokenizer: Optional[Callable[[str], List[str]]] = None,
+    ):
+        """
+        Build the index from text chunks.
+
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+            k1 (float): Term frequency saturation.
+            b (float): Strength of document length normalization.
+            tokenizer (Optional[Callable[[str], List[str]]]): Function splitting a text into terms
+                (defaults to the shared tokenizer, whose
+                tokens are reused from the token cache).
+        """
+        self.logger = logging.getLogger(__name__)
+        self.k1 = k1
+        self.b = b
+        self.tokenizer = tokenizer
+        self.vocabulary: Dict[str, int] = {}
+        self.ids: List[str] = []
+        self.doc_lengths = np.empty(0, dtype=np.int32)
+        self.total_length = 0
+        self.df = np.empty(0, dtype=np.int64)
+        self.max_tf = np.empty(0, dtype=np.int32)
+        self.min_length = np.empty(0, dtype=np.int32)
+        self.segments: List[PostingSegment] = []
+        self._reset_tombstones()
+        self.add(chunks)
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.num_deleted
+
+    def _reset_tombstones(self) -> None:
+        """
+        Start with no removed rows and no ID lookup table.
+        """
+        self.deleted: Optional[np.ndarray] = None
+        self.num_deleted = 0
+        self._rows: Optional[Dict[str, int]] = None
+        self._norms: Optional[np.ndarray] = None
+
+    def _row_map(self) -> Dict[str, int]:
+        """
+        Map each live chunk ID to its row, building the table on first use.
+        """
+        if self._rows is None:
+            self._rows = {
+                chunk_id: i
+                for i, chunk_id in enumerate(self.ids)
+                if self.deleted is None or not self.deleted[i]
+            }
+        return self._rows
+
+    def tokenize(self, text: str) -> List[str]:
+        """
+        Split a text into index terms.
+
+        Args:
+            text (str): Text to tokenize.
+
+        Returns:
+            List[str]: The terms, in order.
+        """
+        if self.tokenizer is None:
+            return tokenize(text)
+        return self.tokenizer(text)
+
+    def _chunk_tokens(self, chunk: Dict[str, str]) -> List[str]:
+        """
+        Split a chunk into index terms, reusing cached tokens with the default tokenizer.
+
+        Args:
+            chunk (Dict[str, str]): A dictionary containing chunk ID and text.
+
+        Returns:
+            List[str]: The terms, in order.
+        """
+        if self.tokenizer is None:
+            return token_cache.tokens(chunk["id"], chunk["text"])
+        return self.tokenizer(chunk["text"])
+
+    def add(self, chunks: List[Dict[str, str]]) -> None:
+        """
+        Index chunks, replacing chunks whose ID is already indexed.
+
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+        """
+        if not chunks:
+            return
+        rows = self._row_map()
+        self.remove([chunk["id"] for chunk in chunks if chunk["id"] in rows])
+
+        # Number every (row, term) pair of the batch, then count duplicates
+        start = len(self.ids)
+        term_ids, lengths = [], []
+        for chunk in chunks:
+            tokens = self._chunk_tokens(chunk)
+            term_ids.extend(
+                self.vocabulary.setdefault(token, len(self.vocabulary))
+                for token in tokens
+            )
+            lengths.append(len(tokens))
+        vocab_size = len(self.vocabulary)
+        lengths = np.asarray(lengths, dtype=np.int32)
+        keys = np.repeat(np.arange(len(chunks), dtype=np.int64), lengths) * max(
+            vocab_size, 1
+        ) + np.asarray(term_ids, dtype=np.int64)
+        keys, tfs = np.unique(keys, return_counts=True)
+        docs = start + keys // max(vocab_size, 1)
+        terms = keys % max(vocab_size, 1)
+        segment = PostingSegment.from_postings(terms, docs, tfs, vocab_size)
+
+        # Publish new statistics arrays rather than updating them in place
+        doc_lengths = np.concatenate([self.doc_lengths, lengths])
+        df, max_tf, min_length = term_stats(
+            terms,
+            tfs,
+            doc_lengths[docs],
+            vocab_size,
+            (self.df, self.max_tf, self.min_length),
+        )
+
+        self.ids.extend(chunk["id"] for chunk in chunks)
+        if self.deleted is not None:
+            self.deleted = np.concatenate(
+                [self.deleted, np.zeros(len(chunks), dtype=bool)]
+            )
+        rows.update((chunk["id"], start + i) for i, chunk in enumerate(chunks))
+        self.doc_lengths = doc_lengths
+        self.total_length += int(lengths.sum())
+        self.df, self.max_tf, self.min_length = df, max_tf, min_length
+        self._norms = None
+        self.segments = self.segments + [segment]
+        if len(self.segments) > MAX_SEGMENTS:
+            self._rebuild()
+        self.logger.debug(
+            f"Indexed {len(chunks)} chunks, {vocab_size} terms in {len(self.segments)} segments"
+        )
+
+    def remove(self, chunk_ids: Iterable[str]) -> int:
+        """
+        Mark the rows of chunk IDs as removed.
+
+        Args:
+            chunk_ids (Iterable[str]): IDs of the chunks to remove.
+
+        Returns:
+            int: Number of rows that were removed.
+        """
+        rows = self._row_map()
+        positions = [rows.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in rows]
+        if positions:
+            if self.deleted is None:
+                self.deleted = np.zeros(len(self.ids), dtype=bool)
+            self.deleted[positions] = True
+            self.num_deleted += len(positions)
+        return len(positions)
+
+    def needs_compaction(self, threshold: float) -> bool:
+        """
+        Whether enough rows are removed to make compaction worthwhile.
+
+        Args:
+            threshold (float): Maximum fraction of removed rows.
+
+        Returns:
+            bool: True if the fraction of removed rows exceeds the threshold.
+        """
+        return self.num_deleted > threshold * max(len(self.ids), 1)
+
+    def compacted(self) -> "BM25Index":
+        """
+        Return a copy of the index without the removed rows, in one segment.
+
+        Returns:
+            BM25Index: The compacted index.
+        """
+        index = copy.copy(self)
+        index.vocabulary = dict(self.vocabulary)
+        index.ids = list(self.ids)
+        index._rebuild(drop_deleted=True)
+        return index
+
+    def _rebuild(self, drop_deleted: bool = False) -> None:
+        """
+        Merge all segments into one and recompute the statistics.
+
+        Args:
+            drop_deleted (bool): Also drop removed rows and renumber the rest.
+        """
+        vocab_size = len(self.vocabulary)
+        parts = [segment.triples() for segment in self.segments]
+        terms, docs, tfs = (
+            (
+                np.concatenate([part[i] for part in parts])
+                if parts
+                else np.empty(0, dtype=np.int64)
+            )
+            for i in range(3)
+        )
+        doc_lengths = self.doc_lengths
+        if drop_deleted and self.num_deleted:
+            keep = ~self.deleted
+            live = keep[docs]
+            terms, docs, tfs = terms[live], docs[live], tfs[live]
+            docs = (np.cumsum(keep) - 1)[docs]
+            self.ids = [chunk_id for chunk_id, k in zip(self.ids, keep) if k]
+            doc_lengths = doc_lengths[keep]
+
+        self.segments = [PostingSegment.from_postings(terms, docs, tfs, vocab_size)]
+        self.doc_lengths = doc_lengths
+        if drop_deleted:
+            self.df, self.max_tf, self.min_length = term_stats(
+                terms, tfs, doc_lengths[docs], vocab_size
+            )
+            self.total_length = int(doc_lengths.sum())
+            self._reset_tombstones()
+
+    def _idf(self, terms: np.ndarray) -> np.ndarray:
+        """
+        Inverse document frequency of terms, never negative.
+
+        Args:
+            terms (np.ndarray): Term IDs.
+
+        Returns:
+            np.ndarray: idf of each term.
+        """
+        df = self.df[terms]
+        return np.log1p((len(self.ids) - df + 0.5) / (df + 0.5))
+
+    def _length_norms(self) -> np.ndarray:
+        """
+        Per-row k1 * (1 - b + b * length / avgdl), recomputed after changes.
+        """
+        norms = self._norms
+        if norms is None or len(norms) != len(self.doc_lengths):
+            avgdl = self.total_length / max(len(self.doc_lengths), 1) or 1.0
+            norms = self.k1 * (1 - self.b + self.b * self.doc_lengths / avgdl)
+            self._norms = norms = norms.astype(np.float32)
+        return norms
+
+    def _postings(self, term: int) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Rows and term frequencies of a term across all segments.
+
+        Args:
+            term (int): Term ID.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: Rows (ascending) and their term frequencies.
+        """
+        parts = [segment.postings(term) for segment in self.segments]
+        if len(parts) == 1:
+            return parts[0]
+        return (
+            np.concatenate([docs for docs, _ in parts]),
+            np.concatenate([tfs for _, tfs in parts]),
+        )
+
+    def _query_terms(self, query: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Look up the query terms and their maximum possible contributions.
+
+        Args:
+            query (str): Query text.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray, np.ndarray]: Term IDs, their weights
+                (idf times query frequency) and score upper bounds, sorted by
+                decreasing upper bound.
+        """
+        known = [
+            self.vocabulary[token]
+            for token in self.tokenize(query)
+            if token in self.vocabulary
+        ]
+        terms, counts = np.unique(np.asarray(known, dtype=np.int64), return_counts=True)
+        # Terms added after a compaction may have no live postings
+        indexed = self.df[np.minimum(terms, len(self.df) - 1)] > 0
+        indexed &= terms < len(self.df)
+        terms, counts = terms[indexed], counts[indexed]
+        weights = self._idf(terms) * counts
+
+        # tf / (tf + norm) grows with tf and shrinks with length, so the
+        # largest tf and the shortest document of a term bound its score
+        avgdl = self.total_length / max(len(self.doc_lengths), 1) or 1.0
+        max_tf = self.max_tf[terms]
+        min_norm = self.k1 * (1 - self.b + self.b * self.min_length[terms] / avgdl)
+        # Pad the bounds so float32 rounding of the scores never exceeds them
+        bounds = weights * max_tf * (self.k1 + 1) / (max_tf + min_norm) * (1 + 1e-6)
+
+        order = np.argsort(-bounds, kind="stable")
+        return terms[order], weights[order], bounds[order]
+
+    def scores(self, query: str) -> Dict[str, float]:
+        """
+        Compute the exact BM25 score of every matching document.
+
+        Args:
+            query (str): Query text.
+
+        Returns:
+            Dict[str, float]: BM25 score of each live chunk containing a query term.
+        """
+        terms, weights, _ = self._query_terms(query)
+        norms = self._length_norms()
+        scores = np.zeros(len(norms), dtype=np.float32)
+        for term, weight in zip(terms, weights):
+            docs, tfs = self._postings(term)
+            scores[docs] += weight * tfs * (self.k1 + 1) / (tfs + norms[docs])
+        rows = np.flatnonzero(scores)
+        if self.num_deleted:
+            rows = rows[~self.deleted[rows]]
+        return {self.ids[i]: float(scores[i]) for i in rows}
+
+    def search(self, query: str, top_k: int = 3) -> List[Tuple[str, float]]:
+        """
+        Find the top-k documents by BM25 score with MaxScore pruning.
+
+        Args:
+            query (str): Query text.
+            top_k (int): Number of results to return.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, BM25 score) pairs, best first.
+        """
+        if not len(self) or top_k <= 0:
+            return []
+        terms, weights, bounds = self._query_terms(query)
+        if not len(terms):
+            return []
+
+        norms = self._length_norms()
+        deleted = self.deleted if self.num_deleted else None
+        # remaining[i] bounds the total contribution of terms i, i + 1, ...
+        remaining = np.append(np.cumsum(bounds[::-1])[::-1], 0.0)
+        scores = np.zeros(len(norms), dtype=np.float32)
+        candidates = None
+
+        for i, (term, weight) in enumerate(zip(terms, weights)):
+            docs, tfs = self._postings(term)
+            if candidates is None:
+                # Essential term: every posting may enter the top-k
+                scores[docs] += weight * tfs * (self.k1 + 1) / (tfs + norms[docs])
+                seen = np.flatnonzero(scores)
+                if deleted is not None:
+                    seen = seen[~deleted[seen]]
+                if len(seen) < top_k:
+                    continue
+                threshold = np.partition(scores[seen], len(seen) - top_k)[-top_k]
+                if remaining[i + 1] <= threshold:
+                    # Unseen rows can no longer reach the top-k
+                    candidates = seen[scores[seen] + remaining[i + 1] >= threshold]
+            else:
+                # Non-essential term: only look up the current candidates
+                if len(docs):
+                    positions = np.minimum(
+                        np.searchsorted(docs, candidates), len(docs) - 1
+                    )
+                    hits = docs[positions] == candidates
+                    rows, tfs = candidates[hits], tfs[positions[hits]]
+                    scores[rows] += weight * tfs * (self.k1 + 1) / (tfs + norms[rows])
+                threshold = np.partition(scores[candidates], len(candidates) - top_k)[
+                    -top_k
+                ]
+                candidates = candidates[
+                    scores[candidates] + remaining[i + 1] >= threshold
+                ]
+
+        if candidates is None:
+            candidates = np.flatnonzero(scores)
+            if deleted is not None:
+                candidates = candidates[~deleted[candidates]]
+        candidate_scores = scores[candidates]
+        return [
+            (self.ids[candidates[i]], float(candidate_scores[i]))
+            for i in top_k_indices(candidate_scores, top_k)
+        ]
+
+    def save(self, directory: str) -> None:
+        """
+        Save the index, merged into one segment, to a directory.
+
+        Args:
+            directory (str): Directory to write the index to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        if len(self.segments) > 1:
+            self._rebuild()
+        segment = self.segments[0] if self.segments else None
+        arrays = {
+            "doc_lengths": self.doc_lengths,
+            "df": self.df,
+            "max_tf": self.max_tf,
+            "min_length": self.min_length,
+        }
+        if segment is not None:
+            arrays.update(offsets=segment.offsets, docs=segment.docs, tfs=segment.tfs)
+        if self.deleted is not None:
+            arrays["deleted"] = self.deleted
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), array)
+        for name, lines in (
+            (self.IDS_FILE, self.ids),
+            (self.VOCABULARY_FILE, self.vocabulary),
+        ):
+            with open(
+                os.path.join(directory, name), "w", encoding="utf-8", newline="\n"
+            ) as f:
+                f.writelines(f"{line}\n" for line in lines)
+        with open(os.path.join(directory, self.INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "arrays": sorted(arrays),
+                    "k1": self.k1,
+                    "b": self.b,
+                    "total_length": self.total_length,
+                },
+                f,
+            )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "BM25Index":
+        """
+        Load an index saved with save().
+
+        Args:
+            directory (str): Directory containing the saved index.
+            mmap (bool): Open the posting arrays read-only with memory mapping.
+
+        Returns:
+            BM25Index: The loaded index.
+        """
+        with open(os.path.join(directory, cls.INDEX_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        lines = {}
+        for name in (cls.IDS_FILE, cls.VOCABULARY_FILE):
+            with open(os.path.join(directory, name), encoding="utf-8") as f:
+                lines[name] = f.read().split("\n")[:-1]
+        arrays = {
+            name: np.load(
+                os.path.join(directory, f"{name}.npy"),
+                mmap_mode="r" if mmap and name in ("docs", "tfs") else None,
+            )
+            for name in meta["arrays"]
+        }
+
+        index = cls([], k1=meta["k1"], b=meta["b"])
+        index.ids = lines[cls.IDS_FILE]
+        index.vocabulary = {
+            term: i for i, term in enumerate(lines[cls.VOCABULARY_FILE])
+        }
+        index.total_length = meta["total_length"]
+        index.doc_lengths = arrays["doc_lengths"]
+        index.df, index.max_tf = arrays["df"], arrays["max_tf"]
+        index.min_length = arrays["min_length"]
+        if "offsets" in arrays:
+            index.segments = [
+                PostingSegment(arrays["offsets"], arrays["docs"], arrays["tfs"])
+            ]
+        if "deleted" in arrays:
+            index.deleted = np.array(arrays["deleted"])
+            index.num_deleted = int(index.deleted.sum())
+        return index
@@ -0,0 +1,129 @@
+import os
+import mmap
+import numpy as np
+from collections.abc import MutableMapping
+from typing import List, Dict, Iterable, Iterator, Union
+
+
+class ChunkStore(MutableMapping):
+    """
+    Mapping from chunk ID to chunk, backed by files on disk.
+
+    All chunk texts are stored back to back as UTF-8 in one file with an
+    array of byte offsets, so a chunk is read by slicing a memory-mapped
+    file and only the chunks that are actually retrieved are ever decoded.
+    Only the ID-to-position table is held in memory.
+
+    The files are never modified: added or replaced chunks are kept in an
+    in-memory overlay and removed IDs in a set, until the store is written
+    again.
+    """
+
+    IDS_FILE = "ids.txt"
+    TEXTS_FILE = "texts.bin"
+    OFFSETS_FILE = "offsets.npy"
+
+    def __init__(
+        self, ids: List[str], texts: Union[bytes, mmap.mmap], offsets: np.ndarray
+    ):
+        """
+        Initialize the store from loaded data.
+
+        Args:
+            ids (List[str]): Chunk IDs, in storage order.
+            texts (Union[bytes, mmap.mmap]): Concatenated UTF-8 chunk texts.
+            offsets (np.ndarray): Byte offset of each text, plus the total length.
+        """
+        self.ids = ids
+        self.positions = {chunk_id: i for i, chunk_id in enumerate(ids)}
+        self._texts = texts
+        self._offsets = offsets
+        self._overlay: Dict[str, Dict[str, str]] = {}
+        self._removed = set()
+
+    def __getitem__(self, chunk_id: str) -> Dict[str, str]:
+        if chunk_id in self._overlay:
+            return self._overlay[chunk_id]
+        if chunk_id in self._removed:
+            raise KeyError(chunk_id)
+        position = self.positions[chunk_id]
+        start, end = self._offsets[position], self._offsets[position + 1]
+        return {"id": chunk_id, "text": self._texts[start:end].decode("utf-8")}
+
+    def __setitem__(self, chunk_id: str, chunk: Dict[str, str]) -> None:
+        self._overlay[chunk_id] = chunk
+        self._removed.discard(chunk_id)
+
+    def __delitem__(self, chunk_id: str) -> None:
+        if chunk_id not in self:
+            raise KeyError(chunk_id)
+        self._overlay.pop(chunk_id, None)
+        if chunk_id in self.positions:
+            self._removed.add(chunk_id)
+
+    def __iter__(self) -> Iterator[str]:
+        for chunk_id in self.ids:
+            if chunk_id not in self._removed:
+                yield chunk_id
+        for chunk_id in self._overlay:
+            if chunk_id not in self.positions:
+                yield chunk_id
+
+    def __len__(self) -> int:
+        added = sum(1 for chunk_id in self._overlay if chunk_id not in self.positions)
+        return len(self.ids) - len(self._removed) + added
+
+    def __contains__(self, chunk_id: object) -> bool:
+        if chunk_id in self._overlay:
+            return True
+        return chunk_id in self.positions and chunk_id not in self._removed
+
+    @classmethod
+    def write(cls, directory: str, chunks: Iterable[Dict[str, str]]) -> None:
+        """
+        Write chunks to a directory, streaming their texts to disk.
+
+        Args:
+            directory (str): Directory to write the store to.
+            chunks (Iterable[Dict[str, str]]): Dictionaries containing chunk ID and text.
+        """
+        os.makedirs(directory, exist_ok=True)
+        offsets = [0]
+        with open(os.path.join(directory, cls.TEXTS_FILE), "wb") as texts, open(
+            os.path.join(directory, cls.IDS_FILE), "w", encoding="utf-8", newline="\n"
+        ) as ids:
+            for chunk in chunks:
+                data = chunk["text"].encode("utf-8")
+                texts.write(data)
+                offsets.append(offsets[-1] + len(data))
+                ids.write(f"{chunk['id']}\n")
+        np.save(
+            os.path.join(directory, cls.OFFSETS_FILE), np.asarray(offsets, np.int64)
+        )
+
+    @classmethod
+    def load(cls, directory: str, mmap_texts: bool = True) -> "ChunkStore":
+        """
+        Open a store written with write().
+
+        Args:
+            directory (str): Directory containing the store.
+            mmap_texts (bool): Memory-map the texts and offsets instead of reading them.
+
+        Returns:
+            ChunkStore: The opened store.
+        """
+        with open(os.path.join(directory, cls.IDS_FILE), encoding="utf-8") as f:
+            ids = f.read().split("\n")[:-1]
+        offsets = np.load(
+            os.path.join(directory, cls.OFFSETS_FILE),
+            mmap_mode="r" if mmap_texts else None,
+        )
+
+        with open(os.path.join(directory, cls.TEXTS_FILE), "rb") as f:
+            # Empty files cannot be memory-mapped
+            if mmap_texts and offsets[-1] > 0:
+                texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                texts = f.read()
+        return cls(ids, texts, offsets)
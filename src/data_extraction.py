@@ -1,27 +1,110 @@
 import requests
+from requests.adapters import HTTPAdapter
 from bs4 import BeautifulSoup
 import re
-from typing import List, Dict
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from collections import Counter
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+from typing import List, Dict, Iterator, Optional, Tuple
 import logging
 
+try:
+    import lxml.html
+    from lxml import etree
+except ImportError:
+    lxml = None
+
+# Parser of the BeautifulSoup tree. lxml's parser closes an open paragraph
+# at the next block element, which changes the text of malformed pages, so
+# the tree is always built with html.parser
+HTML_PARSER = "html.parser"
+
+try:
+    from .metrics import metrics
+except ImportError:
+    from metrics import metrics
+
+# Sections we don't want in the corpus
+SKIPPED_SECTIONS = ("see also", "references", "external links", "further reading")
+
+# Elements whose text BeautifulSoup's get_text() leaves out
+NON_TEXT_TAGS = ("style", "script", "template")
+
+# Clean-up patterns applied to paragraph text, in order
+CITATION_PATTERN = re.compile(r"\[\d+\]")
+BRACKET_PATTERN = re.compile(r"\[.*?\]")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+# Start and end tags of the elements cleaning collects, counted in the raw HTML
+SECTION_TAG_PATTERN = re.compile(r"<(/?)(p|h2|h3)\b", re.IGNORECASE)
+
+
+def clean_paragraph_text(text: str) -> str:
+    """
+    Remove references, bracketed notes and excess whitespace from paragraph text.
+
+    Args:
+        text (str): Raw paragraph text.
+
+    Returns:
+        str: Cleaned paragraph text.
+    """
+    if "[" in text:
+        # Clean up references like [1], [2], etc.
+        text = CITATION_PATTERN.sub("", text)
+        # Remove other brackets
+        text = BRACKET_PATTERN.sub("", text)
+    # Remove excessive whitespace
+    return WHITESPACE_PATTERN.sub(" ", text).strip()
+
 
 class DataExtractor:
     """
     Class for extracting and cleaning text data from Wikipedia.
     """
 
-    def __init__(self, url: str):
+    def __init__(
+        self,
+        url: str,
+        session: Optional[requests.Session] = None,
+        body_fallback: bool = False,
+    ):
         """
         Initialize the DataExtractor with a URL.
 
         Args:
             url (str): The URL of the Wikipedia page to extract data from.
+            session (Optional[requests.Session]): Session to fetch with, for connection reuse.
+            body_fallback (bool): Clean the whole document body when there is no main
+                content div, as in the Parsoid HTML of Wikipedia dumps.
         """
         self.url = url
+        self.session = session
+        self.body_fallback = body_fallback
         self.raw_content = None
-        self.soup = None
+        self._soup = None
         self.logger = logging.getLogger(__name__)
 
+    @property
+    def soup(self) -> Optional[BeautifulSoup]:
+        """
+        BeautifulSoup tree of the extracted HTML, built on first access.
+
+        clean_data() does not need it when lxml is installed and the page is
+        well-formed, so the comparatively slow BeautifulSoup parse is
+        skipped in that case.
+        """
+        if self._soup is None and self.raw_content:
+            self._soup = BeautifulSoup(self.raw_content, HTML_PARSER)
+        return self._soup
+
+    @soup.setter
+    def soup(self, value: Optional[BeautifulSoup]) -> None:
+        self._soup = value
+
     def extract_data(self) -> bool:
         """
         Extract the raw HTML content from the Wikipedia page.
@@ -30,57 +113,81 @@ class DataExtractor:
             bool: True if extraction was successful, False otherwise.
         """
         try:
-            response = requests.get(self.url, timeout=10)
-            response.raise_for_status()
+            with metrics.timer(
+                "extraction_fetch_seconds", "Time to download a Wikipedia page"
+            ):
+                response = (self.session or requests).get(self.url, timeout=10)
+                response.raise_for_status()
             self.raw_content = response.text
-            self.soup = BeautifulSoup(self.raw_content, "html.parser")
+            self._soup = None
+            metrics.counter(
+                "extraction_pages_total", "Wikipedia pages downloaded"
+            ).inc()
+            metrics.counter("extraction_bytes_total", "Bytes of HTML downloaded").inc(
+                len(response.content)
+            )
             return True
         except requests.RequestException as e:
             self.logger.error(f"Error extracting data from {self.url}: {e}")
+            metrics.counter(
+                "extraction_errors_total", "Failed Wikipedia page downloads"
+            ).inc()
             return False
 
-    def clean_data(self) -> List[Dict[str, str]]:
+    def clean_data(self, id_prefix: str = "") -> List[Dict[str, str]]:
         """
         Clean the extracted data by removing HTML tags, references, and irrelevant sections.
         Split the content into manageable chunks.
 
+        Args:
+            id_prefix (str): Prefix for chunk IDs, to keep them unique across pages.
+
         Returns:
             List[Dict[str, str]]: A list of dictionaries containing chunk ID and text.
         """
-        if not self.soup:
+        with metrics.timer(
+            "extraction_clean_seconds", "Time to clean and chunk a downloaded page"
+        ):
+            return list(self.iter_chunks(id_prefix))
+
+    def iter_chunks(self, id_prefix: str = "") -> Iterator[Dict[str, str]]:
+        """
+        Lazily clean the extracted data, yielding chunks as they are produced.
+
+        Applies the same rules as clean_data(), but never holds the full list
+        of chunks, so consumers can start embedding before cleaning finishes.
+
+        Args:
+            id_prefix (str): Prefix for chunk IDs, to keep them unique across pages.
+
+        Yields:
+            Dict[str, str]: Dictionaries containing chunk ID and text.
+        """
+        if self._soup is None and self.raw_content and lxml is not None:
+            sections = self._content_sections_lxml()
+        elif not self.soup:
             self.logger.error(
                 "No content available for cleaning. Please extract data first."
             )
-            return []
+            return
+        else:
+            sections = self._content_sections_soup()
 
-        # Get the main content div
-        content_div = self.soup.find("div", {"id": "mw-content-text"})
-        if not content_div:
+        if sections is None:
             self.logger.error("Could not find main content div.")
-            return []
+            return
 
-        # Extract paragraphs and section headings
-        paragraphs = []
+        # Number of chunks produced so far, used for chunk IDs
+        count = 0
 
         # Process each section
-        for section in content_div.find_all(["h2", "h3", "p"]):
-            # Skip navigation sections, references, external links, etc.
-            if section.find_parent("div", {"class": "toc"}):
-                continue
-
+        for name, section_text in sections:
             # Process headings
-            if section.name in ["h2", "h3"]:
-                heading_text = section.get_text().strip()
+            if name != "p":
+                heading_text = section_text.strip()
                 # Skip sections we don't want
-                if any(
-                    x in heading_text.lower()
-                    for x in [
-                        "see also",
-                        "references",
-                        "external links",
-                        "further reading",
-                    ]
-                ):
+                lowered = heading_text.lower()
+                if any(x in lowered for x in SKIPPED_SECTIONS):
                     continue
 
                 if (
@@ -88,26 +195,248 @@ class DataExtractor:
                     and not heading_text.startswith("[")
                     and len(heading_text) > 1
                 ):
-                    paragraphs.append(
-                        {"id": f"heading-{len(paragraphs)}", "text": heading_text}
-                    )
+                    yield {"id": f"{id_prefix}heading-{count}", "text": heading_text}
+                    count += 1
 
             # Process paragraphs
-            elif section.name == "p":
-                text = section.get_text().strip()
-                # Clean up references like [1], [2], etc.
-                text = re.sub(r"\[\d+\]", "", text)
-                # Remove other brackets
-                text = re.sub(r"\[.*?\]", "", text)
-                # Remove excessive whitespace
-                text = re.sub(r"\s+", " ", text).strip()
+            else:
+                text = clean_paragraph_text(section_text)
 
                 if (
                     text and len(text) > 50
                 ):  # Only keep paragraphs with substantial content
-                    paragraphs.append({"id": f"para-{len(paragraphs)}", "text": text})
+                    yield {"id": f"{id_prefix}para-{count}", "text": text}
+                    count += 1
 
-        if not paragraphs:
+        metrics.counter("extraction_chunks_total", "Chunks extracted from pages").inc(
+            count
+        )
+        if not count:
             self.logger.warning("No content was extracted after cleaning.")
 
-        return paragraphs
+    def _content_sections_soup(self) -> Optional[Iterator[Tuple[str, str]]]:
+        """
+        Collect the headings and paragraphs of the main content from the soup.
+
+        Returns:
+            Optional[Iterator[Tuple[str, str]]]: (tag name, text) of each h2, h3 and p outside
+            the table of contents, in document order, or None if there is no main content div.
+        """
+        # Get the main content div
+        content_div = self.soup.find("div", {"id": "mw-content-text"})
+        if not content_div and self.body_fallback:
+            content_div = self.soup.body or self.soup
+        if not content_div:
+            return None
+
+        # Skip navigation sections: collect everything inside a table of
+        # contents once, instead of walking up the tree from every element
+        if content_div.find_parent("div", {"class": "toc"}):
+            return iter(())
+        in_toc = {
+            id(element)
+            for toc in content_div.find_all("div", {"class": "toc"})
+            for element in toc.find_all(["h2", "h3", "p"])
+        }
+
+        return (
+            (section.name, section.get_text())
+            for section in content_div.find_all(["h2", "h3", "p"])
+            if id(section) not in in_toc
+        )
+
+    def _content_sections_lxml(self) -> Optional[Iterator[Tuple[str, str]]]:
+        """
+        Collect the headings and paragraphs of the main content with lxml.
+
+        Produces the same sections as _content_sections_soup(), but parses the
+        raw HTML directly with lxml's C parser, which is much faster than
+        building a BeautifulSoup tree. Pages that lxml would parse into a
+        different tree are handed to _content_sections_soup() instead.
+
+        Returns:
+            Optional[Iterator[Tuple[str, str]]]: (tag name, text) of each h2, h3 and p outside
+            the table of contents, in document order, or None if there is no main content div.
+        """
+        parser = lxml.html.HTMLParser()
+        try:
+            root = lxml.html.fromstring(self.raw_content, parser=parser)
+        except (ValueError, etree.ParserError):
+            # e.g. a string with an XML encoding declaration
+            return self._content_sections_soup() if self.soup else None
+        if self._lxml_restructured(root, parser.error_log):
+            self.logger.debug(
+                f"Malformed HTML in {self.url}, cleaning it with html.parser"
+            )
+            return self._content_sections_soup()
+
+        matches = root.xpath('//div[@id="mw-content-text"]')
+        if not matches and self.body_fallback:
+            matches = root.xpath("//body") or [root]
+        if not matches:
+            return None
+        content_div = matches[0]
+
+        toc_test = 'contains(concat(" ", normalize-space(@class), " "), " toc ")'
+        if content_div.xpath(f"ancestor::div[{toc_test}]"):
+            return iter(())
+        in_toc = set(
+            content_div.xpath(f".//div[{toc_test}]//*[self::h2 or self::h3 or self::p]")
+        )
+
+        # Drop comments and non-text elements so text_content() matches get_text()
+        for element in list(content_div.iter(etree.Comment, *NON_TEXT_TAGS)):
+            element.drop_tree()
+
+        return (
+            (section.tag, section.text_content())
+            for section in content_div.iter("h2", "h3", "p")
+            if section not in in_toc
+        )
+
+    def _lxml_restructured(self, root, error_log) -> bool:
+        """
+        Check whether lxml may have built different sections than html.parser.
+
+        html.parser keeps an element open until its own end tag, while lxml
+        closes a paragraph at the next block element (div, table, list or
+        another paragraph) and drops end tags it can no longer match. Both
+        build the same headings and paragraphs when every h2, h3 and p was
+        closed explicitly and no end tag was mismatched.
+
+        Args:
+            root: Root element parsed by lxml.
+            error_log: Error log of the lxml parser.
+
+        Returns:
+            bool: True if the sections must be collected from the BeautifulSoup tree.
+        """
+        if any(entry.type_name == "ERR_TAG_NAME_MISMATCH" for entry in error_log):
+            return True
+        raw_tags = Counter(
+            end + name.lower()
+            for end, name in SECTION_TAG_PATTERN.findall(self.raw_content)
+        )
+        elements = Counter(element.tag for element in root.iter("h2", "h3", "p"))
+        return any(
+            raw_tags[tag] != raw_tags["/" + tag] or raw_tags[tag] != elements[tag]
+            for tag in ("h2", "h3", "p")
+        )
+
+
+class BatchDataExtractor:
+    """
+    Class for fetching and cleaning many Wikipedia pages concurrently.
+
+    Pages are fetched by a thread pool over a single pooled requests session,
+    with a limit on concurrent requests and a minimum interval between
+    request starts for each host. Chunk IDs are prefixed with the page's
+    position in the URL list so they are unique across the whole batch.
+    """
+
+    def __init__(
+        self,
+        urls: List[str],
+        max_workers: int = 8,
+        per_host_limit: int = 2,
+        host_interval: float = 0.0,
+    ):
+        """
+        Initialize the BatchDataExtractor with a list of URLs.
+
+        Args:
+            urls (List[str]): The URLs of the Wikipedia pages to extract data from.
+            max_workers (int): Maximum number of pages fetched concurrently.
+            per_host_limit (int): Maximum number of concurrent requests to a single host.
+            host_interval (float): Minimum number of seconds between request starts to a single host.
+        """
+        self.urls = urls
+        self.max_workers = max_workers
+        self.per_host_limit = per_host_limit
+        self.host_interval = host_interval
+        self.logger = logging.getLogger(__name__)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._host_slots: Dict[str, threading.Semaphore] = {}
+        self._host_last_start: Dict[str, float] = {}
+
+    @contextmanager
+    def _host_slot(self, url: str):
+        """
+        Hold one of the per-host request slots for the duration of a fetch.
+
+        Args:
+            url (str): URL about to be fetched.
+        """
+        host = urlsplit(url).netloc
+        with self._lock:
+            slot = self._host_slots.setdefault(
+                host, threading.Semaphore(self.per_host_limit)
+            )
+
+        with slot:
+            if self.host_interval > 0:
+                with self._lock:
+                    start = max(
+                        time.monotonic(),
+                        self._host_last_start.get(host, float("-inf"))
+                        + self.host_interval,
+                    )
+                    self._host_last_start[host] = start
+                time.sleep(max(0.0, start - time.monotonic()))
+            yield
+
+    def _extract_page(self, index: int, url: str) -> List[Dict[str, str]]:
+        """
+        Fetch and clean a single page.
+
+        Args:
+            index (int): Position of the URL in the batch.
+            url (str): URL of the page.
+
+        Returns:
+            List[Dict[str, str]]: Chunks of the page, or an empty list on failure.
+        """
+        extractor = DataExtractor(url, session=self.session)
+        with self._host_slot(url):
+            extracted = extractor.extract_data()
+        if not extracted:
+            return []
+        return extractor.clean_data(id_prefix=f"doc-{index}/")
+
+    def iter_pages(self) -> Iterator[Tuple[int, List[Dict[str, str]]]]:
+        """
+        Yield the chunks of each page as soon as it has been fetched and cleaned.
+
+        Pages are yielded in completion order, not URL order.
+
+        Yields:
+            Tuple[int, List[Dict[str, str]]]: Position of the URL in the batch and its chunks.
+        """
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {
+                executor.submit(self._extract_page, index, url): index
+                for index, url in enumerate(self.urls)
+            }
+            for future in as_completed(futures):
+                yield futures[future], future.result()
+
+    def extract_all(self) -> List[Dict[str, str]]:
+        """
+        Fetch and clean every page, returning all chunks in URL order.
+
+        Returns:
+            List[Dict[str, str]]: Chunks of all pages that were extracted successfully.
+        """
+        pages = dict(self.iter_pages())
+        chunks = [chunk for index in sorted(pages) for chunk in pages[index]]
+        self.logger.info(
+            f"Extracted {len(chunks)} chunks from {sum(1 for c in pages.values() if c)} "
+            f"of {len(self.urls)} pages"
+        )
+        return chunks
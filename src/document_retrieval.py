@@ -1,15 +1,115 @@
-import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import json
+import shutil
 import threading
+import numpy as np
 import logging
-from typing import List, Dict
-import queue
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Tuple, Any, Iterable, Optional
+
+try:
+    from .vector_index import VectorIndex
+    from .ivf_index import IVFIndex
+    from .quantization import QuantizedIndex
+    from .chunk_store import ChunkStore
+    from .sharded_index import ShardedIndex
+    from .bm25_index import BM25Index
+    from .metrics import metrics
+except ImportError:
+    from vector_index import VectorIndex
+    from ivf_index import IVFIndex
+    from quantization import QuantizedIndex
+    from chunk_store import ChunkStore
+    from sharded_index import ShardedIndex
+    from bm25_index import BM25Index
+    from metrics import metrics
+
+# Index implementations selectable with DocumentRetriever(backend=...)
+INDEX_BACKENDS = {
+    "exact": VectorIndex,
+    "ivf": IVFIndex,
+    "quantized": QuantizedIndex,
+    "sharded": ShardedIndex,
+}
+
+# Version of the directory layout written by DocumentRetriever.save()
+FORMAT_VERSION = 1
+
+# Rank offset of reciprocal rank fusion, as in Cormack et al. (2009)
+RRF_K = 60
+
+
+def reciprocal_rank_fusion(
+    ranked_lists: List[List[Tuple[str, float]]], k: int = RRF_K
+) -> Dict[str, float]:
+    """
+    Fuse ranked lists by summing 1 / (k + rank) over the lists.
+
+    Args:
+        ranked_lists (List[List[Tuple[str, float]]]): (chunk ID, score) pairs of each list, best first.
+        k (int): Rank offset damping the influence of the top ranks.
+
+    Returns:
+        Dict[str, float]: Fused score of every chunk found in any list.
+    """
+    fused: Dict[str, float] = {}
+    for ranked in ranked_lists:
+        for rank, (chunk_id, _) in enumerate(ranked, start=1):
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + 1.0 / (k + rank)
+    return fused
+
+
+def weighted_fusion(
+    ranked_lists: List[List[Tuple[str, float]]], weights: List[float]
+) -> Dict[str, float]:
+    """
+    Fuse ranked lists by a weighted sum of their min-max normalized scores.
+
+    Args:
+        ranked_lists (List[List[Tuple[str, float]]]): (chunk ID, score) pairs of each list, best first.
+        weights (List[float]): Weight of each list.
+
+    Returns:
+        Dict[str, float]: Fused score of every chunk found in any list.
+    """
+    fused: Dict[str, float] = {}
+    for ranked, weight in zip(ranked_lists, weights):
+        if not ranked:
+            continue
+        scores = [score for _, score in ranked]
+        low, span = min(scores), max(scores) - min(scores)
+        for chunk_id, score in ranked:
+            # A list of equal scores counts every entry as a full match
+            normalized = (score - low) / span if span else 1.0
+            fused[chunk_id] = fused.get(chunk_id, 0.0) + weight * normalized
+    return fused
+
+
+# Fusion modes of DocumentRetriever.retrieve_hybrid()
+FUSION_METHODS = ("rrf", "weighted")
 
 
 class DocumentRetriever:
     """
     Class for retrieving relevant documents based on similarity to query.
-    Uses threading for parallel computation of similarities.
+    Similarities are computed against a contiguous VectorIndex, or against
+    an approximate IVFIndex when backend="ivf", or against compressed
+    vectors in a QuantizedIndex when backend="quantized", or by a pool of
+    worker processes over shared memory when backend="sharded".
+
+    With sparse_index=True the chunks are also indexed with BM25, and
+    retrieve_hybrid() fuses the sparse ranking with the dense one so exact
+    term matches (names, acronyms) are not lost to averaged embeddings.
+
+    Chunks can be added, updated and removed while queries are being
+    served. Removed vectors are only marked as deleted, and the mutation
+    that leaves more than compact_threshold of the rows wasted compacts the
+    index into a copy; searches keep using the old index until the copy
+    replaces it.
+
+    Large exact and quantized indexes are scanned in num_threads row shards
+    on a thread pool that lives as long as the retriever; call close() to
+    stop its threads.
     """
 
     def __init__(
@@ -17,6 +117,11 @@ class DocumentRetriever:
         embeddings: Dict[str, np.ndarray],
         chunks: List[Dict[str, str]],
         num_threads: int = 4,
+        backend: str = "exact",
+        index_params: Optional[Dict[str, Any]] = None,
+        compact_threshold: float = 0.2,
+        sparse_index: bool = False,
+        bm25_params: Optional[Dict[str, Any]] = None,
     ):
         """
         Initialize the DocumentRetriever with document embeddings.
@@ -24,95 +129,452 @@ class DocumentRetriever:
         Args:
             embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
             chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
-            num_threads (int): Number of threads to use for parallel computation.
+            num_threads (int): Number of threads scanning shards of the index per query.
+            backend (str): Index implementation, "exact", "ivf", "quantized" or "sharded".
+            index_params (Optional[Dict[str, Any]]): Keyword arguments for the index, e.g. nlist and nprobe,
+                quantization and rerank, or num_shards.
+            compact_threshold (float): Fraction of removed rows above which the index is compacted.
+            sparse_index (bool): Also build a BM25 index of the chunk texts for hybrid retrieval.
+            bm25_params (Optional[Dict[str, Any]]): Keyword arguments for the BM25 index, e.g. k1 and b.
         """
-        self.embeddings = embeddings
+        if backend not in INDEX_BACKENDS:
+            raise ValueError(
+                f"Unknown index backend {backend!r}, expected one of {sorted(INDEX_BACKENDS)}"
+            )
+        self.backend = backend
+        self.index = INDEX_BACKENDS[backend](embeddings, **(index_params or {}))
+        # A compressed index would gain nothing if the float vectors stayed referenced
+        self.embeddings = embeddings if backend != "quantized" else {}
+        self._track_embeddings = backend != "quantized"
         self.chunks = {chunk["id"]: chunk for chunk in chunks}
+        self.sparse_index = (
+            BM25Index(chunks, **(bm25_params or {})) if sparse_index else None
+        )
+        self._start(num_threads, compact_threshold)
+
+    def _start(self, num_threads: int, compact_threshold: float) -> None:
+        """
+        Create the retrieval thread pool and the mutation lock.
+
+        Args:
+            num_threads (int): Number of threads scanning shards of the index per query.
+            compact_threshold (float): Fraction of removed rows above which the index is compacted.
+        """
         self.num_threads = num_threads
+        self._executor = ThreadPoolExecutor(
+            max_workers=num_threads, thread_name_prefix="retrieval"
+        )
+        self.compact_threshold = compact_threshold
+        # Serializes mutations; searches never wait on it
+        self._lock = threading.Lock()
         self.logger = logging.getLogger(__name__)
 
-    def _compute_similarities_thread(
-        self,
-        chunk_ids: List[str],
-        query_embedding: np.ndarray,
-        result_queue: queue.Queue,
-    ) -> None:
+    def retrieve_documents(
+        self, query_embedding: np.ndarray, top_k: int = 3
+    ) -> List[Dict[str, any]]:
         """
-        Compute cosine similarities between query embedding and chunk embeddings.
+        Retrieve the top-k most relevant documents based on similarity to query.
 
         Args:
-            chunk_ids (List[str]): List of chunk IDs to process.
             query_embedding (np.ndarray): Query embedding vector.
-            result_queue (queue.Queue): Queue to store results.
+            top_k (int): Number of top documents to retrieve.
+
+        Returns:
+            List[Dict[str, any]]: List of dictionaries containing document information and similarity scores.
         """
-        similarities = []
+        if not len(self.index):
+            self.logger.error("No embeddings available for retrieval.")
+            return []
+
+        # Score the query against the index, one row shard per thread
+        with metrics.timer(
+            "retrieval_search_seconds", "Time to score a query against the index"
+        ):
+            top_results = self.index.search_parallel(
+                query_embedding, top_k, self._executor, self.num_threads
+            )
+        metrics.counter("retrieval_queries_total", "Queries retrieved").inc()
 
-        for chunk_id in chunk_ids:
-            if chunk_id in self.embeddings:
-                chunk_embedding = self.embeddings[chunk_id]
-                # Reshape embeddings for cosine_similarity function
-                query_reshaped = query_embedding.reshape(1, -1)
-                chunk_reshaped = chunk_embedding.reshape(1, -1)
+        results = self._format_results(top_results)
 
-                # Compute cosine similarity
-                similarity = cosine_similarity(query_reshaped, chunk_reshaped)[0][0]
-                similarities.append((chunk_id, similarity))
+        self.logger.info(f"Retrieved {len(results)} documents")
+        return results
 
-        # Put results in the queue
-        result_queue.put(similarities)
+    def retrieve_documents_batch(
+        self, query_matrix: np.ndarray, top_k: int = 3
+    ) -> List[List[Dict[str, any]]]:
+        """
+        Retrieve the top-k most relevant documents for a block of queries.
 
-    def retrieve_documents(
-        self, query_embedding: np.ndarray, top_k: int = 3
+        All queries are scored against the corpus with tiled matrix-matrix
+        products instead of one retrieval call per query.
+
+        Args:
+            query_matrix (np.ndarray): 2-D array with one query embedding per row.
+            top_k (int): Number of top documents to retrieve per query.
+
+        Returns:
+            List[List[Dict[str, any]]]: For each query, a list of dictionaries containing document information and similarity scores.
+        """
+        query_matrix = np.atleast_2d(query_matrix)
+        if not len(self.index):
+            self.logger.error("No embeddings available for retrieval.")
+            return [[] for _ in range(query_matrix.shape[0])]
+
+        with metrics.timer(
+            "retrieval_batch_seconds", "Time to score a block of queries"
+        ):
+            batch_results = [
+                self._format_results(top_results)
+                for top_results in self.index.search_batch(query_matrix, top_k)
+            ]
+        metrics.counter("retrieval_queries_total", "Queries retrieved").inc(
+            len(batch_results)
+        )
+
+        self.logger.info(f"Retrieved documents for {len(batch_results)} queries")
+        return batch_results
+
+    def retrieve_hybrid(
+        self,
+        query: str,
+        query_embedding: np.ndarray,
+        top_k: int = 3,
+        fusion: str = "rrf",
+        alpha: float = 0.5,
+        num_candidates: Optional[int] = None,
     ) -> List[Dict[str, any]]:
         """
-        Retrieve the top-k most relevant documents based on similarity to query.
+        Retrieve documents by fusing BM25 and embedding rankings.
+
+        Each index returns its own top num_candidates, and the two lists are
+        fused with reciprocal rank fusion ("rrf") or a weighted sum of their
+        min-max normalized scores ("weighted"). The fused score is returned
+        as the similarity.
 
         Args:
-            query_embedding (np.ndarray): Query embedding vector.
+            query (str): Query text, scored by the BM25 index.
+            query_embedding (np.ndarray): Query embedding vector, scored by the vector index.
             top_k (int): Number of top documents to retrieve.
+            fusion (str): Fusion mode, "rrf" or "weighted".
+            alpha (float): Weight of the dense scores in weighted fusion.
+            num_candidates (Optional[int]): Results taken from each index (defaults to max(4 * top_k, 20)).
 
         Returns:
-            List[Dict[str, any]]: List of dictionaries containing document information and similarity scores.
+            List[Dict[str, any]]: List of dictionaries containing document information and fused scores.
         """
-        if not self.embeddings:
+        if fusion not in FUSION_METHODS:
+            raise ValueError(
+                f"Unknown fusion {fusion!r}, expected one of {list(FUSION_METHODS)}"
+            )
+        if self.sparse_index is None:
+            self.logger.warning("No sparse index built, using dense retrieval only.")
+            return self.retrieve_documents(query_embedding, top_k)
+        if not len(self.index) and not len(self.sparse_index):
             self.logger.error("No embeddings available for retrieval.")
             return []
 
-        # Split chunk IDs into batches for threading
-        chunk_ids = list(self.embeddings.keys())
-        batch_size = max(1, len(chunk_ids) // self.num_threads)
-        batches = [
-            chunk_ids[i : i + batch_size] for i in range(0, len(chunk_ids), batch_size)
-        ]
-
-        # Create threads and queue for results
-        threads = []
-        result_queue = queue.Queue()
-
-        for batch in batches:
-            thread = threading.Thread(
-                target=self._compute_similarities_thread,
-                args=(batch, query_embedding, result_queue),
+        num_candidates = num_candidates or max(4 * top_k, 20)
+        with metrics.timer(
+            "retrieval_search_seconds", "Time to score a query against the index"
+        ):
+            dense = (
+                self.index.search_parallel(
+                    query_embedding, num_candidates, self._executor, self.num_threads
+                )
+                if len(self.index)
+                else []
             )
-            threads.append(thread)
-            thread.start()
+        with metrics.timer(
+            "retrieval_bm25_seconds", "Time to score a query against the BM25 index"
+        ):
+            sparse = self.sparse_index.search(query, num_candidates)
+        with metrics.timer(
+            "retrieval_fusion_seconds", "Time to fuse dense and sparse rankings"
+        ):
+            if fusion == "rrf":
+                fused = reciprocal_rank_fusion([dense, sparse])
+            else:
+                fused = weighted_fusion([dense, sparse], [alpha, 1.0 - alpha])
+        metrics.counter("retrieval_queries_total", "Queries retrieved").inc()
 
-        # Wait for all threads to complete
-        for thread in threads:
-            thread.join()
+        top_results = sorted(fused.items(), key=lambda item: item[1], reverse=True)
+        results = self._format_results(top_results[:top_k])
+        self.logger.info(
+            f"Retrieved {len(results)} documents from {len(dense)} dense "
+            f"and {len(sparse)} sparse candidates"
+        )
+        return results
 
-        # Collect results from queue
-        all_similarities = []
-        while not result_queue.empty():
-            all_similarities.extend(result_queue.get())
+    def close(self) -> None:
+        """
+        Shut down the retrieval thread pool and any worker processes of the index.
+        """
+        self._executor.shutdown(wait=True)
+        self.index.close()
 
-        # Sort by similarity score (descending)
-        all_similarities.sort(key=lambda x: x[1], reverse=True)
+    def add_chunks(
+        self, chunks: List[Dict[str, str]], embeddings: Dict[str, np.ndarray]
+    ) -> int:
+        """
+        Add chunks to the index, replacing chunks that have the same ID.
 
-        # Get top-k results
-        top_results = all_similarities[:top_k]
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
 
-        # Format results
+        Returns:
+            int: Number of chunks added or replaced.
+        """
+        with self._lock:
+            return self._upsert(chunks, embeddings)
+
+    def update_chunks(
+        self, chunks: List[Dict[str, str]], embeddings: Dict[str, np.ndarray]
+    ) -> int:
+        """
+        Replace the text and embedding of chunks that are already indexed.
+
+        Chunks whose ID is not indexed are skipped.
+
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+
+        Returns:
+            int: Number of chunks updated.
+        """
+        with self._lock:
+            known = [chunk for chunk in chunks if chunk["id"] in self.chunks]
+            if len(known) < len(chunks):
+                self.logger.warning(
+                    f"Skipping {len(chunks) - len(known)} chunks that are not indexed"
+                )
+            return self._upsert(known, embeddings)
+
+    def remove_chunks(self, chunk_ids: Iterable[str]) -> int:
+        """
+        Remove chunks from the index.
+
+        Args:
+            chunk_ids (Iterable[str]): IDs of the chunks to remove.
+
+        Returns:
+            int: Number of chunks removed.
+        """
+        with self._lock:
+            # Each ID once, so a repeated ID cannot fail halfway through
+            chunk_ids = list(
+                dict.fromkeys(
+                    chunk_id for chunk_id in chunk_ids if chunk_id in self.chunks
+                )
+            )
+            removed = self.index.remove(chunk_ids)
+            metrics.counter("retrieval_chunks_removed_total", "Chunks removed").inc(
+                removed
+            )
+            if self.sparse_index is not None:
+                self.sparse_index.remove(chunk_ids)
+            for chunk_id in chunk_ids:
+                del self.chunks[chunk_id]
+                if self._track_embeddings:
+                    self.embeddings.pop(chunk_id, None)
+            self.logger.info(f"Removed {removed} chunks from the index")
+            self._maybe_compact()
+        return removed
+
+    def compact(self) -> None:
+        """
+        Rebuild the index storage without removed rows.
+        """
+        with self._lock:
+            self._compact()
+
+    def _upsert(
+        self, chunks: List[Dict[str, str]], embeddings: Dict[str, np.ndarray]
+    ) -> int:
+        """
+        Add or replace chunks and their vectors. Must be called with the lock held.
+
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+
+        Returns:
+            int: Number of chunks added or replaced.
+        """
+        chunks = [chunk for chunk in chunks if chunk["id"] in embeddings]
+        vectors = {chunk["id"]: embeddings[chunk["id"]] for chunk in chunks}
+        if not vectors:
+            return 0
+
+        # Store the texts first so a search never finds a vector without its text
+        for chunk in chunks:
+            self.chunks[chunk["id"]] = chunk
+        with metrics.timer(
+            "retrieval_insert_seconds", "Time to insert a batch of chunks"
+        ):
+            self.index.add(vectors)
+            if self.sparse_index is not None:
+                self.sparse_index.add(chunks)
+        if self._track_embeddings:
+            self.embeddings.update(vectors)
+        metrics.counter(
+            "retrieval_chunks_indexed_total", "Chunks added or replaced"
+        ).inc(len(vectors))
+        self.logger.info(f"Indexed {len(vectors)} new or changed chunks")
+        self._maybe_compact()
+        return len(vectors)
+
+    def _maybe_compact(self) -> None:
+        """
+        Compact the index if too many of its rows are wasted. Must be called with the lock held.
+        """
+        if self.index.needs_compaction(self.compact_threshold) or (
+            self.sparse_index is not None
+            and self.sparse_index.needs_compaction(self.compact_threshold)
+        ):
+            self._compact()
+
+    def _compact(self) -> None:
+        """
+        Replace the index with a compacted copy. Must be called with the lock held.
+        """
+        index = self.index
+        with metrics.timer("retrieval_compaction_seconds", "Time to compact the index"):
+            self.index = index.compacted()
+            if self.sparse_index is not None:
+                self.sparse_index = self.sparse_index.compacted()
+        self.logger.info(
+            f"Compacted index from {len(index.ids)} to {len(self.index.ids)} rows"
+        )
+
+    def save(self, path: str) -> bool:
+        """
+        Save the index and chunk texts to a versioned directory.
+
+        The directory holds meta.json, the index arrays as .npy files with
+        an ID table (index/), the chunk texts with their byte offsets
+        (chunks/) and, if built, the BM25 postings (sparse/). It is written
+        under a temporary name and swapped into place, so readers never see
+        a partially written index.
+
+        Args:
+            path (str): Directory to write the retriever to.
+
+        Returns:
+            bool: True if the retriever was saved successfully, False otherwise.
+        """
+        tmp_path = f"{path}.tmp"
+        try:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            # Keep mutations out while the index and chunks are written
+            with self._lock:
+                self.index.save(os.path.join(tmp_path, "index"))
+                ChunkStore.write(os.path.join(tmp_path, "chunks"), self.chunks.values())
+                if self.sparse_index is not None:
+                    self.sparse_index.save(os.path.join(tmp_path, "sparse"))
+            with open(os.path.join(tmp_path, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "format_version": FORMAT_VERSION,
+                        "backend": self.backend,
+                        "num_vectors": len(self.index),
+                        "dim": self.index.dim,
+                        "sparse": self.sparse_index is not None,
+                    },
+                    f,
+                )
+
+            if os.path.exists(path):
+                shutil.rmtree(f"{path}.old", ignore_errors=True)
+                os.replace(path, f"{path}.old")
+                os.replace(tmp_path, path)
+                shutil.rmtree(f"{path}.old", ignore_errors=True)
+            else:
+                os.replace(tmp_path, path)
+        except OSError as e:
+            self.logger.error(f"Error saving retriever to {path}: {e}")
+            return False
+
+        self.logger.info(f"Saved retriever with {len(self.index)} vectors to {path}")
+        return True
+
+    @classmethod
+    def load(
+        cls,
+        path: str,
+        mmap: bool = True,
+        num_threads: int = 4,
+        index_params: Optional[Dict[str, Any]] = None,
+        compact_threshold: float = 0.2,
+    ) -> Optional["DocumentRetriever"]:
+        """
+        Load a retriever saved with save().
+
+        With mmap=True the vectors and chunk texts are memory-mapped
+        read-only, so loading is near-instant and processes that open the
+        same directory share one copy through the page cache.
+
+        Args:
+            path (str): Directory containing the saved retriever.
+            mmap (bool): Memory-map the arrays and texts instead of reading them.
+            num_threads (int): Number of threads scanning shards of the index per query.
+            index_params (Optional[Dict[str, Any]]): Index settings overriding the saved ones,
+                e.g. num_shards.
+            compact_threshold (float): Fraction of removed rows above which the index is compacted.
+
+        Returns:
+            Optional[DocumentRetriever]: The loaded retriever, or None on failure.
+        """
+        logger = logging.getLogger(__name__)
+        try:
+            with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("format_version") != FORMAT_VERSION:
+                logger.error(
+                    f"Unsupported index format version {meta.get('format_version')} in {path}"
+                )
+                return None
+
+            # The retriever is assembled around the loaded parts, so no
+            # throwaway index (or shard worker pool) is built first
+            index = INDEX_BACKENDS[meta["backend"]].load(
+                os.path.join(path, "index"), mmap=mmap, params=index_params
+            )
+            chunks = ChunkStore.load(os.path.join(path, "chunks"), mmap)
+            sparse_index = (
+                BM25Index.load(os.path.join(path, "sparse"), mmap=mmap)
+                if meta.get("sparse")
+                else None
+            )
+        except (OSError, ValueError, KeyError) as e:
+            logger.error(f"Error loading retriever from {path}: {e}")
+            return None
+
+        retriever = cls.__new__(cls)
+        retriever.backend = meta["backend"]
+        retriever.index = index
+        # The vectors live in the loaded index only
+        retriever.embeddings = {}
+        retriever._track_embeddings = False
+        retriever.chunks = chunks
+        retriever.sparse_index = sparse_index
+        retriever._start(num_threads, compact_threshold)
+
+        logger.info(f"Loaded retriever with {len(retriever.index)} vectors from {path}")
+        return retriever
+
+    def _format_results(self, top_results: List[tuple]) -> List[Dict[str, any]]:
+        """
+        Attach chunk text to (chunk ID, similarity) pairs.
+
+        Args:
+            top_results (List[tuple]): (chunk ID, similarity) pairs, best first.
+
+        Returns:
+            List[Dict[str, any]]: List of dictionaries containing document information and similarity scores.
+        """
         results = []
         for chunk_id, similarity in top_results:
             if chunk_id in self.chunks:
@@ -123,6 +585,4 @@ class DocumentRetriever:
                         "similarity": similarity,
                     }
                 )
-
-        self.logger.info(f"Retrieved {len(results)} documents")
         return results
@@ -0,0 +1,368 @@
+import os
+import bz2
+import gzip
+import lzma
+import json
+import tarfile
+import logging
+from collections import deque
+from itertools import islice
+from multiprocessing import Pool, cpu_count
+from typing import List, Dict, Iterator, Optional, Tuple, BinaryIO
+
+try:
+    from .data_extraction import DataExtractor
+except ImportError:
+    from data_extraction import DataExtractor
+
+# Decompressors for compressed dump files, by file extension
+COMPRESSED_OPENERS = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+# Pages cleaned per pool task, and pool tasks in flight per worker process;
+# together they bound the number of pages held in memory at once
+PAGES_PER_TASK = 16
+TASKS_IN_FLIGHT_PER_PROCESS = 2
+
+HTML_EXTENSIONS = (".html", ".htm")
+NDJSON_EXTENSIONS = (".ndjson", ".jsonl", ".json")
+TAR_EXTENSIONS = (".tar", ".tgz", ".tar.gz", ".tar.bz2", ".tar.xz")
+
+# A task is (path, format, start byte, end byte, name); the range is only
+# used to split uncompressed NDJSON files, other files are read whole. The
+# name prefixes page keys and is unique across the dump
+DumpTask = Tuple[str, str, int, Optional[int], str]
+
+
+def _dump_format(name: str) -> Optional[str]:
+    """
+    Detect the format of a dump file from its name.
+
+    Args:
+        name (str): File or archive member name.
+
+    Returns:
+        Optional[str]: "tar", "ndjson" or "html", or None for unsupported files.
+    """
+    lowered = name.lower()
+    if lowered.endswith(TAR_EXTENSIONS):
+        return "tar"
+    stem, extension = os.path.splitext(lowered)
+    if extension in COMPRESSED_OPENERS:
+        lowered = stem
+    if lowered.endswith(NDJSON_EXTENSIONS):
+        return "ndjson"
+    if lowered.endswith(HTML_EXTENSIONS):
+        return "html"
+    return None
+
+
+def _open_binary(path: str) -> BinaryIO:
+    """
+    Open a dump file for binary reading, decompressing it transparently.
+
+    Args:
+        path (str): Path of the file.
+
+    Returns:
+        BinaryIO: Stream of the uncompressed file contents.
+    """
+    opener = COMPRESSED_OPENERS.get(os.path.splitext(path)[1].lower(), open)
+    return opener(path, "rb")
+
+
+def _page_html(line: bytes) -> Optional[str]:
+    """
+    Get the article HTML of one NDJSON record.
+
+    Supports Wikimedia Enterprise records (``article_body.html``) and flat
+    records with a top-level ``html`` field.
+
+    Args:
+        line (bytes): One line of an NDJSON file.
+
+    Returns:
+        Optional[str]: The article HTML, or None if the line has none.
+    """
+    if not line.strip():
+        return None
+    try:
+        record = json.loads(line)
+    except ValueError:
+        logging.getLogger(__name__).warning("Skipping malformed NDJSON record")
+        return None
+    if not isinstance(record, dict):
+        return None
+    body = record.get("article_body")
+    if isinstance(body, dict) and body.get("html"):
+        return body["html"]
+    return record.get("html")
+
+
+def _iter_ndjson_pages(
+    stream: BinaryIO, name: str, start: int = 0, end: Optional[int] = None
+) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the pages of the NDJSON lines that start inside a byte range.
+
+    A line belongs to the range containing its first byte, so adjacent
+    ranges of the same file never yield a line twice or miss one.
+
+    Args:
+        stream (BinaryIO): Uncompressed NDJSON stream.
+        name (str): Name used in page keys.
+        start (int): First byte of the range (the stream must be seekable if non-zero).
+        end (Optional[int]): Byte after the end of the range, or None for the rest of the stream.
+
+    Yields:
+        Tuple[str, str]: Page key and page HTML.
+    """
+    position = 0
+    if start > 0:
+        # Skip the line that straddles the start of the range
+        stream.seek(start - 1)
+        stream.readline()
+        position = stream.tell()
+
+    while end is None or position < end:
+        line = stream.readline()
+        if not line:
+            break
+        html = _page_html(line)
+        if html:
+            yield f"{name}@{position}", html
+        position += len(line)
+
+
+def _iter_task_pages(task: DumpTask) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the pages of one ingestion task.
+
+    Args:
+        task (DumpTask): Path, format, byte range and name of the task.
+
+    Yields:
+        Tuple[str, str]: Page key and page HTML.
+    """
+    path, dump_format, start, end, name = task
+
+    if dump_format == "tar":
+        # Stream mode reads the archive sequentially, without seeking
+        with tarfile.open(path, "r|*") as archive:
+            for member in archive:
+                member_format = _dump_format(member.name)
+                if not member.isfile() or member_format not in ("ndjson", "html"):
+                    continue
+                member_stream = archive.extractfile(member)
+                member_name = f"{name}/{member.name}"
+                if member_format == "ndjson":
+                    yield from _iter_ndjson_pages(member_stream, member_name)
+                else:
+                    yield member_name, member_stream.read().decode("utf-8", "replace")
+        return
+
+    with _open_binary(path) as stream:
+        if dump_format == "ndjson":
+            yield from _iter_ndjson_pages(stream, name, start, end)
+        else:
+            yield name, stream.read().decode("utf-8", "replace")
+
+
+def _iter_readable_pages(task: DumpTask) -> Iterator[Tuple[str, str]]:
+    """
+    Yield the pages of one ingestion task, stopping at the first read error.
+
+    Args:
+        task (DumpTask): Path, format, byte range and name of the task.
+
+    Yields:
+        Tuple[str, str]: Page key and page HTML.
+    """
+    try:
+        yield from _iter_task_pages(task)
+    except (OSError, EOFError, tarfile.TarError, lzma.LZMAError) as e:
+        logging.getLogger(__name__).error(f"Error reading dump file {task[0]}: {e}")
+
+
+def _chunks_for_pages(pages: List[Tuple[str, str]]) -> List[Dict[str, str]]:
+    """
+    Clean a batch of pages.
+
+    Module-level so it can be run by pool workers.
+
+    Args:
+        pages (List[Tuple[str, str]]): Page keys and page HTML.
+
+    Returns:
+        List[Dict[str, str]]: Chunks of all pages, in order.
+    """
+    chunks = []
+    for key, html in pages:
+        extractor = DataExtractor(url=key, body_fallback=True)
+        extractor.raw_content = html
+        chunks.extend(extractor.iter_chunks(id_prefix=f"{key}/"))
+    return chunks
+
+
+class DumpReader:
+    """
+    Class for building the corpus from Wikipedia dump files on local disk.
+
+    Supported inputs are single-page HTML files, NDJSON files of article
+    records (such as the Wikimedia Enterprise HTML dumps) and tar archives
+    of either, optionally compressed with gzip, bzip2 or xz. Files are read
+    as streams, so a dump never has to fit in memory, and every page is
+    cleaned with the same rules as DataExtractor.clean_data().
+
+    Pages are read in file order and cleaned by worker processes in small
+    batches, with a bounded number of batches in flight, so chunks stream
+    out while a single large archive is still being read. tasks() splits
+    uncompressed NDJSON files into byte ranges that can be read
+    independently. Chunk IDs are prefixed with
+    the file's path relative to its input directory and the byte offset of
+    their page, so they are unique across the whole dump and identical
+    between runs.
+    """
+
+    def __init__(
+        self,
+        paths: List[str],
+        num_processes: Optional[int] = None,
+        min_range_bytes: int = 64 * 1024 * 1024,
+    ):
+        """
+        Initialize the DumpReader with the dump files to read.
+
+        Args:
+            paths (List[str]): Dump files, or directories to search for dump files.
+            num_processes (Optional[int]): Number of worker processes (defaults to the CPU count).
+            min_range_bytes (int): Minimum size of a byte range when splitting an NDJSON file.
+        """
+        self.paths = paths
+        self.num_processes = num_processes or cpu_count()
+        self.min_range_bytes = min_range_bytes
+        self.logger = logging.getLogger(__name__)
+
+    def files(self) -> List[str]:
+        """
+        List the supported dump files, expanding directories recursively.
+
+        Returns:
+            List[str]: Paths of the dump files, in a stable order.
+        """
+        return [path for path, _ in self._named_files()]
+
+    def _named_files(self) -> List[Tuple[str, str]]:
+        """
+        List the supported dump files with the names used in their page keys.
+
+        A file found in a directory is named by its path relative to that
+        directory, and a file given directly by its base name. A name that
+        is already taken by another input falls back to the full path.
+
+        Returns:
+            List[Tuple[str, str]]: Path and name of each dump file, in a stable order.
+        """
+        files = []
+        for path in self.paths:
+            if os.path.isdir(path):
+                for directory, _, names in sorted(os.walk(path)):
+                    files.extend(
+                        (
+                            os.path.join(directory, name),
+                            os.path.relpath(
+                                os.path.join(directory, name), path
+                            ).replace(os.sep, "/"),
+                        )
+                        for name in sorted(names)
+                        if _dump_format(name)
+                    )
+            elif _dump_format(path):
+                files.append((path, os.path.basename(path)))
+            else:
+                self.logger.warning(f"Skipping unsupported dump file: {path}")
+
+        taken = set()
+        for i, (path, name) in enumerate(files):
+            if name in taken:
+                name = os.path.normpath(path).replace(os.sep, "/")
+                files[i] = (path, name)
+            taken.add(name)
+        return files
+
+    def tasks(self) -> List[DumpTask]:
+        """
+        Split the dump files into independent ingestion tasks.
+
+        Returns:
+            List[DumpTask]: Path, format, byte range and name of each task, in file order.
+        """
+        tasks = []
+        for path, name in self._named_files():
+            dump_format = _dump_format(path)
+            is_compressed = os.path.splitext(path)[1].lower() in COMPRESSED_OPENERS
+            if dump_format != "ndjson" or is_compressed:
+                tasks.append((path, dump_format, 0, None, name))
+                continue
+
+            size = os.path.getsize(path)
+            num_ranges = max(1, min(self.num_processes, size // self.min_range_bytes))
+            bounds = [size * i // num_ranges for i in range(num_ranges + 1)]
+            tasks.extend(
+                (path, dump_format, start, end, name)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            )
+        return tasks
+
+    def iter_pages(self) -> Iterator[Tuple[str, str]]:
+        """
+        Yield every page of the dump in file order, without cleaning it.
+
+        Yields:
+            Tuple[str, str]: Page key (file name and byte offset) and page HTML.
+        """
+        for task in self.tasks():
+            yield from _iter_task_pages(task)
+
+    def iter_chunks(self) -> Iterator[Dict[str, str]]:
+        """
+        Yield the cleaned chunks of every page, in file order.
+
+        With more than one process, batches of PAGES_PER_TASK pages are
+        cleaned by a process pool, at most TASKS_IN_FLIGHT_PER_PROCESS
+        batches per process at a time; results are consumed in order, so
+        the output is the same as a sequential run.
+
+        Yields:
+            Dict[str, str]: Dictionaries containing chunk ID and text.
+        """
+        pages = (page for task in self.tasks() for page in _iter_readable_pages(task))
+        if self.num_processes < 2:
+            for page in pages:
+                yield from _chunks_for_pages([page])
+            return
+
+        max_in_flight = TASKS_IN_FLIGHT_PER_PROCESS * self.num_processes
+        pending = deque()
+        with Pool(processes=self.num_processes) as pool:
+            while True:
+                batch = list(islice(pages, PAGES_PER_TASK))
+                if not batch:
+                    break
+                pending.append(pool.apply_async(_chunks_for_pages, (batch,)))
+                if len(pending) >= max_in_flight:
+                    yield from pending.popleft().get()
+            while pending:
+                yield from pending.popleft().get()
+
+    def extract_all(self) -> List[Dict[str, str]]:
+        """
+        Parse and clean the whole dump.
+
+        Returns:
+            List[Dict[str, str]]: Chunks of all pages in the dump.
+        """
+        chunks = list(self.iter_chunks())
+        self.logger.info(
+            f"Extracted {len(chunks)} chunks from {len(self.paths)} dump path(s)"
+        )
+        return chunks
@@ -0,0 +1,193 @@
+import os
+import json
+import hashlib
+import numpy as np
+import logging
+from typing import List, Dict, Optional
+
+
+class EmbeddingCache:
+    """
+    Append-only on-disk cache of chunk embeddings for one embedding model.
+
+    Vectors are stored as raw float32 rows in a single file that is read
+    through ``np.memmap``; a parallel index file holds one content hash per
+    line, so the line number of a hash is the row of its vector. New entries
+    are appended to both files, vectors first. An interrupted write can
+    leave vectors without an index entry, or the reverse; both files are cut
+    back to their common rows when the cache is opened, so later appends
+    keep line numbers and rows aligned.
+
+    The cache assumes a single writing process at a time.
+    """
+
+    META_FILE = "meta.json"
+    INDEX_FILE = "index.txt"
+    VECTORS_FILE = "vectors.f32"
+
+    def __init__(self, directory: str, model_name: str):
+        """
+        Open (or prepare to create) the cache for a model.
+
+        Args:
+            directory (str): Directory holding this model's cache files.
+            model_name (str): Name of the embedding model the vectors come from.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.directory = directory
+        self.model_name = model_name
+        self.vector_size = 0
+        self.rows: Dict[str, int] = {}
+        self._vectors: Optional[np.memmap] = None
+        self._load()
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name)
+
+    def _load(self) -> None:
+        """
+        Read the metadata and hash index of an existing cache.
+        """
+        if not os.path.exists(self._path(self.META_FILE)):
+            return
+
+        with open(self._path(self.META_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("model_name") != self.model_name:
+            self.logger.warning(
+                f"Ignoring embedding cache in {self.directory} built for {meta.get('model_name')}"
+            )
+            return
+        self.vector_size = meta["vector_size"]
+
+        with open(self._path(self.INDEX_FILE), encoding="utf-8") as f:
+            keys = f.read().split()
+
+        # Drop index entries whose vectors were never fully written, and
+        # vectors whose index entries were never written
+        row_bytes = 4 * self.vector_size
+        vectors_bytes = os.path.getsize(self._path(self.VECTORS_FILE))
+        num_rows = min(len(keys), vectors_bytes // row_bytes)
+        if vectors_bytes != num_rows * row_bytes:
+            self.logger.warning(
+                f"Truncating the embedding cache in {self.directory} "
+                f"to its {num_rows} indexed vectors"
+            )
+            with open(self._path(self.VECTORS_FILE), "r+b") as f:
+                f.truncate(num_rows * row_bytes)
+        if len(keys) != num_rows:
+            with open(self._path(self.INDEX_FILE), "w", encoding="utf-8") as f:
+                f.write("".join(f"{key}\n" for key in keys[:num_rows]))
+        self.rows = {key: row for row, key in enumerate(keys[:num_rows])}
+        self.logger.info(f"Loaded embedding cache with {num_rows} vectors")
+
+    def _vector_matrix(self) -> np.memmap:
+        """
+        Memory-map the stored vectors, reopening the file after appends.
+
+        Returns:
+            np.memmap: Read-only matrix of cached vectors.
+        """
+        if self._vectors is None or self._vectors.shape[0] < len(self.rows):
+            self._vectors = np.memmap(
+                self._path(self.VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(len(self.rows), self.vector_size),
+            )
+        return self._vectors
+
+    def key(self, text: str) -> str:
+        """
+        Compute the cache key for a chunk text.
+
+        Args:
+            text (str): Chunk text.
+
+        Returns:
+            str: Hex digest of the model name and text.
+        """
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(self.model_name.encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        return digest.hexdigest()
+
+    def get_many(self, texts: List[str]) -> Dict[int, np.ndarray]:
+        """
+        Look up cached embeddings for a list of texts.
+
+        Args:
+            texts (List[str]): Chunk texts to look up.
+
+        Returns:
+            Dict[int, np.ndarray]: Mapping from position in texts to cached embedding, for hits only.
+        """
+        if not self.rows:
+            return {}
+
+        positions, rows = [], []
+        for position, text in enumerate(texts):
+            row = self.rows.get(self.key(text))
+            if row is not None:
+                positions.append(position)
+                rows.append(row)
+        if not rows:
+            return {}
+
+        vectors = np.asarray(self._vector_matrix()[np.asarray(rows)])
+        return dict(zip(positions, vectors))
+
+    def put_many(self, texts: List[str], vectors: np.ndarray) -> None:
+        """
+        Append embeddings for texts that are not cached yet.
+
+        Vectors whose dimensionality differs from the stored rows are not
+        written, since a row of another size would shift every later row.
+
+        Args:
+            texts (List[str]): Chunk texts.
+            vectors (np.ndarray): Matrix with one embedding per text.
+        """
+        vectors = np.asarray(vectors)
+        if vectors.ndim != 2 or not np.issubdtype(vectors.dtype, np.floating):
+            self.logger.error(
+                f"Not caching embeddings of shape {vectors.shape} and dtype {vectors.dtype}"
+            )
+            return
+        if self.vector_size and vectors.shape[1] != self.vector_size:
+            self.logger.error(
+                f"Not caching {vectors.shape[1]}-d embeddings in the "
+                f"{self.vector_size}-d cache in {self.directory}"
+            )
+            return
+        if not self.vector_size:
+            self.vector_size = vectors.shape[1]
+            os.makedirs(self.directory, exist_ok=True)
+            with open(self._path(self.META_FILE), "w", encoding="utf-8") as f:
+                json.dump(
+                    {"model_name": self.model_name, "vector_size": self.vector_size},
+                    f,
+                )
+            # Start from empty files in case an older cache was ignored
+            open(self._path(self.INDEX_FILE), "w", encoding="utf-8").close()
+            open(self._path(self.VECTORS_FILE), "wb").close()
+
+        new_keys, new_rows = [], []
+        for text, vector in zip(texts, vectors):
+            key = self.key(text)
+            if key not in self.rows:
+                self.rows[key] = len(self.rows)
+                new_keys.append(key)
+                new_rows.append(vector)
+        if not new_keys:
+            return
+
+        with open(self._path(self.VECTORS_FILE), "ab") as f:
+            f.write(np.asarray(new_rows, dtype=np.float32).tobytes())
+        with open(self._path(self.INDEX_FILE), "a", encoding="utf-8") as f:
+            f.write("".join(f"{key}\n" for key in new_keys))
+        self.logger.debug(f"Cached {len(new_keys)} new embeddings")
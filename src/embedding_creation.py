@@ -1,38 +1,278 @@
+import os
+import hashlib
+import itertools
+from collections import deque
 import numpy as np
-import gensim.downloader as api
-from gensim.utils import simple_preprocess
 from multiprocessing import Pool, cpu_count
 import logging
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
+
+try:
+    from .word_vectors import WordVectorTable
+    from .embedding_cache import EmbeddingCache
+    from .tokenizer import tokenize, token_cache
+    from .metrics import metrics
+except ImportError:
+    from word_vectors import WordVectorTable
+    from embedding_cache import EmbeddingCache
+    from tokenizer import tokenize, token_cache
+    from metrics import metrics
+
+# Word vector table opened by each pool worker in _init_worker
+_worker_table: Optional[WordVectorTable] = None
+
+
+def _mean_word_vectors(
+    model,
+    texts: List[str],
+    vector_size: int,
+    token_lists: Optional[List[List[str]]] = None,
+) -> np.ndarray:
+    """
+    Create embeddings for many texts at once by averaging their word vectors.
+
+    Every token is mapped to its row in the model's vector matrix, all rows
+    are gathered in one fancy-indexing operation, and the per-text sums are
+    computed with a single ``np.add.reduceat`` segment sum.
+
+    Args:
+        model: Word vector model exposing ``key_to_index`` and ``vectors``
+            (a gensim KeyedVectors or a WordVectorTable).
+        texts (List[str]): Texts to embed.
+        vector_size (int): Dimensionality of the word vectors.
+        token_lists (Optional[List[List[str]]]): Tokens of each text, if already
+            known; otherwise the texts are tokenized here.
+
+    Returns:
+        np.ndarray: Matrix with one mean word vector per text. Texts without
+        any in-vocabulary word get a zero vector.
+    """
+    if token_lists is None:
+        with metrics.timer(
+            "embedding_tokenize_seconds", "Time to tokenize a batch of texts"
+        ):
+            token_lists = [tokenize(text) for text in texts]
+
+    key_to_index = model.key_to_index
+    counts = np.zeros(len(texts), dtype=np.int64)
+    indices = []
+
+    for i, tokens in enumerate(token_lists):
+        # Map the words to vocabulary rows
+        rows = [key_to_index[word] for word in tokens if word in key_to_index]
+        counts[i] = len(rows)
+        indices.extend(rows)
+
+    embeddings = np.zeros((len(texts), vector_size), dtype=np.float32)
+    if indices:
+        # Sum the word vectors of each text and divide by its word count
+        nonempty = counts > 0
+        offsets = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+        word_vectors = np.asarray(model.vectors[np.asarray(indices)], dtype=np.float32)
+        sums = np.add.reduceat(word_vectors, offsets, axis=0)
+        embeddings[nonempty] = sums / counts[nonempty, None]
+    return embeddings
+
+
+def _identity_digest(identity: str) -> str:
+    """
+    Short hash of a word vector table identity, used in directory names.
+
+    Args:
+        identity (str): Identity returned by EmbeddingCreator.table_identity().
+
+    Returns:
+        str: 16 hex digits.
+    """
+    return hashlib.blake2b(identity.encode("utf-8"), digest_size=8).hexdigest()
+
+
+def _init_worker(vectors_dir: str) -> None:
+    """
+    Open the shared word vector table once per pool worker.
+
+    Args:
+        vectors_dir (str): Directory containing the saved WordVectorTable.
+    """
+    global _worker_table
+    _worker_table = WordVectorTable.load(vectors_dir, mmap=True)
+
+
+def _embed_batch_in_worker(
+    batch: Tuple[List[str], List[str]],
+) -> Tuple[List[str], np.ndarray]:
+    """
+    Create embeddings for a batch of chunks inside a pool worker.
+
+    Args:
+        batch (Tuple[List[str], List[str]]): Chunk IDs and their texts.
+
+    Returns:
+        Tuple[List[str], np.ndarray]: Chunk IDs and their embedding matrix.
+    """
+    chunk_ids, texts = batch
+    return chunk_ids, _mean_word_vectors(
+        _worker_table, texts, _worker_table.vector_size
+    )
 
 
 class EmbeddingCreator:
     """
     Class for creating embeddings for text chunks using multiprocessing.
+
+    Small batches are embedded in-process with a vectorized gather and
+    segment sum. Batches large enough to pay for inter-process overhead go
+    to a persistent pool whose workers open a memory-mapped copy of the word
+    vector table, so only chunk text is sent to them for each task.
     """
 
-    def __init__(self, model_name: str = "glove-wiki-gigaword-100"):
+    def __init__(
+        self,
+        model_name: str = "glove-wiki-gigaword-100",
+        cache_dir: str = "cache",
+        num_processes: Optional[int] = None,
+        parallel_min_chars: int = 1_000_000,
+        use_cache: bool = True,
+        vectors_path: Optional[str] = None,
+    ):
         """
         Initialize the EmbeddingCreator with a pre-trained word embedding model.
 
         Args:
             model_name (str): Name of the pre-trained word embedding model to use.
+            cache_dir (str): Directory where the word vector table shared with workers is stored.
+            num_processes (Optional[int]): Number of worker processes (defaults to the CPU count).
+            parallel_min_chars (int): Minimum total text length of a batch before the worker pool is used.
+            use_cache (bool): Reuse embeddings of previously seen chunk texts from the on-disk cache.
+            vectors_path (Optional[str]): Local word vectors to use instead of downloading
+                model_name: a directory holding a saved WordVectorTable, or a GloVe or
+                word2vec text file, converted into cache_dir on first use.
         """
         self.logger = logging.getLogger(__name__)
         self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.vectors_path = vectors_path
+        self.num_processes = num_processes or cpu_count()
+        self.parallel_min_chars = parallel_min_chars
+        self.cache = None
+        if use_cache:
+            identity = self.table_identity()
+            self.cache = EmbeddingCache(
+                os.path.join(cache_dir, "embeddings", self._cache_name(identity)),
+                identity,
+            )
         self.model = None
         self.vector_size = 0
+        self._fallback: Optional[WordVectorTable] = None
+        self._pool = None
+
+    @property
+    def vectors_dir(self) -> str:
+        """
+        Directory holding the memory-mappable word vector table for this model.
+
+        A text file is converted into a directory named after the file and a
+        hash of its table_identity(), so a changed file, or another file
+        with the same name, is converted again instead of reusing a stale
+        table.
+        """
+        if self.vectors_path and not os.path.isfile(self.vectors_path):
+            return self.vectors_path
+        if self.vectors_path:
+            name = os.path.basename(self.vectors_path)
+            for suffix in (".gz", ".txt"):
+                name = name[: -len(suffix)] if name.endswith(suffix) else name
+            return os.path.join(
+                self.cache_dir, f"{name}-{_identity_digest(self.table_identity())}"
+            )
+        return os.path.join(self.cache_dir, self.model_name)
+
+    def table_identity(self) -> str:
+        """
+        Identify the word vectors embeddings are computed with, for the embedding cache.
+
+        A model downloaded by name is identified by that name, since its
+        converted table is always the same. Local vectors are identified by
+        the resolved path plus the size and modification time of their files,
+        so replacing the table at the same path starts a new cache.
+
+        Returns:
+            str: The identity.
+        """
+        if not self.vectors_path:
+            return self.model_name
+        path = os.path.abspath(self.vectors_path)
+        files = (
+            [path]
+            if os.path.isfile(path)
+            else [
+                os.path.join(path, WordVectorTable.VECTORS_FILE),
+                os.path.join(path, WordVectorTable.VOCAB_FILE),
+            ]
+        )
+        stats = []
+        for file_path in files:
+            try:
+                stat = os.stat(file_path)
+                stats.append(f"{stat.st_size}:{stat.st_mtime_ns}")
+            except OSError:
+                stats.append("missing")
+        return f"{path}@{','.join(stats)}"
+
+    def _cache_name(self, identity: str) -> str:
+        """
+        Name of the embedding cache directory for a table identity.
+
+        Args:
+            identity (str): Identity returned by table_identity().
+
+        Returns:
+            str: The model name, or the name of the local vectors plus a hash of their identity.
+        """
+        if not self.vectors_path:
+            return self.model_name
+        name = os.path.basename(os.path.normpath(self.vectors_path))
+        return f"{name}-{_identity_digest(identity)}"
+
+    def _convert_model(self) -> None:
+        """
+        Convert the word vectors to a WordVectorTable saved in vectors_dir.
+
+        This is done once: the vectors are read from the local text file in
+        vectors_path, or fetched and parsed with gensim's downloader.
+        """
+        if self.vectors_path and os.path.isfile(self.vectors_path):
+            self.logger.info(f"Converting word vectors from {self.vectors_path}")
+            table = WordVectorTable.from_text(self.vectors_path)
+        elif self.vectors_path:
+            raise FileNotFoundError(f"No word vector table in {self.vectors_path}")
+        else:
+            import gensim.downloader as api
+
+            self.logger.info(f"Converting {self.model_name} from gensim's downloader")
+            table = WordVectorTable.from_keyed_vectors(api.load(self.model_name))
+        table.save(self.vectors_dir)
 
     def load_model(self) -> bool:
         """
         Load the pre-trained word embedding model.
 
+        The vectors are memory-mapped read-only from the table in
+        vectors_dir, so loading is nearly instant and every process using
+        the model shares one copy in the page cache. The table is created
+        on the first load.
+
         Returns:
             bool: True if model was loaded successfully, False otherwise.
         """
         try:
             self.logger.info(f"Loading word embedding model: {self.model_name}")
-            self.model = api.load(self.model_name)
+            with metrics.timer(
+                "embedding_model_load_seconds", "Time to load the word vector model"
+            ):
+                if not WordVectorTable.exists(self.vectors_dir):
+                    self._convert_model()
+                self.model = WordVectorTable.load(self.vectors_dir, mmap=True)
             self.vector_size = self.model.vector_size
             self.logger.info(
                 f"Model loaded successfully. Vector size: {self.vector_size}"
@@ -58,59 +298,389 @@ class EmbeddingCreator:
             return chunk["id"], None
 
         try:
-            # Tokenize text into words
-            words = simple_preprocess(chunk["text"])
+            return (
+                chunk["id"],
+                _mean_word_vectors(
+                    self.model,
+                    [chunk["text"]],
+                    self.vector_size,
+                    [token_cache.tokens(chunk["id"], chunk["text"])],
+                )[0],
+            )
+        except Exception as e:
+            self.logger.error(f"Error creating embedding for chunk {chunk['id']}: {e}")
+            return chunk["id"], None
 
-            # Get word vectors for each word and average them
-            word_vectors = [self.model[word] for word in words if word in self.model]
+    def _get_pool(self):
+        """
+        Return the persistent worker pool, starting it on first use.
 
-            if not word_vectors:
-                return chunk["id"], np.zeros(self.vector_size)
+        The word vector table is written to the cache directory as a plain
+        ``.npy`` matrix the first time a pool is needed, and every worker
+        memory-maps it read-only in its initializer.
 
-            # Average word vectors to create chunk embedding
-            embedding = np.mean(word_vectors, axis=0)
-            return chunk["id"], embedding
+        Returns:
+            multiprocessing.pool.Pool: The worker pool.
+        """
+        if self._pool is None:
+            if not WordVectorTable.exists(self.vectors_dir):
+                self.logger.info(f"Exporting word vectors to {self.vectors_dir}")
+                table = (
+                    self.model
+                    if isinstance(self.model, WordVectorTable)
+                    else WordVectorTable.from_keyed_vectors(self.model)
+                )
+                table.save(self.vectors_dir)
 
-        except Exception as e:
-            self.logger.error(f"Error creating embedding for chunk {chunk['id']}: {e}")
-            return chunk["id"], None
+            self.logger.info(
+                f"Starting embedding pool with {self.num_processes} processes"
+            )
+            with metrics.timer(
+                "embedding_pool_start_seconds", "Time to start the embedding pool"
+            ):
+                self._pool = Pool(
+                    processes=self.num_processes,
+                    initializer=_init_worker,
+                    initargs=(self.vectors_dir,),
+                )
+        return self._pool
 
-    def create_embeddings(self, chunks: List[Dict[str, str]]) -> Dict[str, np.ndarray]:
+    def close(self) -> None:
         """
-        Create embeddings for text chunks using multiprocessing.
+        Shut down the worker pool if one was started.
+        """
+        if self._pool is not None:
+            self._pool.close()
+            self._pool.join()
+            self._pool = None
+
+    def __enter__(self) -> "EmbeddingCreator":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+
+    def _should_use_pool(self, chunks: List[Dict[str, str]]) -> bool:
+        """
+        Decide whether a batch is large enough to be worth sending to the pool.
+
+        Tokenization dominates the cost of embedding and grows with text
+        length, while the pool adds a fixed startup cost plus per-task IPC.
+        The pool is only used when the batch has enough text and enough
+        chunks to keep every worker busy.
 
         Args:
-            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+            chunks (List[Dict[str, str]]): Chunks about to be embedded.
 
         Returns:
-            Dict[str, np.ndarray]: Dictionary mapping chunk IDs to embedding vectors.
+            bool: True if the worker pool should be used.
+        """
+        if self.num_processes < 2 or len(chunks) < self.num_processes:
+            return False
+        return sum(len(chunk["text"]) for chunk in chunks) >= self.parallel_min_chars
+
+    def _embed_in_pool(
+        self, chunks: List[Dict[str, str]]
+    ) -> List[Tuple[List[str], np.ndarray]]:
+        """
+        Create embeddings in the worker pool, a batch of chunks per task.
+
+        Args:
+            chunks (List[Dict[str, str]]): Chunks to embed.
+
+        Returns:
+            List[Tuple[List[str], np.ndarray]]: Chunk IDs and embedding matrix per batch.
+        """
+        pool = self._get_pool()
+
+        # Only chunk IDs and text are sent to the workers
+        batch_size = max(1, len(chunks) // (self.num_processes * 4))
+        batches = [
+            (
+                [chunk["id"] for chunk in chunks[i : i + batch_size]],
+                [chunk["text"] for chunk in chunks[i : i + batch_size]],
+            )
+            for i in range(0, len(chunks), batch_size)
+        ]
+        return pool.map(_embed_batch_in_worker, batches)
+
+    def _compute_embeddings(self, chunks: List[Dict[str, str]]) -> np.ndarray:
+        """
+        Compute embeddings with the word vector model, in-process or in the pool.
+
+        Args:
+            chunks (List[Dict[str, str]]): Chunks to embed.
+
+        Returns:
+            np.ndarray: Matrix with one embedding per chunk, in input order.
+        """
+        if self._should_use_pool(chunks):
+            self.logger.info(
+                f"Creating embeddings using {self.num_processes} processes"
+            )
+            return np.vstack([matrix for _, matrix in self._embed_in_pool(chunks)])
+
+        self.logger.debug(f"Creating embeddings for {len(chunks)} chunks in-process")
+        with metrics.timer(
+            "embedding_tokenize_seconds", "Time to tokenize a batch of texts"
+        ):
+            token_lists = [
+                token_cache.tokens(chunk["id"], chunk["text"]) for chunk in chunks
+            ]
+        return _mean_word_vectors(
+            self.model,
+            [chunk["text"] for chunk in chunks],
+            self.vector_size,
+            token_lists,
+        )
+
+    def _cached_vectors(
+        self, chunks: List[Dict[str, str]]
+    ) -> Tuple[Dict[int, np.ndarray], List[int]]:
+        """
+        Look chunks up in the on-disk cache.
+
+        Args:
+            chunks (List[Dict[str, str]]): Chunks to look up.
+
+        Returns:
+            Tuple[Dict[int, np.ndarray], List[int]]: Cached embeddings by chunk position,
+            and the positions of chunks that still need to be computed.
+        """
+        vectors = (
+            self.cache.get_many([chunk["text"] for chunk in chunks])
+            if self.cache is not None
+            else {}
+        )
+        if self.cache is not None:
+            metrics.counter(
+                "embedding_cache_hits_total", "Chunk embeddings found in the cache"
+            ).inc(len(vectors))
+            metrics.counter(
+                "embedding_cache_misses_total", "Chunk embeddings not in the cache"
+            ).inc(len(chunks) - len(vectors))
+        return vectors, [i for i in range(len(chunks)) if i not in vectors]
+
+    def _store_computed(
+        self,
+        chunks: List[Dict[str, str]],
+        vectors: Dict[int, np.ndarray],
+        misses: List[int],
+        computed: np.ndarray,
+    ) -> None:
+        """
+        Merge newly computed embeddings into a batch's results and the cache.
+
+        Args:
+            chunks (List[Dict[str, str]]): The whole batch of chunks.
+            vectors (Dict[int, np.ndarray]): Embeddings by chunk position, updated in place.
+            misses (List[int]): Positions of the chunks that were computed.
+            computed (np.ndarray): Embedding matrix for the missed chunks, in order.
+        """
+        vectors.update(zip(misses, computed))
+        if self.cache is not None:
+            self.cache.put_many([chunks[i]["text"] for i in misses], computed)
+
+    def _query_model(self, tokens: List[str]):
+        """
+        Choose the table to embed a query with.
+
+        A table pruned to the corpus vocabulary lacks words that only occur
+        in queries. If a query has such a word and the table names its full
+        table, the query is embedded with the full table, which is
+        memory-mapped on first use.
+
+        Args:
+            tokens (List[str]): Tokens of the query.
+
+        Returns:
+            The model to embed the query with.
+        """
+        fallback_dir = getattr(self.model, "fallback_dir", None)
+        if not fallback_dir or all(token in self.model for token in tokens):
+            return self.model
+        if self._fallback is None:
+            try:
+                self._fallback = WordVectorTable.load(fallback_dir, mmap=True)
+            except (OSError, ValueError) as e:
+                self.logger.warning(f"Error loading fallback word vectors: {e}")
+                return self.model
+        metrics.counter(
+            "embedding_query_fallbacks_total",
+            "Queries embedded with the full word vector table",
+        ).inc()
+        return self._fallback
+
+    def embed_query(self, text: str) -> Optional[np.ndarray]:
+        """
+        Create an embedding for a single query text in-process.
+
+        Queries bypass the on-disk cache and the worker pool, so the cost is
+        only the tokenization and a handful of vector lookups.
+
+        Args:
+            text (str): Query text.
+
+        Returns:
+            Optional[np.ndarray]: Query embedding, or None if the model could not be loaded.
         """
         if not self.model:
             if not self.load_model():
-                return {}
+                return None
+        with metrics.timer("embedding_query_seconds", "Time to embed a query"):
+            tokens = tokenize(text)
+            return _mean_word_vectors(
+                self._query_model(tokens), [text], self.vector_size, [tokens]
+            )[0]
+
+    def create_embeddings(self, chunks: List[Dict[str, str]]) -> Dict[str, np.ndarray]:
+        """
+        Create embeddings for text chunks, using multiprocessing for large batches.
+
+        Chunks whose text is already in the on-disk cache are not recomputed,
+        and the model is only loaded if at least one chunk is missing.
 
-        embeddings = {}
+        Args:
+            chunks (List[Dict[str, str]]): List of dictionaries containing chunk ID and text.
+
+        Returns:
+            Dict[str, np.ndarray]: Dictionary mapping chunk IDs to embedding vectors.
+        """
         if not chunks:
             self.logger.warning("No chunks provided for embedding creation.")
-            return embeddings
+            return {}
 
         try:
-            # Determine number of processes to use
-            num_processes = min(cpu_count(), len(chunks))
-            self.logger.info(f"Creating embeddings using {num_processes} processes")
+            vectors, misses = self._cached_vectors(chunks)
+            if vectors:
+                self.logger.info(
+                    f"Found {len(vectors)} of {len(chunks)} embeddings in cache"
+                )
 
-            # Create embeddings in parallel
-            with Pool(processes=num_processes) as pool:
-                results = pool.map(self._create_embedding_for_chunk, chunks)
+            if misses:
+                if not self.model:
+                    if not self.load_model():
+                        return {}
+
+                missing_chunks = [chunks[i] for i in misses]
+                with metrics.timer(
+                    "embedding_compute_seconds",
+                    "Time to compute the embeddings of a batch of chunks",
+                ):
+                    computed = self._compute_embeddings(missing_chunks)
+                self._store_computed(chunks, vectors, misses, computed)
+                metrics.counter(
+                    "embedding_chunks_total", "Chunk embeddings computed"
+                ).inc(len(misses))
 
             # Convert results to dictionary
-            for chunk_id, embedding in results:
-                if embedding is not None:
-                    embeddings[chunk_id] = embedding
+            embeddings = {chunk["id"]: vectors[i] for i, chunk in enumerate(chunks)}
 
             self.logger.info(f"Created embeddings for {len(embeddings)} chunks")
             return embeddings
 
         except Exception as e:
-            self.logger.error(f"Error in parallel embedding creation: {e}")
+            self.logger.error(f"Error in embedding creation: {e}")
             return {}
+
+    def create_embeddings_stream(
+        self,
+        chunks: Iterable[Dict[str, str]],
+        batch_size: int = 256,
+        max_in_flight: Optional[int] = None,
+        parallel: bool = True,
+    ) -> Iterator[Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]]:
+        """
+        Create embeddings for a stream of chunks in bounded batches.
+
+        Chunks are pulled from the iterable only as needed, so memory stays
+        proportional to batch_size regardless of corpus size. With more than
+        one process, batches are handed to the worker pool asynchronously,
+        and up to max_in_flight of them are embedded while the caller's
+        iterable keeps producing the next ones. Parsing and embedding then
+        overlap instead of running one after the other.
+
+        Args:
+            chunks (Iterable[Dict[str, str]]): Chunks to embed, e.g. DataExtractor.iter_chunks().
+            batch_size (int): Number of chunks per batch.
+            max_in_flight (Optional[int]): Maximum number of batches being embedded at once
+                (defaults to twice the number of processes).
+            parallel (bool): Embed batches in the worker pool; if False, or with a single
+                process, batches are embedded in-process one at a time.
+
+        Yields:
+            Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]: Each batch of chunks, in input
+            order, with a dictionary mapping its chunk IDs to embedding vectors.
+        """
+        use_pool = parallel and self.num_processes > 1
+        max_in_flight = max_in_flight or 2 * self.num_processes
+        pending = deque()
+        iterator = iter(chunks)
+
+        while True:
+            batch = list(itertools.islice(iterator, batch_size))
+            if not batch:
+                break
+
+            vectors, misses = self._cached_vectors(batch)
+            task = None
+            if misses:
+                if not self.model and not self.load_model():
+                    return
+                missing_chunks = [batch[i] for i in misses]
+                if use_pool:
+                    task = self._get_pool().apply_async(
+                        _embed_batch_in_worker,
+                        (
+                            (
+                                [chunk["id"] for chunk in missing_chunks],
+                                [chunk["text"] for chunk in missing_chunks],
+                            ),
+                        ),
+                    )
+                else:
+                    task = _mean_word_vectors(
+                        self.model,
+                        [chunk["text"] for chunk in missing_chunks],
+                        self.vector_size,
+                        [
+                            token_cache.tokens(chunk["id"], chunk["text"])
+                            for chunk in missing_chunks
+                        ],
+                    )
+            pending.append((batch, vectors, misses, task))
+
+            while len(pending) >= max_in_flight or (pending and not use_pool):
+                yield self._finish_stream_batch(*pending.popleft())
+
+        while pending:
+            yield self._finish_stream_batch(*pending.popleft())
+
+    def _finish_stream_batch(
+        self,
+        batch: List[Dict[str, str]],
+        vectors: Dict[int, np.ndarray],
+        misses: List[int],
+        task,
+    ) -> Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]:
+        """
+        Wait for a streamed batch's embeddings and assemble its result.
+
+        Args:
+            batch (List[Dict[str, str]]): The batch of chunks.
+            vectors (Dict[int, np.ndarray]): Cached embeddings by chunk position.
+            misses (List[int]): Positions of chunks that were computed.
+            task: Computed embedding matrix, or the pool's AsyncResult for it.
+
+        Returns:
+            Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]: The batch and its embeddings,
+            or an empty dictionary if embedding failed.
+        """
+        try:
+            if misses:
+                computed = task if isinstance(task, np.ndarray) else task.get()[1]
+                self._store_computed(batch, vectors, misses, computed)
+            return batch, {chunk["id"]: vectors[i] for i, chunk in enumerate(batch)}
+        except Exception as e:
+            self.logger.error(f"Error in streamed embedding creation: {e}")
+            return batch, {}
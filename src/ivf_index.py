@@ -0,0 +1,402 @@
+import numpy as np
+from concurrent.futures import Executor
+from typing import List, Dict, Tuple, Optional, Any
+
+try:
+    from .vector_index import VectorIndex, normalize_rows, top_k_indices
+except ImportError:
+    from vector_index import VectorIndex, normalize_rows, top_k_indices
+
+
+def assign_to_centroids(
+    matrix: np.ndarray, centroids: np.ndarray, block: int = 16384
+) -> np.ndarray:
+    """
+    Assign each row of a matrix to its most similar centroid.
+
+    Rows are processed in blocks so the score matrix stays bounded.
+
+    Args:
+        matrix (np.ndarray): 2-D array of unit-norm row vectors.
+        centroids (np.ndarray): 2-D array of unit-norm centroids.
+        block (int): Maximum number of rows scored at once.
+
+    Returns:
+        np.ndarray: Index of the nearest centroid for each row.
+    """
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], block):
+        scores = matrix[start : start + block] @ centroids.T
+        assignments[start : start + block] = np.argmax(scores, axis=1)
+    return assignments
+
+
+def train_centroids(
+    sample: np.ndarray, nlist: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Cluster unit-norm vectors with spherical k-means.
+
+    Centroids start from randomly chosen sample rows. Each iteration
+    assigns rows to their most similar centroid and replaces every centroid
+    with the normalized sum of its rows; empty clusters are re-seeded from
+    random rows.
+
+    Args:
+        sample (np.ndarray): 2-D array of unit-norm training vectors.
+        nlist (int): Number of clusters (at most the number of sample rows).
+        iterations (int): Number of k-means iterations.
+        rng (np.random.Generator): Random generator for the initialization.
+
+    Returns:
+        np.ndarray: Matrix of nlist unit-norm centroids.
+    """
+    centroids = sample[rng.choice(sample.shape[0], nlist, replace=False)]
+    for _ in range(iterations):
+        assignments = assign_to_centroids(sample, centroids)
+        counts = np.bincount(assignments, minlength=nlist)
+        nonempty = counts > 0
+
+        # Sum the rows of each cluster with one segment sum over sorted rows
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+        sums = np.empty_like(centroids)
+        sums[nonempty] = np.add.reduceat(sample[order], offsets, axis=0)
+        sums[~nonempty] = sample[
+            rng.choice(sample.shape[0], int((~nonempty).sum()), replace=False)
+        ]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+class IVFIndex(VectorIndex):
+    """
+    Approximate cosine-similarity index with an inverted file (IVF).
+
+    The vectors are clustered with spherical k-means into nlist lists and
+    stored list by list in one contiguous matrix. A query is compared with
+    the centroids first and only the vectors of the nprobe most similar
+    lists are scored, so with nlist around sqrt(n) a query scans
+    O(sqrt(n)) vectors instead of all n. Raising nprobe trades latency for
+    recall; nprobe == nlist gives the same results as an exact scan.
+
+    Vectors added after the build are assigned to their nearest centroid
+    and kept in an unsorted tail after the lists; compaction regroups them
+    into their lists.
+    """
+
+    def __init__(
+        self,
+        embeddings: Dict[str, np.ndarray],
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        train_iterations: int = 10,
+        train_size_per_list: int = 256,
+        seed: int = 0,
+    ):
+        """
+        Build the index from a dictionary of embeddings.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+            nlist (Optional[int]): Number of inverted lists (defaults to 4 * sqrt(n)).
+            nprobe (int): Number of lists scanned per query.
+            train_iterations (int): Number of k-means iterations.
+            train_size_per_list (int): Training vectors sampled per list for k-means.
+            seed (int): Seed for the training sample and centroid initialization.
+        """
+        super().__init__(embeddings)
+        self.requested_nlist = nlist
+        self.nprobe = nprobe
+        self.train_params = (train_iterations, train_size_per_list, seed)
+        self.centroids = np.empty((0, self.dim), dtype=np.float32)
+        self.list_offsets = np.zeros(1, dtype=np.int64)
+        # Nearest list of each row appended after the lists were built
+        self.tail_lists = np.empty(0, dtype=np.int64)
+
+        self.nlist = self._default_nlist(len(self.ids))
+        if self.ids:
+            self._build(*self.train_params)
+
+    def _default_nlist(self, num_vectors: int) -> int:
+        """
+        Number of lists for an index of the given size.
+
+        Args:
+            num_vectors (int): Number of indexed vectors.
+
+        Returns:
+            int: The requested nlist (or 4 * sqrt(n)), capped by the number of vectors.
+        """
+        return max(
+            1, min(self.requested_nlist or int(4 * np.sqrt(num_vectors)), num_vectors)
+        )
+
+    def _build(self, train_iterations: int, train_size_per_list: int, seed: int):
+        """
+        Train the centroids and regroup the vectors by inverted list.
+
+        Args:
+            train_iterations (int): Number of k-means iterations.
+            train_size_per_list (int): Training vectors sampled per list for k-means.
+            seed (int): Seed for the training sample and centroid initialization.
+        """
+        rng = np.random.default_rng(seed)
+        num_vectors = len(self.ids)
+        train_size = self.nlist * train_size_per_list
+        if num_vectors > train_size:
+            sample = self.matrix[
+                np.sort(rng.choice(num_vectors, train_size, replace=False))
+            ]
+        else:
+            sample = self.matrix
+        self.centroids = train_centroids(sample, self.nlist, train_iterations, rng)
+
+        # Store each list as a contiguous block of rows
+        assignments = assign_to_centroids(self.matrix, self.centroids)
+        order = np.argsort(assignments, kind="stable")
+        self.matrix = self.matrix[order]
+        self.ids = [self.ids[i] for i in order]
+        self.list_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(assignments, minlength=self.nlist)))
+        )
+        self.tail_lists = np.empty(0, dtype=np.int64)
+        self._rows = None
+        self.logger.info(
+            f"Built IVF index with {self.nlist} lists over {num_vectors} vectors"
+        )
+
+    def _append(self, matrix: np.ndarray) -> None:
+        """
+        Store vectors for appended rows in the tail, with their nearest list.
+
+        Args:
+            matrix (np.ndarray): Normalized vectors, one per new row.
+        """
+        if not len(self.centroids):
+            # Nothing to assign to yet: build the lists from scratch
+            self._append_array("matrix", matrix)
+            self.nlist = self._default_nlist(len(self.ids))
+            self._build(*self.train_params)
+            return
+        self._append_array("tail_lists", assign_to_centroids(matrix, self.centroids))
+        self._append_array("matrix", matrix)
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """
+        Keep only the given rows and regroup the tail into the lists.
+
+        Args:
+            keep (np.ndarray): Indices of the rows to keep, in order.
+        """
+        body_lists = np.repeat(np.arange(self.nlist), np.diff(self.list_offsets))
+        assignments = np.concatenate(
+            [body_lists, self.tail_lists[: len(self.matrix) - len(body_lists)]]
+        )[keep]
+        order = np.argsort(assignments, kind="stable")
+        self.matrix = self.matrix[keep[order]]
+        self.ids = [self.ids[i] for i in order]
+        self.list_offsets = np.concatenate(
+            ([0], np.cumsum(np.bincount(assignments, minlength=self.nlist)))
+        )
+        self.tail_lists = np.empty(0, dtype=np.int64)
+
+    def needs_compaction(self, threshold: float) -> bool:
+        """
+        Whether removed rows or the unsorted tail make compaction worthwhile.
+
+        Args:
+            threshold (float): Maximum fraction of removed or tail rows.
+
+        Returns:
+            bool: True if either fraction exceeds the threshold.
+        """
+        return super().needs_compaction(threshold) or len(
+            self.tail_lists
+        ) > threshold * max(len(self.ids), 1)
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Arrays that make up the index state, saved as one .npy file each.
+        """
+        arrays = super()._arrays()
+        arrays.update(
+            centroids=self.centroids,
+            list_offsets=self.list_offsets,
+            tail_lists=self.tail_lists,
+        )
+        return arrays
+
+    def _params(self) -> Dict[str, Any]:
+        """
+        JSON-serializable settings saved alongside the arrays.
+        """
+        return {
+            "nlist": self.nlist,
+            "nprobe": self.nprobe,
+            "requested_nlist": self.requested_nlist,
+            "train_params": list(self.train_params),
+        }
+
+    def _restore(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> None:
+        """
+        Set the index state from saved arrays and settings.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays returned by _arrays() when saving.
+            params (Dict[str, Any]): Settings returned by _params() when saving.
+        """
+        super()._restore(arrays, params)
+        self.centroids = arrays["centroids"]
+        self.list_offsets = arrays["list_offsets"]
+        self.tail_lists = arrays.get("tail_lists", np.empty(0, dtype=np.int64))
+        self.nlist = params["nlist"]
+        self.nprobe = params["nprobe"]
+        self.requested_nlist = params.get("requested_nlist")
+        self.train_params = tuple(params.get("train_params", (10, 256, 0)))
+
+    def probe_lists(self, query: np.ndarray, nprobe: int) -> np.ndarray:
+        """
+        Select the lists whose centroids are most similar to a query.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            nprobe (int): Number of lists to select.
+
+        Returns:
+            np.ndarray: Indices of the selected lists, best first.
+        """
+        return top_k_indices(self.centroids @ query, nprobe)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 3,
+        nprobe: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the approximate top-k most similar vectors to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            nprobe (Optional[int]): Number of lists to scan (defaults to self.nprobe).
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        if not len(self):
+            return []
+
+        query = self.prepare_query(query_embedding)
+        matrix = self.matrix
+        lists = self.probe_lists(query, nprobe or self.nprobe)
+        starts, ends = self.list_offsets[lists], self.list_offsets[lists + 1]
+
+        # Score only the rows of the probed lists and of the tail rows in them
+        body_end = self.list_offsets[-1]
+        tail_lists = self.tail_lists[: len(matrix) - body_end]
+        tail_rows = body_end + np.flatnonzero(np.isin(tail_lists, lists))
+        rows = np.concatenate(
+            [np.arange(s, e) for s, e in zip(starts, ends)] + [tail_rows]
+        )
+        scores = np.concatenate(
+            [matrix[s:e] @ query for s, e in zip(starts, ends)]
+            + [matrix[tail_rows] @ query]
+        )
+        if self.num_deleted:
+            scores[self.deleted[rows]] = -np.inf
+        return [
+            (self.ids[rows[i]], float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] > -np.inf
+        ]
+
+    def search_parallel(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        executor: Executor,
+        num_shards: int,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors.
+
+        A query only scans the probed lists, which is too little work to
+        split across threads, so it runs on the calling thread.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            executor (Executor): Unused.
+            num_shards (int): Unused.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        return self.search(query_embedding, top_k)
+
+    def search_batch(
+        self,
+        query_matrix: np.ndarray,
+        top_k: int = 3,
+        nprobe: Optional[int] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the approximate top-k most similar vectors for each query.
+
+        Args:
+            query_matrix (np.ndarray): 2-D array with one query embedding per row.
+            top_k (int): Number of results to return per query.
+            nprobe (Optional[int]): Number of lists to scan (defaults to self.nprobe).
+
+        Returns:
+            List[List[Tuple[str, float]]]: For each query, (chunk ID, similarity) pairs, best first.
+        """
+        return [
+            self.search(query, top_k, nprobe) for query in np.atleast_2d(query_matrix)
+        ]
+
+    def recall(
+        self,
+        query_matrix: Optional[np.ndarray] = None,
+        top_k: int = 10,
+        nprobe: Optional[int] = None,
+        num_queries: int = 100,
+        seed: int = 0,
+    ) -> float:
+        """
+        Measure the recall of the approximate search against an exact scan.
+
+        Without a query matrix, a random sample of the indexed vectors is
+        used as queries. Such queries always find their own list, so real
+        queries give a more conservative figure.
+
+        Args:
+            query_matrix (Optional[np.ndarray]): 2-D array with one query embedding per row.
+            top_k (int): Number of results compared per query.
+            nprobe (Optional[int]): Number of lists to scan (defaults to self.nprobe).
+            num_queries (int): Number of sampled queries when no query matrix is given.
+            seed (int): Seed for the query sample.
+
+        Returns:
+            float: Fraction of the exact top-k results that the approximate search also returns.
+        """
+        if query_matrix is None:
+            rng = np.random.default_rng(seed)
+            sample_size = min(num_queries, len(self.ids))
+            query_matrix = self.matrix[
+                rng.choice(len(self.ids), sample_size, replace=False)
+            ]
+
+        exact = VectorIndex.search_batch(self, query_matrix, top_k)
+        approximate = self.search_batch(query_matrix, top_k, nprobe)
+
+        expected = sum(len(results) for results in exact)
+        if not expected:
+            return 1.0
+        found = sum(
+            len({i for i, _ in a} & {i for i, _ in e})
+            for a, e in zip(approximate, exact)
+        )
+        return found / expected
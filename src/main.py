@@ -7,11 +7,11 @@ import argparse
 from datetime import datetime
 
 # Import our modules
-from data_extraction import DataExtractor
 from embedding_creation import EmbeddingCreator
 from document_retrieval import DocumentRetriever
-from text_processing import TextProcessor
-from utils import setup_logging
+from text_processing import TextProcessor, NLTK_DATA_DIR
+from utils import setup_logging, format_metrics
+from metrics import metrics
 
 
 async def main():
@@ -23,17 +23,122 @@ async def main():
         description="Retrieval-Augmented Generation (RAG) Pipeline"
     )
     parser.add_argument(
-        "query", type=str, help="Query to search for in the Wikipedia page"
+        "query",
+        type=str,
+        nargs="?",
+        help="Query to search for in the Wikipedia page (not used with --serve)",
     )
     parser.add_argument(
         "--url",
         type=str,
-        default="https://en.wikipedia.org/wiki/Artificial_intelligence",
-        help="URL of the Wikipedia page to extract data from",
+        nargs="+",
+        default=["https://en.wikipedia.org/wiki/Artificial_intelligence"],
+        help="URL(s) of the Wikipedia page(s) to extract data from",
+    )
+    parser.add_argument(
+        "--dump",
+        type=str,
+        nargs="+",
+        default=None,
+        help="Local Wikipedia dump file(s) or directories to index instead of fetching URLs",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=8,
+        help="Maximum number of pages fetched concurrently when several URLs are given",
+    )
+    parser.add_argument(
+        "--batch_size",
+        type=int,
+        default=256,
+        help="Number of chunks per batch flowing through the ingestion pipeline",
     )
     parser.add_argument(
         "--top_k", type=int, default=3, help="Number of top results to retrieve"
     )
+    parser.add_argument(
+        "--index",
+        type=str,
+        default="exact",
+        choices=["exact", "ivf", "sharded"],
+        help="Vector index backend: exact scan, approximate inverted file, "
+        "or exact scan sharded across worker processes",
+    )
+    parser.add_argument(
+        "--nprobe",
+        type=int,
+        default=8,
+        help="Number of inverted lists scanned per query with --index ivf",
+    )
+    parser.add_argument(
+        "--num_shards",
+        type=int,
+        default=None,
+        help="Number of worker processes with --index sharded (defaults to the CPU count, "
+        "or to the saved value with --load_index)",
+    )
+    parser.add_argument(
+        "--quantization",
+        type=str,
+        default="none",
+        choices=["none", "float16", "int8", "pq"],
+        help="Compressed storage for the exact index's vectors",
+    )
+    parser.add_argument(
+        "--rerank",
+        type=int,
+        default=0,
+        help="Re-score this many quantized candidates with full-precision vectors",
+    )
+    parser.add_argument(
+        "--hybrid",
+        type=str,
+        default="none",
+        choices=["none", "rrf", "weighted"],
+        help="Fuse BM25 keyword scores with the embedding scores (reciprocal rank or weighted)",
+    )
+    parser.add_argument(
+        "--alpha",
+        type=float,
+        default=0.5,
+        help="Weight of the embedding scores with --hybrid weighted",
+    )
+    parser.add_argument(
+        "--save_index",
+        type=str,
+        default=None,
+        help="Directory to save the built index and chunk texts to",
+    )
+    parser.add_argument(
+        "--load_index",
+        type=str,
+        default=None,
+        help="Directory of a saved index to query instead of extracting and embedding pages",
+    )
+    parser.add_argument(
+        "--vectors",
+        type=str,
+        default=None,
+        help="Local word vectors to use offline: a converted table directory or a GloVe/word2vec text file",
+    )
+    parser.add_argument(
+        "--nltk_data",
+        type=str,
+        default=NLTK_DATA_DIR,
+        help="Local NLTK data directory for the stopwords corpus",
+    )
+    parser.add_argument(
+        "--download_nltk",
+        action="store_true",
+        help="Download missing NLTK data into --nltk_data instead of using the bundled fallbacks",
+    )
+    parser.add_argument(
+        "--metrics",
+        type=str,
+        default=None,
+        help="File to write stage timers and counters to (Prometheus text if it ends in .prom, else JSON)",
+    )
     parser.add_argument(
         "--log_level",
         type=str,
@@ -41,61 +146,143 @@ async def main():
         choices=["DEBUG", "INFO", "WARNING", "ERROR"],
         help="Logging level",
     )
+    parser.add_argument(
+        "--serve",
+        action="store_true",
+        help="Build the pipeline once and answer queries over HTTP",
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Host to bind in server mode"
+    )
+    parser.add_argument(
+        "--port", type=int, default=8000, help="Port to listen on in server mode"
+    )
+    parser.add_argument(
+        "--socket",
+        type=str,
+        default=None,
+        help="Unix socket path to listen on in server mode instead of a TCP port",
+    )
     args = parser.parse_args()
+    if not args.serve and not args.query:
+        parser.error("a query is required unless --serve is given")
+    if args.quantization != "none" and args.index != "exact":
+        parser.error("--quantization is only supported with --index exact")
+
+    # Index backend and its parameters
+    backend, index_params = args.index, None
+    if args.index == "ivf":
+        index_params = {"nprobe": args.nprobe}
+    elif args.index == "sharded":
+        index_params = {"num_shards": args.num_shards}
+    elif args.quantization != "none":
+        backend = "quantized"
+        index_params = {"quantization": args.quantization, "rerank": args.rerank}
 
     # Setup logging
     setup_logging(args.log_level)
     logger = logging.getLogger(__name__)
 
-    logger.info(f"Starting RAG pipeline with query: '{args.query}'")
-    logger.info(f"Using URL: {args.url}")
-
-    # Step 1: Extract and clean data from Wikipedia
-    logger.info("Step 1: Extracting and cleaning data from Wikipedia...")
-    data_extractor = DataExtractor(url=args.url)
+    if args.serve:
+        # Only server mode needs the HTTP server
+        from server import run_server
 
-    if not data_extractor.extract_data():
-        logger.error("Failed to extract data from Wikipedia. Exiting.")
-        return 1
+        logger.info(f"Starting RAG server for {args.dump or args.url}")
+        return await run_server(
+            args.url,
+            max_workers=args.max_workers,
+            dump_paths=args.dump,
+            index_path=args.load_index,
+            save_path=args.save_index,
+            top_k=args.top_k,
+            backend=backend,
+            index_params=index_params,
+            fusion=None if args.hybrid == "none" else args.hybrid,
+            text_processor=TextProcessor(
+                data_dir=args.nltk_data, download=args.download_nltk
+            ),
+            embedding_creator=EmbeddingCreator(vectors_path=args.vectors),
+            host=args.host,
+            port=args.port,
+            unix_socket=args.socket,
+        )
 
-    chunks = data_extractor.clean_data()
-    if not chunks:
-        logger.error("No clean chunks extracted from the data. Exiting.")
-        return 1
+    logger.info(f"Starting RAG pipeline with query: '{args.query}'")
+    if args.load_index:
+        logger.info(f"Using saved index: {args.load_index}")
+    elif args.dump:
+        logger.info(f"Using dump files: {args.dump}")
+    else:
+        logger.info(f"Using URLs: {args.url}")
 
-    logger.info(
-        f"Successfully extracted and cleaned {len(chunks)} chunks from Wikipedia."
-    )
+    embedding_creator = EmbeddingCreator(vectors_path=args.vectors)
+    document_retriever = None
+    if args.load_index:
+        # Steps 1-2 are skipped: the saved index already holds chunks and embeddings
+        logger.info(f"Loading saved index from {args.load_index}...")
+        document_retriever = DocumentRetriever.load(
+            args.load_index, index_params={"num_shards": args.num_shards}
+        )
+        if document_retriever is None:
+            logger.error("Failed to load the saved index. Exiting.")
+            return 1
+    else:
+        # Only ingestion needs the extraction pipeline and its HTTP stack
+        from pipeline import IngestionPipeline, iter_source_chunks
 
-    # Step 2: Create embeddings for chunks using multiprocessing
-    logger.info("Step 2: Creating embeddings for chunks using multiprocessing...")
-    embedding_creator = EmbeddingCreator()
-    chunk_embeddings = embedding_creator.create_embeddings(chunks)
+        # Steps 1-2: Extract, embed and index the chunks in overlapping stages
+        logger.info(
+            "Steps 1-2: Extracting, embedding and indexing chunks in a pipeline..."
+        )
+        document_retriever = await IngestionPipeline(
+            embedding_creator,
+            batch_size=args.batch_size,
+            backend=backend,
+            index_params=index_params,
+            sparse_index=args.hybrid != "none",
+        ).run(iter_source_chunks(args.url, args.max_workers, args.dump))
 
-    if not chunk_embeddings:
-        logger.error("Failed to create embeddings. Exiting.")
-        return 1
+        if document_retriever is None:
+            logger.error("Failed to extract, embed and index the chunks. Exiting.")
+            return 1
 
-    logger.info(f"Successfully created embeddings for {len(chunk_embeddings)} chunks.")
+        logger.info(
+            f"Successfully indexed {len(document_retriever.chunks)} chunks from Wikipedia."
+        )
+        if args.save_index and not document_retriever.save(args.save_index):
+            logger.warning(f"Could not save the index to {args.save_index}")
 
     # Step 3: Create embedding for the query
     logger.info("Step 3: Creating embedding for the query...")
-    query_chunks = [{"id": "query", "text": args.query}]
-    query_embeddings = embedding_creator.create_embeddings(query_chunks)
+    query_embedding = embedding_creator.embed_query(args.query)
+    embedding_creator.close()
 
-    if "query" not in query_embeddings:
+    if query_embedding is None:
         logger.error("Failed to create embedding for the query. Exiting.")
         return 1
 
-    query_embedding = query_embeddings["query"]
     logger.info("Successfully created embedding for the query.")
 
-    # Step 4: Retrieve relevant documents using threading
-    logger.info("Step 4: Retrieving relevant documents using threading...")
-    document_retriever = DocumentRetriever(chunk_embeddings, chunks)
-    relevant_chunks = document_retriever.retrieve_documents(
-        query_embedding, top_k=args.top_k
-    )
+    # Step 4: Retrieve relevant documents from the vector index
+    logger.info("Step 4: Retrieving relevant documents from the vector index...")
+    if document_retriever.backend == "ivf":
+        logger.info(
+            f"IVF recall@{args.top_k} against exact search: "
+            f"{document_retriever.index.recall(top_k=args.top_k):.3f}"
+        )
+    if args.hybrid != "none":
+        relevant_chunks = document_retriever.retrieve_hybrid(
+            args.query,
+            query_embedding,
+            top_k=args.top_k,
+            fusion=args.hybrid,
+            alpha=args.alpha,
+        )
+    else:
+        relevant_chunks = document_retriever.retrieve_documents(
+            query_embedding, top_k=args.top_k
+        )
+    document_retriever.close()
 
     if not relevant_chunks:
         logger.error("No relevant chunks found. Exiting.")
@@ -105,8 +292,9 @@ async def main():
 
     # Step 5: Process the retrieved chunks asynchronously
     logger.info("Step 5: Processing the retrieved chunks asynchronously...")
-    text_processor = TextProcessor()
+    text_processor = TextProcessor(data_dir=args.nltk_data, download=args.download_nltk)
     processed_chunks = await text_processor.process_chunks(relevant_chunks)
+    text_processor.close()
 
     if not processed_chunks:
         logger.error("Failed to process chunks. Exiting.")
@@ -145,6 +333,12 @@ async def main():
             f.write("-" * 80 + "\n\n")
 
     logger.info(f"Results saved to {output_path}")
+
+    # Report how long each stage took
+    for line in format_metrics(metrics.snapshot()):
+        logger.info(line)
+    if args.metrics and metrics.save(args.metrics):
+        logger.info(f"Metrics saved to {args.metrics}")
     return 0
 
 
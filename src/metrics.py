@@ -0,0 +1,344 @@
+import json
+import time
+import bisect
+import logging
+import functools
+import threading
+import numpy as np
+from collections import deque
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional, Callable, Iterator
+
+# Upper bounds of the Prometheus histogram buckets, in seconds
+DEFAULT_BUCKETS = (
+    0.0001,
+    0.0005,
+    0.001,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+    30.0,
+    60.0,
+)
+
+# Number of recent observations a histogram keeps for its percentiles
+MAX_SAMPLES = 10000
+
+# Percentiles reported for every histogram
+PERCENTILES = (50, 95, 99)
+
+
+class Counter:
+    """
+    Monotonically increasing count, such as chunks processed or cache hits.
+    """
+
+    def __init__(self, name: str, help_text: str = ""):
+        """
+        Initialize the counter at zero.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description exported with the metric.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.value = 0.0
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0) -> None:
+        """
+        Add to the counter.
+
+        Args:
+            amount (float): Amount to add.
+        """
+        with self._lock:
+            self.value += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Current value as a JSON-serializable dictionary.
+        """
+        return {"type": "counter", "value": self.value}
+
+    def prometheus(self) -> List[str]:
+        """
+        Lines of the Prometheus text format for this metric.
+        """
+        return [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} counter",
+            f"{self.name} {self.value:g}",
+        ]
+
+
+class Histogram:
+    """
+    Distribution of observed values, usually durations in seconds.
+
+    Every observation is counted in fixed buckets, which is what
+    Prometheus aggregates, and the most recent max_samples are kept to
+    report exact p50/p95/p99.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help_text: str = "",
+        buckets: tuple = DEFAULT_BUCKETS,
+        max_samples: int = MAX_SAMPLES,
+    ):
+        """
+        Initialize an empty histogram.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description exported with the metric.
+            buckets (tuple): Sorted upper bounds of the buckets.
+            max_samples (int): Number of recent observations kept for percentiles.
+        """
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(buckets)
+        self.bucket_counts = [0] * len(self.buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.samples: deque = deque(maxlen=max_samples)
+        self._lock = threading.Lock()
+
+    def observe(self, value: float) -> None:
+        """
+        Record one observation.
+
+        Args:
+            value (float): The observed value.
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            if index < len(self.bucket_counts):
+                self.bucket_counts[index] += 1
+            self.count += 1
+            self.sum += value
+            self.samples.append(value)
+
+    def percentiles(self) -> Dict[str, float]:
+        """
+        Percentiles of the recent observations.
+
+        Returns:
+            Dict[str, float]: p50, p95 and p99, or an empty dictionary if nothing was observed.
+        """
+        with self._lock:
+            samples = np.fromiter(self.samples, dtype=np.float64)
+        if not len(samples):
+            return {}
+        values = np.percentile(samples, PERCENTILES)
+        return {f"p{p}": float(v) for p, v in zip(PERCENTILES, values)}
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Count, sum, mean and percentiles as a JSON-serializable dictionary.
+        """
+        with self._lock:
+            count, total = self.count, self.sum
+        return {
+            "type": "histogram",
+            "count": count,
+            "sum": total,
+            "mean": total / count if count else 0.0,
+            **self.percentiles(),
+        }
+
+    def prometheus(self) -> List[str]:
+        """
+        Lines of the Prometheus text format for this metric.
+        """
+        with self._lock:
+            bucket_counts, count, total = list(self.bucket_counts), self.count, self.sum
+        lines = [
+            f"# HELP {self.name} {self.help_text}",
+            f"# TYPE {self.name} histogram",
+        ]
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets, bucket_counts):
+            cumulative += bucket_count
+            lines.append(f'{self.name}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{self.name}_bucket{{le="+Inf"}} {count}')
+        lines.append(f"{self.name}_sum {total:g}")
+        lines.append(f"{self.name}_count {count}")
+        return lines
+
+
+class MetricsRegistry:
+    """
+    Named counters and histograms, exportable as JSON or Prometheus text.
+
+    Metrics are created on first use, so instrumented code only names
+    them. Timers observe elapsed seconds into a histogram and can be used
+    as a context manager or a decorator. Worker processes have registries
+    of their own, which are not merged into the parent's.
+    """
+
+    def __init__(self):
+        """
+        Initialize an empty registry.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.metrics: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, name: str, factory: Callable[[], Any], kind: type) -> Any:
+        """
+        Return a metric, creating it on first use.
+
+        Args:
+            name (str): Metric name.
+            factory (Callable[[], Any]): Creates the metric.
+            kind (type): Expected metric class.
+
+        Returns:
+            Any: The metric.
+        """
+        metric = self.metrics.get(name)
+        if metric is None:
+            with self._lock:
+                metric = self.metrics.setdefault(name, factory())
+        if not isinstance(metric, kind):
+            raise ValueError(f"Metric {name!r} is a {type(metric).__name__}")
+        return metric
+
+    def counter(self, name: str, help_text: str = "") -> Counter:
+        """
+        Return the counter with this name, creating it on first use.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description exported with the metric.
+
+        Returns:
+            Counter: The counter.
+        """
+        return self._get(name, lambda: Counter(name, help_text), Counter)
+
+    def histogram(self, name: str, help_text: str = "") -> Histogram:
+        """
+        Return the histogram with this name, creating it on first use.
+
+        Args:
+            name (str): Metric name.
+            help_text (str): Description exported with the metric.
+
+        Returns:
+            Histogram: The histogram.
+        """
+        return self._get(name, lambda: Histogram(name, help_text), Histogram)
+
+    @contextmanager
+    def timer(self, name: str, help_text: str = "") -> Iterator[None]:
+        """
+        Observe the seconds spent in a with block, including when it raises.
+
+        Args:
+            name (str): Name of the histogram.
+            help_text (str): Description exported with the metric.
+        """
+        histogram = self.histogram(name, help_text)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            histogram.observe(time.perf_counter() - start)
+
+    def timed(self, name: str, help_text: str = "") -> Callable:
+        """
+        Decorator observing the seconds spent in each call of a function.
+
+        Args:
+            name (str): Name of the histogram.
+            help_text (str): Description exported with the metric.
+
+        Returns:
+            Callable: The decorator.
+        """
+
+        def decorator(func: Callable) -> Callable:
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.timer(name, help_text):
+                    return func(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Every metric as a JSON-serializable dictionary, by name.
+        """
+        return {
+            name: metric.snapshot() for name, metric in sorted(self.metrics.items())
+        }
+
+    def to_json(self, indent: Optional[int] = 2) -> str:
+        """
+        Export every metric as JSON.
+
+        Args:
+            indent (Optional[int]): Indentation of the JSON text.
+
+        Returns:
+            str: The JSON text.
+        """
+        return json.dumps(self.snapshot(), indent=indent)
+
+    def to_prometheus(self) -> str:
+        """
+        Export every metric in the Prometheus text exposition format.
+
+        Returns:
+            str: The exposition text.
+        """
+        lines = []
+        for _, metric in sorted(self.metrics.items()):
+            lines.extend(metric.prometheus())
+        return "\n".join(lines) + "\n"
+
+    def save(self, path: str) -> bool:
+        """
+        Write every metric to a file, as Prometheus text if the path ends in .prom, else JSON.
+
+        Args:
+            path (str): Destination file.
+
+        Returns:
+            bool: True if the file was written, False otherwise.
+        """
+        try:
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(
+                    self.to_prometheus() if path.endswith(".prom") else self.to_json()
+                )
+            return True
+        except OSError as e:
+            self.logger.error(f"Error saving metrics to {path}: {e}")
+            return False
+
+    def reset(self) -> None:
+        """
+        Drop every metric.
+        """
+        with self._lock:
+            self.metrics = {}
+
+
+# Registry shared by every stage of the pipeline
+metrics = MetricsRegistry()
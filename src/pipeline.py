@@ -0,0 +1,340 @@
+import time
+import asyncio
+import logging
+import numpy as np
+from itertools import islice
+from concurrent.futures import Executor, ThreadPoolExecutor
+from typing import List, Dict, Tuple, Optional, Any, Callable, Iterable, Iterator
+
+try:
+    from .data_extraction import DataExtractor, BatchDataExtractor
+    from .dump_ingestion import DumpReader
+    from .embedding_creation import EmbeddingCreator
+    from .document_retrieval import DocumentRetriever
+    from .metrics import metrics
+except ImportError:
+    from data_extraction import DataExtractor, BatchDataExtractor
+    from dump_ingestion import DumpReader
+    from embedding_creation import EmbeddingCreator
+    from document_retrieval import DocumentRetriever
+    from metrics import metrics
+
+# Marks the end of the stream on a stage's input queue
+_END = object()
+
+# Backends whose index is trained on all vectors at once (IVF centroids,
+# int8 scales, PQ codebooks); incremental appends would train them on the
+# first batch only
+TRAINED_BACKENDS = ("ivf", "quantized")
+
+
+def iter_batches(items: Iterable[Any], batch_size: int) -> Iterator[List[Any]]:
+    """
+    Group an iterable into lists of batch_size items; the last one may be shorter.
+
+    Args:
+        items (Iterable[Any]): Items to group.
+        batch_size (int): Number of items per batch.
+
+    Yields:
+        List[Any]: The next batch.
+    """
+    iterator = iter(items)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def iter_source_chunks(
+    urls: List[str],
+    max_workers: int = 8,
+    dump_paths: Optional[List[str]] = None,
+) -> Iterator[Dict[str, str]]:
+    """
+    Yield the cleaned chunks of Wikipedia pages or dump files as they are produced.
+
+    Pages of a URL batch are yielded in completion order, so the first
+    pages can be embedded while the others are still downloading.
+
+    Args:
+        urls (List[str]): The URLs of the Wikipedia pages to extract.
+        max_workers (int): Maximum number of pages fetched concurrently.
+        dump_paths (Optional[List[str]]): Local dump files to read instead of the URLs.
+
+    Yields:
+        Dict[str, str]: Dictionaries containing chunk ID and text.
+    """
+    if dump_paths:
+        yield from DumpReader(dump_paths).iter_chunks()
+    elif len(urls) > 1:
+        for _, chunks in BatchDataExtractor(urls, max_workers=max_workers).iter_pages():
+            yield from chunks
+    elif urls:
+        data_extractor = DataExtractor(url=urls[0])
+        if data_extractor.extract_data():
+            yield from data_extractor.iter_chunks()
+
+
+class Pipeline:
+    """
+    Chain of stages running concurrently, connected by bounded asyncio queues.
+
+    Every stage is a plain function called once per item in an executor,
+    so blocking I/O and CPU-bound work never run on the event loop. While
+    one stage works on an item, the previous stage is already producing
+    the next one; a full queue suspends its producer (backpressure), so at
+    most queue_size items wait between two stages. The wall time of a run
+    therefore approaches the busy time of the slowest stage rather than
+    the sum of all stages.
+    """
+
+    def __init__(self, queue_size: int = 4):
+        """
+        Initialize an empty pipeline.
+
+        Args:
+            queue_size (int): Maximum number of items waiting between two stages.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.queue_size = queue_size
+        self.stages: List[Tuple[str, Callable[[Any], Any], Optional[Executor]]] = []
+        self.busy_times: Dict[str, float] = {}
+        self.wall_time = 0.0
+
+    def add_stage(
+        self,
+        name: str,
+        func: Callable[[Any], Any],
+        executor: Optional[Executor] = None,
+    ) -> "Pipeline":
+        """
+        Append a stage to the pipeline.
+
+        Args:
+            name (str): Name of the stage, used in logs and busy_times ("source" is
+                the time spent iterating the source).
+            func (Callable[[Any], Any]): Function turning an input item into an output
+                item; returning None drops the item.
+            executor (Optional[Executor]): Executor to call func in (defaults to a thread
+                of the pipeline's own pool).
+
+        Returns:
+            Pipeline: The pipeline, so calls can be chained.
+        """
+        self.stages.append((name, func, executor))
+        return self
+
+    async def run(self, source: Iterable[Any]) -> int:
+        """
+        Feed every item of source through the stages.
+
+        The source is iterated in the executor too, so a generator that
+        downloads or parses data does not block the event loop. If a stage
+        raises, the other stages are cancelled and the exception propagates.
+
+        Args:
+            source (Iterable[Any]): Items for the first stage.
+
+        Returns:
+            int: Number of items that came out of the last stage.
+        """
+        if not self.stages:
+            raise ValueError("A pipeline needs at least one stage")
+        loop = asyncio.get_running_loop()
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in self.stages]
+        self.busy_times = {"source": 0.0}
+        self.busy_times.update((name, 0.0) for name, _, _ in self.stages)
+        histograms = {
+            name: metrics.histogram(
+                f"pipeline_{name}_seconds", f"Time the {name} stage spends per item"
+            )
+            for name in self.busy_times
+        }
+        outputs = [0]
+        start = time.perf_counter()
+
+        with ThreadPoolExecutor(
+            max_workers=len(self.stages) + 1, thread_name_prefix="pipeline"
+        ) as executor:
+
+            async def produce() -> None:
+                iterator = iter(source)
+                while True:
+                    source_start = time.perf_counter()
+                    item = await loop.run_in_executor(executor, next, iterator, _END)
+                    elapsed = time.perf_counter() - source_start
+                    self.busy_times["source"] += elapsed
+                    histograms["source"].observe(elapsed)
+                    await queues[0].put(item)
+                    if item is _END:
+                        return
+
+            async def work(i: int) -> None:
+                name, func, stage_executor = self.stages[i]
+                output = queues[i + 1] if i + 1 < len(queues) else None
+                while True:
+                    item = await queues[i].get()
+                    if item is _END:
+                        if output is not None:
+                            await output.put(_END)
+                        return
+                    stage_start = time.perf_counter()
+                    result = await loop.run_in_executor(
+                        stage_executor or executor, func, item
+                    )
+                    elapsed = time.perf_counter() - stage_start
+                    self.busy_times[name] += elapsed
+                    histograms[name].observe(elapsed)
+                    if result is None:
+                        continue
+                    if output is not None:
+                        await output.put(result)
+                    else:
+                        outputs[0] += 1
+
+            tasks = [asyncio.create_task(produce())] + [
+                asyncio.create_task(work(i)) for i in range(len(self.stages))
+            ]
+            try:
+                await asyncio.gather(*tasks)
+            except BaseException:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+                raise
+
+        self.wall_time = time.perf_counter() - start
+        busy = ", ".join(f"{name} {t:.2f}s" for name, t in self.busy_times.items())
+        self.logger.info(f"Pipeline finished in {self.wall_time:.2f}s (busy: {busy})")
+        return outputs[0]
+
+
+class IngestionPipeline:
+    """
+    Extract, embed and index a stream of chunks with overlapping stages.
+
+    Chunks are grouped into batches by EmbeddingCreator.create_embeddings_stream(),
+    which hands each batch to its persistent process pool, so tokenization
+    runs outside the GIL whatever the batch size. While batches are being
+    embedded, the next ones are being extracted and finished ones are being
+    inserted into the DocumentRetriever with add_chunks(). Indexes that are trained
+    on the whole corpus (IVF, quantized) are built once after the last batch
+    instead.
+    """
+
+    def __init__(
+        self,
+        embedding_creator: Optional[EmbeddingCreator] = None,
+        batch_size: int = 256,
+        queue_size: int = 4,
+        **retriever_params,
+    ):
+        """
+        Initialize the ingestion pipeline.
+
+        Args:
+            embedding_creator (Optional[EmbeddingCreator]): Creator used for the chunk embeddings.
+            batch_size (int): Number of chunks per batch.
+            queue_size (int): Maximum number of batches waiting between two stages.
+            **retriever_params: Keyword arguments for DocumentRetriever, e.g. backend,
+                index_params and sparse_index.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.embedding_creator = embedding_creator or EmbeddingCreator()
+        self.batch_size = batch_size
+        self.queue_size = queue_size
+        self.retriever_params = retriever_params
+        self.document_retriever: Optional[DocumentRetriever] = None
+        self.num_chunks = 0
+        self._buffered: List[Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]] = []
+
+    def _embedded_batches(
+        self, chunks: Iterable[Dict[str, str]]
+    ) -> Iterator[Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]]:
+        """
+        Embed a stream of chunks in batches, skipping batches that could not be embedded.
+
+        Args:
+            chunks (Iterable[Dict[str, str]]): Chunks to embed.
+
+        Yields:
+            Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]: Each batch and its embeddings.
+        """
+        for batch, embeddings in self.embedding_creator.create_embeddings_stream(
+            chunks, self.batch_size
+        ):
+            if not embeddings:
+                self.logger.error(f"Skipping a batch of {len(batch)} chunks")
+                continue
+            yield batch, embeddings
+
+    def _index(self, batch: Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]) -> int:
+        """
+        Insert an embedded batch into the retriever, creating it for the first batch.
+
+        Args:
+            batch (Tuple[List[Dict[str, str]], Dict[str, np.ndarray]]): Chunks and embeddings.
+
+        Returns:
+            int: Number of chunks inserted.
+        """
+        chunks, embeddings = batch
+        if self.retriever_params.get("backend") in TRAINED_BACKENDS:
+            self._buffered.append(batch)
+        elif self.document_retriever is None:
+            self.document_retriever = DocumentRetriever(
+                embeddings, chunks, **self.retriever_params
+            )
+        else:
+            self.document_retriever.add_chunks(chunks, embeddings)
+        self.num_chunks += len(embeddings)
+        return len(embeddings)
+
+    def _build_buffered(self) -> None:
+        """
+        Build a trained index from all buffered batches.
+        """
+        embeddings, chunks = {}, []
+        for batch_chunks, batch_embeddings in self._buffered:
+            chunks.extend(batch_chunks)
+            embeddings.update(batch_embeddings)
+        self._buffered = []
+        self.document_retriever = DocumentRetriever(
+            embeddings, chunks, **self.retriever_params
+        )
+
+    async def run(
+        self, chunks: Iterable[Dict[str, str]]
+    ) -> Optional[DocumentRetriever]:
+        """
+        Ingest a stream of chunks.
+
+        Args:
+            chunks (Iterable[Dict[str, str]]): Chunks to index, e.g. from iter_source_chunks().
+
+        Returns:
+            Optional[DocumentRetriever]: The retriever, or None if nothing could be indexed.
+        """
+        # Extraction and embedding make up the source: the stream pulls chunks
+        # while up to max_in_flight earlier batches are embedded in the pool
+        pipeline = Pipeline(queue_size=self.queue_size).add_stage("index", self._index)
+        try:
+            await pipeline.run(self._embedded_batches(chunks))
+            if self._buffered:
+                await asyncio.get_running_loop().run_in_executor(
+                    None, self._build_buffered
+                )
+        except Exception as e:
+            self.logger.error(f"Error in ingestion pipeline: {e}")
+            if self.document_retriever is not None:
+                self.document_retriever.close()
+                self.document_retriever = None
+            return None
+
+        if self.document_retriever is None:
+            self.logger.error("No chunks were indexed.")
+            return None
+        self.logger.info(f"Ingested {self.num_chunks} chunks")
+        return self.document_retriever
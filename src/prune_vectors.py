@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+import sys
+import logging
+import argparse
+import numpy as np
+from typing import Iterable, Optional
+
+try:
+    from .word_vectors import WordVectorTable, count_words
+    from .embedding_creation import EmbeddingCreator
+    from .document_retrieval import DocumentRetriever
+    from .pipeline import iter_source_chunks
+    from .utils import setup_logging
+except ImportError:
+    from word_vectors import WordVectorTable, count_words
+    from embedding_creation import EmbeddingCreator
+    from document_retrieval import DocumentRetriever
+    from pipeline import iter_source_chunks
+    from utils import setup_logging
+
+
+def build_pruned_table(
+    texts: Iterable[str],
+    source_dir: str,
+    output_dir: str,
+    min_count: int = 1,
+    float16: bool = False,
+) -> Optional[WordVectorTable]:
+    """
+    Save a word vector table restricted to the vocabulary of a corpus.
+
+    The pruned table keeps the corpus words in order of frequency and
+    records source_dir, so queries with other words can still be embedded
+    with the full table.
+
+    Args:
+        texts (Iterable[str]): Texts of the corpus.
+        source_dir (str): Directory of the full WordVectorTable.
+        output_dir (str): Directory to save the pruned table to.
+        min_count (int): Minimum number of occurrences of a kept word.
+        float16 (bool): Store the vectors as float16 instead of float32.
+
+    Returns:
+        Optional[WordVectorTable]: The pruned table, or None on failure.
+    """
+    logger = logging.getLogger(__name__)
+    try:
+        full_table = WordVectorTable.load(source_dir, mmap=True)
+        word_counts = count_words(texts)
+        table = full_table.pruned(
+            word_counts,
+            min_count=min_count,
+            dtype=np.float16 if float16 else np.float32,
+            fallback_dir=source_dir,
+        )
+        table.save(output_dir)
+    except (OSError, ValueError) as e:
+        logger.error(f"Error pruning word vectors from {source_dir}: {e}")
+        return None
+
+    total = sum(word_counts.values())
+    covered = sum(word_counts[word] for word in table.words)
+    logger.info(
+        f"Kept {len(table)} of {len(full_table)} words "
+        f"({len(word_counts)} distinct corpus words, "
+        f"{covered / total if total else 0:.1%} of corpus tokens in vocabulary), "
+        f"{table.vectors.nbytes / 2**20:.1f} MB instead of "
+        f"{full_table.vectors.nbytes / 2**20:.1f} MB"
+    )
+    return table
+
+
+def main() -> int:
+    """
+    Build a pruned word vector table from an ingested corpus.
+
+    Returns:
+        int: Exit code.
+    """
+    parser = argparse.ArgumentParser(
+        description="Prune the word vector table to the vocabulary of a corpus"
+    )
+    parser.add_argument(
+        "--output",
+        type=str,
+        required=True,
+        help="Directory to save the pruned table to (use it with main.py --vectors)",
+    )
+    corpus = parser.add_mutually_exclusive_group(required=True)
+    corpus.add_argument(
+        "--load_index",
+        type=str,
+        help="Directory of a saved index whose chunk texts make up the corpus",
+    )
+    corpus.add_argument(
+        "--dump",
+        type=str,
+        nargs="+",
+        help="Local Wikipedia dump file(s) or directories making up the corpus",
+    )
+    corpus.add_argument(
+        "--url",
+        type=str,
+        nargs="+",
+        help="URL(s) of the Wikipedia page(s) making up the corpus",
+    )
+    parser.add_argument(
+        "--vectors",
+        type=str,
+        default=None,
+        help="Full word vectors to prune: a converted table directory or a GloVe/word2vec text file "
+        "(default: glove-wiki-gigaword-100)",
+    )
+    parser.add_argument(
+        "--min_count",
+        type=int,
+        default=1,
+        help="Minimum number of occurrences of a kept word",
+    )
+    parser.add_argument(
+        "--float16",
+        action="store_true",
+        help="Store the pruned vectors as float16, halving their size",
+    )
+    parser.add_argument(
+        "--max_workers",
+        type=int,
+        default=8,
+        help="Maximum number of pages fetched concurrently when several URLs are given",
+    )
+    parser.add_argument(
+        "--log_level",
+        type=str,
+        default="INFO",
+        choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+        help="Logging level",
+    )
+    args = parser.parse_args()
+
+    setup_logging(args.log_level)
+    logger = logging.getLogger(__name__)
+
+    # The full table is converted to a memory-mappable table if needed
+    embedding_creator = EmbeddingCreator(vectors_path=args.vectors)
+    if not embedding_creator.load_model():
+        logger.error("Failed to load the full word vectors. Exiting.")
+        return 1
+
+    document_retriever = None
+    if args.load_index:
+        document_retriever = DocumentRetriever.load(args.load_index)
+        if document_retriever is None:
+            logger.error("Failed to load the saved index. Exiting.")
+            return 1
+        texts = (chunk["text"] for chunk in document_retriever.chunks.values())
+    else:
+        texts = (
+            chunk["text"]
+            for chunk in iter_source_chunks(args.url or [], args.max_workers, args.dump)
+        )
+
+    try:
+        table = build_pruned_table(
+            texts,
+            embedding_creator.vectors_dir,
+            args.output,
+            min_count=args.min_count,
+            float16=args.float16,
+        )
+    finally:
+        # Only the chunk texts were needed; stop the retrieval pools
+        if document_retriever is not None:
+            document_retriever.close()
+    if table is None:
+        return 1
+    logger.info(f"Pruned word vectors saved to {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
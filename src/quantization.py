@@ -0,0 +1,573 @@
+import numpy as np
+from concurrent.futures import Executor
+from typing import List, Dict, Tuple, Optional, Any
+
+try:
+    from .vector_index import VectorIndex, top_k_indices
+except ImportError:
+    from vector_index import VectorIndex, top_k_indices
+
+# Number of encoded rows decoded or scored at once, to bound temporary memory
+SCORE_BLOCK = 8192
+
+
+def _blocked_scores(codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+    """
+    Compute codes @ query in float32, converting one block of rows at a time.
+
+    Args:
+        codes (np.ndarray): 2-D array of float16 or int8 rows.
+        query (np.ndarray): Query vector, already scaled for the codes.
+
+    Returns:
+        np.ndarray: One score per row.
+    """
+    scores = np.empty(codes.shape[0], dtype=np.float32)
+    for start in range(0, codes.shape[0], SCORE_BLOCK):
+        block = codes[start : start + SCORE_BLOCK].astype(np.float32)
+        scores[start : start + SCORE_BLOCK] = block @ query
+    return scores
+
+
+def _kmeans(
+    data: np.ndarray, k: int, iterations: int, rng: np.random.Generator
+) -> np.ndarray:
+    """
+    Cluster vectors with Euclidean k-means.
+
+    Args:
+        data (np.ndarray): 2-D float32 array of training vectors.
+        k (int): Number of clusters (at most the number of rows).
+        iterations (int): Number of k-means iterations.
+        rng (np.random.Generator): Random generator for the initialization.
+
+    Returns:
+        np.ndarray: Matrix of k centroids.
+    """
+    centroids = data[rng.choice(data.shape[0], k, replace=False)].copy()
+    for _ in range(iterations):
+        assignments = _nearest_centroids(data, centroids)
+        counts = np.bincount(assignments, minlength=k)
+        nonempty = counts > 0
+
+        order = np.argsort(assignments, kind="stable")
+        offsets = np.concatenate(([0], np.cumsum(counts[nonempty])[:-1]))
+        sums = np.add.reduceat(data[order], offsets, axis=0)
+        centroids[nonempty] = sums / counts[nonempty, None]
+        centroids[~nonempty] = data[
+            rng.choice(data.shape[0], int((~nonempty).sum()), replace=False)
+        ]
+    return centroids
+
+
+def _nearest_centroids(data: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """
+    Find the nearest centroid (in Euclidean distance) of every row.
+
+    Args:
+        data (np.ndarray): 2-D array of vectors.
+        centroids (np.ndarray): 2-D array of centroids.
+
+    Returns:
+        np.ndarray: Index of the nearest centroid for each row.
+    """
+    # argmin |x - c|^2 == argmax (x . c - |c|^2 / 2)
+    half_norms = 0.5 * np.einsum("ij,ij->i", centroids, centroids)
+    assignments = np.empty(data.shape[0], dtype=np.int64)
+    for start in range(0, data.shape[0], SCORE_BLOCK):
+        scores = data[start : start + SCORE_BLOCK] @ centroids.T - half_norms
+        assignments[start : start + SCORE_BLOCK] = np.argmax(scores, axis=1)
+    return assignments
+
+
+class Float16Quantizer:
+    """
+    Stores vectors as float16, halving their size.
+    """
+
+    # Names of the array attributes that hold the trained state
+    STATE = ()
+
+    def train(self, matrix: np.ndarray) -> None:
+        """
+        No training is needed for float16 storage.
+
+        Args:
+            matrix (np.ndarray): 2-D array of training vectors.
+        """
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Encode vectors as float16.
+
+        Args:
+            matrix (np.ndarray): 2-D float32 array of vectors.
+
+        Returns:
+            np.ndarray: float16 codes.
+        """
+        return matrix.astype(np.float16)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Compute inner products between a query and encoded vectors.
+
+        Args:
+            codes (np.ndarray): Encoded vectors.
+            query (np.ndarray): float32 query vector.
+
+        Returns:
+            np.ndarray: One score per encoded vector.
+        """
+        return _blocked_scores(codes, query)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the quantizer parameters in bytes.
+        """
+        return 0
+
+
+class Int8Quantizer:
+    """
+    Stores vectors as int8 with a symmetric scale per dimension.
+
+    Each dimension d is mapped to [-127, 127] by its largest absolute value,
+    x[d] ~= scale[d] * code[d], a quarter of the float32 size. Scoring folds
+    the scales into the query, so codes are never dequantized.
+    """
+
+    STATE = ("scale",)
+
+    def __init__(self):
+        self.scale = np.ones(0, dtype=np.float32)
+
+    def train(self, matrix: np.ndarray) -> None:
+        """
+        Compute the per-dimension scales.
+
+        Args:
+            matrix (np.ndarray): 2-D array of training vectors.
+        """
+        max_abs = np.abs(matrix).max(axis=0) if matrix.shape[0] else 0
+        self.scale = np.where(max_abs > 0, max_abs, 1.0).astype(
+            np.float32
+        ) / np.float32(127)
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Encode vectors as int8.
+
+        Args:
+            matrix (np.ndarray): 2-D float32 array of vectors.
+
+        Returns:
+            np.ndarray: int8 codes.
+        """
+        return np.clip(np.rint(matrix / self.scale), -127, 127).astype(np.int8)
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Compute inner products between a query and encoded vectors.
+
+        Args:
+            codes (np.ndarray): Encoded vectors.
+            query (np.ndarray): float32 query vector.
+
+        Returns:
+            np.ndarray: One score per encoded vector.
+        """
+        return _blocked_scores(codes, query * self.scale)
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the quantizer parameters in bytes.
+        """
+        return self.scale.nbytes
+
+
+class ProductQuantizer:
+    """
+    Product quantization with asymmetric distance computation (ADC).
+
+    Vectors are split into num_subspaces sub-vectors and each sub-vector is
+    replaced by the index of its nearest centroid in a per-subspace codebook
+    of up to 256 entries, so a vector takes one byte per subspace. A query
+    is not quantized: its inner products with every codebook entry are
+    computed once into a lookup table, and the score of an encoded vector
+    is the sum of its table entries.
+    """
+
+    STATE = ("codebooks",)
+
+    def __init__(
+        self,
+        num_subspaces: Optional[int] = None,
+        num_centroids: int = 256,
+        iterations: int = 10,
+        train_size: int = 16384,
+        seed: int = 0,
+    ):
+        """
+        Initialize the quantizer.
+
+        Args:
+            num_subspaces (Optional[int]): Number of subspaces (defaults to a quarter of the dimensions).
+            num_centroids (int): Codebook size per subspace, at most 256.
+            iterations (int): Number of k-means iterations per subspace.
+            train_size (int): Maximum number of vectors used to train the codebooks.
+            seed (int): Seed for the training sample and k-means initialization.
+        """
+        self.num_subspaces = num_subspaces
+        self.num_centroids = min(num_centroids, 256)
+        self.iterations = iterations
+        self.train_size = train_size
+        self.seed = seed
+        self.codebooks = np.empty((0, 0, 0), dtype=np.float32)
+
+    def _split(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Zero-pad vectors to a multiple of the subspace count and split them.
+
+        Args:
+            matrix (np.ndarray): 2-D array of vectors.
+
+        Returns:
+            np.ndarray: Array of shape (num_subspaces, n, subspace dimension).
+        """
+        padded_dim = self.codebooks.shape[0] * self.codebooks.shape[2]
+        padded = np.zeros((matrix.shape[0], padded_dim), dtype=np.float32)
+        padded[:, : matrix.shape[1]] = matrix
+        return padded.reshape(matrix.shape[0], self.codebooks.shape[0], -1).transpose(
+            1, 0, 2
+        )
+
+    def train(self, matrix: np.ndarray) -> None:
+        """
+        Train one k-means codebook per subspace.
+
+        Args:
+            matrix (np.ndarray): 2-D array of training vectors.
+        """
+        rng = np.random.default_rng(self.seed)
+        dim = matrix.shape[1]
+        num_subspaces = min(self.num_subspaces or max(1, dim // 4), dim)
+        sub_dim = -(-dim // num_subspaces)
+        num_centroids = min(self.num_centroids, matrix.shape[0])
+        self.codebooks = np.zeros(
+            (num_subspaces, num_centroids, sub_dim), dtype=np.float32
+        )
+
+        if matrix.shape[0] > self.train_size:
+            matrix = matrix[
+                np.sort(rng.choice(matrix.shape[0], self.train_size, replace=False))
+            ]
+        for subspace, data in enumerate(self._split(matrix)):
+            self.codebooks[subspace] = _kmeans(
+                np.ascontiguousarray(data), num_centroids, self.iterations, rng
+            )
+
+    def encode(self, matrix: np.ndarray) -> np.ndarray:
+        """
+        Encode vectors as one codebook index per subspace.
+
+        Args:
+            matrix (np.ndarray): 2-D float32 array of vectors.
+
+        Returns:
+            np.ndarray: uint8 codes of shape (n, num_subspaces).
+        """
+        codes = np.empty((matrix.shape[0], self.codebooks.shape[0]), dtype=np.uint8)
+        for subspace, data in enumerate(self._split(matrix)):
+            codes[:, subspace] = _nearest_centroids(data, self.codebooks[subspace])
+        return codes
+
+    def scores(self, codes: np.ndarray, query: np.ndarray) -> np.ndarray:
+        """
+        Compute approximate inner products with asymmetric distance computation.
+
+        Args:
+            codes (np.ndarray): Encoded vectors.
+            query (np.ndarray): float32 query vector.
+
+        Returns:
+            np.ndarray: One score per encoded vector.
+        """
+        sub_queries = self._split(query.reshape(1, -1))[:, 0, :]
+        # tables[s, c] is the inner product of sub-query s with centroid c
+        tables = np.einsum("scd,sd->sc", self.codebooks, sub_queries)
+
+        scores = np.empty(codes.shape[0], dtype=np.float32)
+        for start in range(0, codes.shape[0], SCORE_BLOCK):
+            block = codes[start : start + SCORE_BLOCK]
+            block_scores = np.zeros(block.shape[0], dtype=np.float32)
+            for subspace, table in enumerate(tables):
+                block_scores += table.take(block[:, subspace])
+            scores[start : start + SCORE_BLOCK] = block_scores
+        return scores
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Size of the quantizer parameters in bytes.
+        """
+        return self.codebooks.nbytes
+
+
+# Quantizers selectable with QuantizedIndex(quantization=...)
+QUANTIZERS = {
+    "float16": Float16Quantizer,
+    "int8": Int8Quantizer,
+    "pq": ProductQuantizer,
+}
+
+
+class QuantizedIndex(VectorIndex):
+    """
+    Cosine-similarity index over compressed vectors.
+
+    The normalized vectors are encoded with a float16, int8 or product
+    quantizer and only the codes are kept, so the index takes 2x (float16),
+    4x (int8) or about 16x (pq with the default subspaces) less memory than
+    the float32 matrix. Every query scans all codes. With rerank > 0 the
+    full-precision matrix is kept as well, and the best rerank candidates
+    of the approximate scan are re-scored exactly.
+    """
+
+    def __init__(
+        self,
+        embeddings: Dict[str, np.ndarray],
+        quantization: str = "int8",
+        rerank: int = 0,
+        num_subspaces: Optional[int] = None,
+        seed: int = 0,
+    ):
+        """
+        Build the index from a dictionary of embeddings.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+            quantization (str): Storage mode, "float16", "int8" or "pq".
+            rerank (int): Size of the shortlist re-scored with full-precision vectors (0 disables it).
+            num_subspaces (Optional[int]): Number of subspaces for product quantization.
+            seed (int): Seed for product quantization training.
+        """
+        if quantization not in QUANTIZERS:
+            raise ValueError(
+                f"Unknown quantization {quantization!r}, expected one of {sorted(QUANTIZERS)}"
+            )
+        super().__init__(embeddings)
+        self.quantization = quantization
+        self.rerank = rerank
+        self._dim = self.matrix.shape[1]
+
+        if quantization == "pq":
+            self.quantizer = ProductQuantizer(num_subspaces=num_subspaces, seed=seed)
+        else:
+            self.quantizer = QUANTIZERS[quantization]()
+        self.codes = np.empty((0, 0), dtype=np.uint8)
+        if self.ids:
+            self.quantizer.train(self.matrix)
+            self.codes = self.quantizer.encode(self.matrix)
+
+        # Without re-ranking the full-precision matrix is not needed any more
+        if not rerank:
+            self.matrix = None
+        self.logger.info(
+            f"Built {quantization} index with {len(self.ids)} vectors "
+            f"in {self.nbytes} bytes"
+        )
+
+    def _append(self, matrix: np.ndarray) -> None:
+        """
+        Encode and store vectors for rows appended to the ID list.
+
+        The quantizer is trained on the first vectors added to an empty
+        index and kept as it is afterwards.
+
+        Args:
+            matrix (np.ndarray): Normalized vectors, one per new row.
+        """
+        if not len(self.codes):
+            self._dim = matrix.shape[1]
+            self.quantizer.train(matrix)
+        if self.rerank:
+            self._append_array("matrix", matrix)
+        self._append_array("codes", self.quantizer.encode(matrix))
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """
+        Keep only the given rows of the codes and full-precision vectors.
+
+        Args:
+            keep (np.ndarray): Indices of the rows to keep, in order.
+        """
+        self.codes = self.codes[keep]
+        if self.matrix is not None:
+            self.matrix = self.matrix[keep]
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Arrays that make up the index state, saved as one .npy file each.
+        """
+        arrays = super()._arrays()
+        arrays["codes"] = self.codes
+        for name in self.quantizer.STATE:
+            arrays[f"quantizer_{name}"] = getattr(self.quantizer, name)
+        return arrays
+
+    def _params(self) -> Dict[str, Any]:
+        """
+        JSON-serializable settings saved alongside the arrays.
+        """
+        return {
+            "quantization": self.quantization,
+            "rerank": self.rerank,
+            "dim": self.dim,
+        }
+
+    def _restore(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> None:
+        """
+        Set the index state from saved arrays and settings.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays returned by _arrays() when saving.
+            params (Dict[str, Any]): Settings returned by _params() when saving.
+        """
+        super()._restore(arrays, params)
+        self.codes = arrays["codes"]
+        self.quantization = params["quantization"]
+        self.rerank = params["rerank"]
+        self._dim = params["dim"]
+        self.quantizer = QUANTIZERS[self.quantization]()
+        for name in self.quantizer.STATE:
+            setattr(self.quantizer, name, arrays[f"quantizer_{name}"])
+
+    @property
+    def dim(self) -> int:
+        """
+        Dimensionality of the indexed vectors.
+        """
+        return self._dim if self.matrix is None else self.matrix.shape[1]
+
+    @property
+    def nbytes(self) -> int:
+        """
+        Memory taken by the codes and quantizer parameters, in bytes.
+        """
+        return self.codes.nbytes + self.quantizer.nbytes
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """
+        Compute approximate cosine similarities with every indexed vector.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+
+        Returns:
+            np.ndarray: Approximate similarity score for each row of the index.
+        """
+        return self.quantizer.scores(self.codes, self.prepare_query(query_embedding))
+
+    def _score_rows(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Compute approximate similarities of a normalized query with a range of rows.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            start (int): First row.
+            end (int): End of the row range.
+
+        Returns:
+            np.ndarray: Approximate similarity score for each row in the range.
+        """
+        return self.quantizer.scores(self.codes[start:end], query)
+
+    def search_parallel(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        executor: Executor,
+        num_shards: int,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors by scanning code shards on an executor.
+
+        Re-ranked searches need one shortlist over all codes, so they are
+        run on the calling thread.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            executor (Executor): Long-lived thread pool that scores the shards.
+            num_shards (int): Maximum number of shards.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        if self.rerank and self.matrix is not None:
+            return self.search(query_embedding, top_k)
+        return super().search_parallel(query_embedding, top_k, executor, num_shards)
+
+    def search(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int = 3,
+        rerank: Optional[int] = None,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            rerank (Optional[int]): Shortlist size for exact re-ranking (defaults to self.rerank).
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        if not len(self):
+            return []
+
+        query = self.prepare_query(query_embedding)
+        matrix = self.matrix
+        scores = self._live(self.quantizer.scores(self.codes, query))
+        rerank = self.rerank if rerank is None else rerank
+        if not rerank or matrix is None:
+            return [
+                (self.ids[i], float(scores[i]))
+                for i in top_k_indices(scores, top_k)
+                if scores[i] > -np.inf
+            ]
+
+        # Re-score the approximate shortlist with the full-precision vectors
+        shortlist = top_k_indices(scores, max(rerank, top_k))
+        shortlist = shortlist[scores[shortlist] > -np.inf]
+        exact_scores = matrix[shortlist] @ query
+        return [
+            (self.ids[shortlist[i]], float(exact_scores[i]))
+            for i in top_k_indices(exact_scores, top_k)
+        ]
+
+    def search_batch(
+        self,
+        query_matrix: np.ndarray,
+        top_k: int = 3,
+        rerank: Optional[int] = None,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the top-k most similar vectors for each query.
+
+        Args:
+            query_matrix (np.ndarray): 2-D array with one query embedding per row.
+            top_k (int): Number of results to return per query.
+            rerank (Optional[int]): Shortlist size for exact re-ranking (defaults to self.rerank).
+
+        Returns:
+            List[List[Tuple[str, float]]]: For each query, (chunk ID, similarity) pairs, best first.
+        """
+        return [
+            self.search(query, top_k, rerank) for query in np.atleast_2d(query_matrix)
+        ]
@@ -0,0 +1,533 @@
+import json
+import time
+import asyncio
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+try:
+    from .embedding_creation import EmbeddingCreator
+    from .document_retrieval import DocumentRetriever
+    from .text_processing import TextProcessor
+    from .pipeline import IngestionPipeline, iter_source_chunks
+    from .metrics import metrics
+except ImportError:
+    from embedding_creation import EmbeddingCreator
+    from document_retrieval import DocumentRetriever
+    from text_processing import TextProcessor
+    from pipeline import IngestionPipeline, iter_source_chunks
+    from metrics import metrics
+
+MAX_REQUEST_LINE = 8192
+MAX_HEADERS = 100
+MAX_BODY = 1024 * 1024
+
+HTTP_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+def _positive_int(value: Any) -> Optional[int]:
+    """
+    Parse a positive integer given as a JSON number or a query string value.
+
+    Args:
+        value (Any): The value.
+
+    Returns:
+        Optional[int]: The integer, or None if the value is not a positive integer.
+    """
+    if isinstance(value, bool) or not isinstance(value, (int, str)):
+        return None
+    try:
+        number = int(value)
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+class RAGService:
+    """
+    Resident RAG pipeline that answers queries against a pre-built index.
+
+    The page is extracted, embedded and indexed once by build(); afterwards
+    each query only needs a query embedding, one index search and the text
+    processing of the top-k chunks.
+    """
+
+    def __init__(
+        self,
+        embedding_creator: Optional[EmbeddingCreator] = None,
+        document_retriever: Optional[DocumentRetriever] = None,
+        text_processor: Optional[TextProcessor] = None,
+        top_k: int = 3,
+        backend: str = "exact",
+        index_params: Optional[Dict[str, Any]] = None,
+        fusion: Optional[str] = None,
+    ):
+        """
+        Initialize the service with optional pre-built components.
+
+        Args:
+            embedding_creator (Optional[EmbeddingCreator]): Creator used to embed queries.
+            document_retriever (Optional[DocumentRetriever]): Retriever holding the indexed chunks.
+            text_processor (Optional[TextProcessor]): Processor applied to retrieved chunks.
+            top_k (int): Default number of results per query.
+            backend (str): Index backend of the retriever built by build().
+            index_params (Optional[Dict[str, Any]]): Keyword arguments for the index.
+            fusion (Optional[str]): Hybrid BM25 fusion mode, "rrf" or "weighted" (None for dense only).
+        """
+        self.logger = logging.getLogger(__name__)
+        self.embedding_creator = embedding_creator
+        self.document_retriever = document_retriever
+        self.text_processor = text_processor or TextProcessor()
+        self.top_k = top_k
+        self.backend = backend
+        self.index_params = index_params
+        self.fusion = fusion
+
+    @property
+    def ready(self) -> bool:
+        """
+        Whether the service has an index and a model to answer queries with.
+        """
+        return (
+            self.embedding_creator is not None and self.document_retriever is not None
+        )
+
+    def build(
+        self,
+        urls: List[str],
+        max_workers: int = 8,
+        dump_paths: Optional[List[str]] = None,
+    ) -> bool:
+        """
+        Extract, embed and index one or more Wikipedia pages.
+
+        Args:
+            urls (List[str]): The URLs of the Wikipedia pages to index.
+            max_workers (int): Maximum number of pages fetched concurrently.
+            dump_paths (Optional[List[str]]): Local dump files to index instead of the URLs.
+
+        Returns:
+            bool: True if the pipeline was built successfully, False otherwise.
+        """
+        embedding_creator = self.embedding_creator or EmbeddingCreator()
+        # build() runs outside the server's event loop, so the pipeline gets its own
+        document_retriever = asyncio.run(
+            IngestionPipeline(
+                embedding_creator,
+                backend=self.backend,
+                index_params=self.index_params,
+                sparse_index=self.fusion is not None,
+            ).run(iter_source_chunks(urls, max_workers, dump_paths))
+        )
+        embedding_creator.close()
+        if document_retriever is None:
+            self.logger.error("Failed to extract, embed and index the chunks.")
+            return False
+
+        # Queries are embedded with the model, so make sure it is resident
+        if not embedding_creator.model and not embedding_creator.load_model():
+            return False
+
+        self.embedding_creator = embedding_creator
+        self.document_retriever = document_retriever
+        self.logger.info(
+            f"Service ready with {len(document_retriever.chunks)} indexed chunks"
+        )
+        return True
+
+    def load_index(self, path: str) -> bool:
+        """
+        Serve a retriever saved with DocumentRetriever.save() instead of building one.
+
+        Args:
+            path (str): Directory containing the saved retriever.
+
+        Returns:
+            bool: True if the index and model were loaded successfully, False otherwise.
+        """
+        document_retriever = DocumentRetriever.load(
+            path,
+            index_params={"num_shards": (self.index_params or {}).get("num_shards")},
+        )
+        if document_retriever is None:
+            return False
+
+        embedding_creator = self.embedding_creator or EmbeddingCreator()
+        if not embedding_creator.model and not embedding_creator.load_model():
+            return False
+
+        self.embedding_creator = embedding_creator
+        self.document_retriever = document_retriever
+        self.logger.info(
+            f"Service ready with {len(document_retriever.index)} indexed chunks"
+        )
+        return True
+
+    def close(self) -> None:
+        """
+        Shut down the retriever's thread pool and index workers, and the worker
+        pools of the embedding creator and text processor.
+        """
+        if self.document_retriever is not None:
+            self.document_retriever.close()
+        if self.embedding_creator is not None:
+            self.embedding_creator.close()
+        self.text_processor.close()
+
+    def _search(self, query: str, top_k: int) -> List[Dict[str, Any]]:
+        """
+        Embed a query and retrieve the most similar chunks.
+
+        Args:
+            query (str): Query text.
+            top_k (int): Number of chunks to retrieve.
+
+        Returns:
+            List[Dict[str, Any]]: Retrieved chunks with similarity scores.
+        """
+        query_embedding = self.embedding_creator.embed_query(query)
+        if query_embedding is None:
+            return []
+        if self.fusion:
+            return self.document_retriever.retrieve_hybrid(
+                query, query_embedding, top_k=top_k, fusion=self.fusion
+            )
+        return self.document_retriever.retrieve_documents(query_embedding, top_k=top_k)
+
+    async def answer(self, query: str, top_k: Optional[int] = None) -> Dict[str, Any]:
+        """
+        Answer a query against the resident index.
+
+        Scoring runs in the default executor so a large index does not block
+        the event loop while other requests are being served.
+
+        Args:
+            query (str): Query text.
+            top_k (Optional[int]): Number of results (defaults to the service's top_k).
+
+        Returns:
+            Dict[str, Any]: The query, its processed results and the time taken.
+        """
+        start = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        relevant_chunks = await loop.run_in_executor(
+            None, self._search, query, top_k or self.top_k
+        )
+        processed_chunks = (
+            await self.text_processor.process_chunks(relevant_chunks)
+            if relevant_chunks
+            else []
+        )
+        took = time.perf_counter() - start
+        metrics.histogram("server_query_seconds", "Time to answer a query").observe(
+            took
+        )
+        return {
+            "query": query,
+            "results": processed_chunks,
+            "took_ms": took * 1000,
+        }
+
+
+class RAGServer:
+    """
+    Minimal asyncio HTTP/1.1 server exposing a RAGService.
+
+    Endpoints:
+        GET /health: Readiness check.
+        GET /metrics: Stage timers and counters in Prometheus text format
+            (?format=json for JSON).
+        GET /query?q=<text>&top_k=<n>: Answer a query.
+        POST /query: Answer a query given as JSON {"query": ..., "top_k": ...}.
+
+    Each connection is handled by its own coroutine and connections are
+    kept alive between requests, so many clients are served concurrently.
+    """
+
+    def __init__(self, service: RAGService):
+        """
+        Initialize the server.
+
+        Args:
+            service (RAGService): The service answering queries.
+        """
+        self.service = service
+        self.logger = logging.getLogger(__name__)
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 8000,
+        unix_socket: Optional[str] = None,
+    ) -> asyncio.AbstractServer:
+        """
+        Start listening on a TCP port or a Unix socket.
+
+        Args:
+            host (str): Interface to bind when serving over TCP.
+            port (int): TCP port (0 picks a free port).
+            unix_socket (Optional[str]): Path of a Unix socket to serve on instead of TCP.
+
+        Returns:
+            asyncio.AbstractServer: The running server.
+        """
+        if unix_socket:
+            self._server = await asyncio.start_unix_server(
+                self._handle_connection, path=unix_socket
+            )
+            self.logger.info(f"Serving on unix socket {unix_socket}")
+        else:
+            self._server = await asyncio.start_server(
+                self._handle_connection, host=host, port=port
+            )
+            self.logger.info(f"Serving on http://{host}:{self.port}")
+        return self._server
+
+    @property
+    def port(self) -> Optional[int]:
+        """
+        TCP port the server is bound to, if serving over TCP.
+        """
+        if self._server is None or not self._server.sockets:
+            return None
+        address = self._server.sockets[0].getsockname()
+        return address[1] if isinstance(address, tuple) else None
+
+    async def serve_forever(self) -> None:
+        """
+        Serve requests until the server is closed or the task is cancelled.
+        """
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def close(self) -> None:
+        """
+        Stop accepting connections and wait for the server to shut down.
+        """
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    async def _read_request(
+        self, reader: asyncio.StreamReader
+    ) -> Optional[Tuple[str, str, Dict[str, str], bytes]]:
+        """
+        Read one HTTP request from a connection.
+
+        Args:
+            reader (asyncio.StreamReader): Connection reader.
+
+        Returns:
+            Optional[Tuple[str, str, Dict[str, str], bytes]]: Method, target, headers and body,
+            or None if the client closed the connection.
+        """
+        request_line = await reader.readline()
+        if not request_line:
+            return None
+        if len(request_line) > MAX_REQUEST_LINE:
+            raise ValueError("Request line too long")
+        method, target, _ = request_line.decode("latin-1").split(" ", 2)
+
+        headers = {}
+        for _ in range(MAX_HEADERS):
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        length = int(headers.get("content-length", 0))
+        if length > MAX_BODY:
+            raise OverflowError("Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target, headers, body
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Any]:
+        """
+        Route a request to its handler.
+
+        Args:
+            method (str): HTTP method.
+            target (str): Request target (path and query string).
+            body (bytes): Request body.
+
+        Returns:
+            Tuple[int, Any]: HTTP status and payload; a string payload is sent as
+                plain text, anything else as JSON.
+        """
+        url = urlsplit(target)
+
+        if url.path == "/metrics":
+            if parse_qs(url.query).get("format", [""])[-1] == "json":
+                return 200, metrics.snapshot()
+            return 200, metrics.to_prometheus()
+
+        if url.path == "/health":
+            if not self.service.ready:
+                return 503, {"status": "starting"}
+            return 200, {"status": "ok"}
+
+        if url.path != "/query":
+            return 404, {"error": f"Unknown path {url.path}"}
+
+        if method == "GET":
+            params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        elif method == "POST":
+            params = json.loads(body or b"{}")
+            if not isinstance(params, dict):
+                return 400, {"error": "Request body must be a JSON object"}
+        else:
+            return 405, {"error": f"Method {method} not allowed"}
+
+        query = params.get("q") or params.get("query")
+        if not query:
+            return 400, {"error": "Missing query"}
+        if not isinstance(query, str) or not query.strip():
+            return 400, {"error": "Query must be a non-empty string"}
+        top_k = params.get("top_k")
+        if top_k in (None, ""):
+            top_k = None
+        else:
+            top_k = _positive_int(top_k)
+            if top_k is None:
+                return 400, {"error": "top_k must be a positive integer"}
+        if not self.service.ready:
+            return 503, {"error": "Service is not ready"}
+
+        return 200, await self.service.answer(query, top_k)
+
+    async def _handle_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """
+        Serve requests on one connection until the client closes it.
+
+        Args:
+            reader (asyncio.StreamReader): Connection reader.
+            writer (asyncio.StreamWriter): Connection writer.
+        """
+        try:
+            while True:
+                keep_alive = True
+                try:
+                    request = await self._read_request(reader)
+                    if request is None:
+                        break
+                    method, target, headers, body = request
+                    keep_alive = headers.get("connection", "").lower() != "close"
+                    status, payload = await self._dispatch(method, target, body)
+                except OverflowError as e:
+                    status, payload, keep_alive = 413, {"error": str(e)}, False
+                except (ValueError, KeyError, asyncio.IncompleteReadError) as e:
+                    status, payload, keep_alive = 400, {"error": str(e)}, False
+                except Exception as e:
+                    self.logger.error(f"Error handling request: {e}")
+                    status, payload = 500, {"error": "Internal server error"}
+
+                if isinstance(payload, str):
+                    content_type = "text/plain; version=0.0.4; charset=utf-8"
+                    data = payload.encode("utf-8")
+                else:
+                    content_type = "application/json"
+                    data = json.dumps(payload).encode("utf-8")
+                writer.write(
+                    (
+                        f"HTTP/1.1 {status} {HTTP_REASONS[status]}\r\n"
+                        f"Content-Type: {content_type}\r\n"
+                        f"Content-Length: {len(data)}\r\n"
+                        f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+                        "\r\n"
+                    ).encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+
+async def run_server(
+    urls: List[str],
+    max_workers: int = 8,
+    dump_paths: Optional[List[str]] = None,
+    index_path: Optional[str] = None,
+    save_path: Optional[str] = None,
+    top_k: int = 3,
+    host: str = "127.0.0.1",
+    port: int = 8000,
+    unix_socket: Optional[str] = None,
+    backend: str = "exact",
+    index_params: Optional[Dict[str, Any]] = None,
+    fusion: Optional[str] = None,
+    text_processor: Optional[TextProcessor] = None,
+    embedding_creator: Optional[EmbeddingCreator] = None,
+) -> int:
+    """
+    Build the pipeline once and serve queries until interrupted.
+
+    The server starts listening before the index is built or loaded, so
+    /health reports 503 until the service is ready. On shutdown the
+    service's thread and process pools are closed.
+
+    Args:
+        urls (List[str]): The URLs of the Wikipedia pages to index.
+        max_workers (int): Maximum number of pages fetched concurrently.
+        dump_paths (Optional[List[str]]): Local dump files to index instead of the URLs.
+        index_path (Optional[str]): Saved retriever to serve instead of building one.
+        save_path (Optional[str]): Directory to save a newly built retriever to.
+        top_k (int): Default number of results per query.
+        host (str): Interface to bind when serving over TCP.
+        port (int): TCP port.
+        unix_socket (Optional[str]): Path of a Unix socket to serve on instead of TCP.
+        backend (str): Index backend, "exact", "ivf", "quantized" or "sharded".
+        index_params (Optional[Dict[str, Any]]): Keyword arguments for the index.
+        fusion (Optional[str]): Hybrid BM25 fusion mode, "rrf" or "weighted" (None for dense only).
+        text_processor (Optional[TextProcessor]): Processor applied to retrieved chunks.
+        embedding_creator (Optional[EmbeddingCreator]): Creator used for chunk and query embeddings.
+
+    Returns:
+        int: Exit code.
+    """
+    service = RAGService(
+        embedding_creator=embedding_creator,
+        text_processor=text_processor,
+        top_k=top_k,
+        backend=backend,
+        index_params=index_params,
+        fusion=fusion,
+    )
+    loop = asyncio.get_running_loop()
+    server = RAGServer(service)
+    await server.start(host=host, port=port, unix_socket=unix_socket)
+    try:
+        if index_path:
+            if not await loop.run_in_executor(None, service.load_index, index_path):
+                return 1
+        else:
+            if not await loop.run_in_executor(
+                None, service.build, urls, max_workers, dump_paths
+            ):
+                return 1
+            if save_path:
+                await loop.run_in_executor(
+                    None, service.document_retriever.save, save_path
+                )
+
+        await server.serve_forever()
+        return 0
+    finally:
+        await server.close()
+        service.close()
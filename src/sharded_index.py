@@ -0,0 +1,310 @@
+import os
+import uuid
+import weakref
+import tempfile
+import threading
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import Executor
+from multiprocessing import Pool, cpu_count
+from typing import List, Dict, Tuple, Optional, Any
+
+try:
+    from .vector_index import VectorIndex, MIN_SHARD_ROWS, normalize_rows, scan_top_k
+except ImportError:
+    from vector_index import VectorIndex, MIN_SHARD_ROWS, normalize_rows, scan_top_k
+
+# Directory for the files backing shared arrays; /dev/shm keeps them in RAM
+SHARED_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# Maximum number of shared arrays a worker keeps mapped
+MAX_ATTACHED = 8
+
+# Shared arrays mapped in a worker process, by file path
+_attached: "OrderedDict[str, np.ndarray]" = OrderedDict()
+
+# Description of a shared array: file path, dtype and shape of one row
+ArraySpec = Tuple[str, str, Tuple[int, ...]]
+
+
+def _remove_file(path: str) -> None:
+    """
+    Delete the file behind a shared array once nothing maps it any more.
+
+    Args:
+        path (str): Path of the file.
+    """
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+def _attach(spec: ArraySpec) -> np.ndarray:
+    """
+    Map a shared array in a worker process, reusing recent mappings.
+
+    Args:
+        spec (ArraySpec): Description of the array.
+
+    Returns:
+        np.ndarray: Read-only view of the whole file.
+    """
+    path, dtype, row_shape = spec
+    if path in _attached:
+        _attached.move_to_end(path)
+        return _attached[path]
+
+    array = np.memmap(path, dtype=np.dtype(dtype), mode="r")
+    array = array.reshape((-1,) + tuple(row_shape))
+    _attached[path] = array
+    while len(_attached) > MAX_ATTACHED:
+        _attached.popitem(last=False)
+    return array
+
+
+def _search_shard(
+    task: Tuple[ArraySpec, Optional[ArraySpec], int, int, np.ndarray, int],
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the top-k rows of one shard for each query, in a worker process.
+
+    Args:
+        task (Tuple): Matrix and tombstone specs, row range, queries and top_k.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Scores and row indices of the shard's
+            candidates, one row per query.
+    """
+    matrix_spec, deleted_spec, start, end, queries, top_k = task
+    deleted = _attach(deleted_spec) if deleted_spec else None
+    return scan_top_k(_attach(matrix_spec), queries, top_k, start, end, deleted)
+
+
+class ShardedIndex(VectorIndex):
+    """
+    Exact cosine-similarity index scanned by a pool of worker processes.
+
+    The matrix and the tombstone mask live in files under /dev/shm that
+    every worker memory-maps, so the vectors are stored once however many
+    processes read them. A query block is broadcast to num_shards workers;
+    each scans a contiguous range of rows and returns its own top-k, and
+    the parent merges the candidates. Unlike the thread pool of the exact
+    backend, the workers do not share a GIL, so throughput keeps scaling
+    with cores.
+
+    Appends, removals and compaction work as in VectorIndex: new rows are
+    written into the shared files, and grown or compacted arrays get new
+    files that workers map on their next task.
+    """
+
+    def __init__(
+        self,
+        embeddings: Dict[str, np.ndarray],
+        num_shards: Optional[int] = None,
+        min_shard_rows: int = MIN_SHARD_ROWS,
+    ):
+        """
+        Build the index from a dictionary of embeddings.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+            num_shards (Optional[int]): Number of worker processes, one shard each (defaults to the CPU count).
+            min_shard_rows (int): Smallest shard worth sending to a worker; smaller indexes are
+                searched in the calling process.
+        """
+        super().__init__(embeddings)
+        self.num_shards = num_shards or cpu_count()
+        self.min_shard_rows = min_shard_rows
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._share("matrix")
+
+    def _share(self, name: str) -> None:
+        """
+        Move a per-row array attribute into a shared file.
+
+        Args:
+            name (str): Name of the array attribute.
+        """
+        array = getattr(self, name)
+        if array is not None and len(array):
+            setattr(self, name, None)
+            self._append_array(name, np.ascontiguousarray(array))
+
+    def _new_buffer(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        Allocate a growing per-row array in a file that workers can map.
+
+        The file is deleted as soon as the buffer and every view of it are
+        garbage collected.
+
+        Args:
+            shape (Tuple[int, ...]): Shape of the buffer.
+            dtype (np.dtype): Data type of the buffer.
+
+        Returns:
+            np.ndarray: Uninitialized, file-backed buffer.
+        """
+        path = os.path.join(SHARED_DIR, f"rag-shard-{uuid.uuid4().hex}.bin")
+        buffer = np.memmap(path, dtype=dtype, mode="w+", shape=shape)
+        weakref.finalize(buffer, _remove_file, path)
+        return buffer
+
+    @staticmethod
+    def _spec(array: Optional[np.ndarray]) -> Optional[ArraySpec]:
+        """
+        Describe a shared array so a worker can map it.
+
+        Args:
+            array (Optional[np.ndarray]): A buffer from _new_buffer() or a view of its first rows.
+
+        Returns:
+            Optional[ArraySpec]: The description, or None if the array is not shared.
+        """
+        if not isinstance(array, np.memmap) or not os.path.basename(
+            array.filename or ""
+        ).startswith("rag-shard-"):
+            return None
+        return array.filename, array.dtype.str, array.shape[1:]
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """
+        Keep only the given rows, in a new shared file.
+
+        Args:
+            keep (np.ndarray): Indices of the rows to keep, in order.
+        """
+        super()._compact(keep)
+        self._share("matrix")
+
+    def _params(self) -> Dict[str, Any]:
+        """
+        JSON-serializable settings saved alongside the arrays.
+        """
+        return {"num_shards": self.num_shards, "min_shard_rows": self.min_shard_rows}
+
+    def _restore(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> None:
+        """
+        Set the index state from saved arrays and settings.
+
+        The saved files can be replaced by a later save to the same
+        directory, so the arrays are copied into shared files of their own.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays returned by _arrays() when saving.
+            params (Dict[str, Any]): Settings returned by _params() when saving.
+        """
+        super()._restore(arrays, params)
+        self.num_shards = params.get("num_shards") or cpu_count()
+        self.min_shard_rows = params.get("min_shard_rows", MIN_SHARD_ROWS)
+        self._pool = None
+        self._pool_lock = threading.Lock()
+        self._share("matrix")
+        self._share("deleted")
+
+    def _get_pool(self):
+        """
+        Return the persistent worker pool, starting it on first use.
+
+        Returns:
+            multiprocessing.pool.Pool: The worker pool.
+        """
+        with self._pool_lock:
+            if self._pool is None:
+                self.logger.info(
+                    f"Starting retrieval pool with {self.num_shards} processes"
+                )
+                self._pool = Pool(processes=self.num_shards)
+            return self._pool
+
+    def close(self) -> None:
+        """
+        Shut down the worker pool if one was started.
+        """
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.close()
+                self._pool.join()
+                self._pool = None
+
+    def search(
+        self, query_embedding: np.ndarray, top_k: int = 3
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        return self.search_batch(np.asarray(query_embedding).reshape(1, -1), top_k)[0]
+
+    def search_parallel(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        executor: Executor,
+        num_shards: int,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors.
+
+        The shards are already scanned by worker processes, so the thread
+        pool is not used.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            executor (Executor): Unused.
+            num_shards (int): Unused.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        return self.search(query_embedding, top_k)
+
+    def search_batch(
+        self, query_matrix: np.ndarray, top_k: int = 3, **kwargs
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the top-k most similar vectors for each row of a query matrix.
+
+        Args:
+            query_matrix (np.ndarray): 2-D array with one query embedding per row.
+            top_k (int): Number of results to return per query.
+            **kwargs: Tile sizes passed to VectorIndex.search_batch() for small indexes.
+
+        Returns:
+            List[List[Tuple[str, float]]]: For each query, (chunk ID, similarity) pairs, best first.
+        """
+        matrix, deleted = self.matrix, self.deleted
+        num_rows = 0 if matrix is None else matrix.shape[0]
+        num_shards = min(self.num_shards, num_rows // max(self.min_shard_rows, 1))
+        matrix_spec = self._spec(matrix)
+        if num_shards <= 1 or matrix_spec is None:
+            return super().search_batch(query_matrix, top_k, **kwargs)
+
+        queries = normalize_rows(np.atleast_2d(query_matrix))
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return [[] for _ in range(queries.shape[0])]
+
+        # Broadcast the queries to every shard, then merge the shard top-ks
+        deleted_spec = self._spec(deleted) if self.num_deleted else None
+        bounds = np.linspace(0, num_rows, num_shards + 1).astype(int)
+        shard_results = self._get_pool().map(
+            _search_shard,
+            [
+                (matrix_spec, deleted_spec, start, end, queries, top_k)
+                for start, end in zip(bounds[:-1], bounds[1:])
+            ],
+        )
+        return self._rank_candidates(
+            np.hstack([scores for scores, _ in shard_results]),
+            np.hstack([indices for _, indices in shard_results]),
+            top_k,
+        )
@@ -1,13 +1,229 @@
 import asyncio
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
 import re
+import os
+import threading
 import logging
-from typing import List, Dict, Any
-import nltk
+from functools import lru_cache
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import List, Dict, Any, Optional, FrozenSet, Callable
 
-nltk.download("punkt")
-nltk.download("stopwords")
+try:
+    from .tokenizer import TokenCache
+    from .metrics import metrics
+except ImportError:
+    from tokenizer import TokenCache
+    from metrics import metrics
+
+# Directory searched first for NLTK data, and where downloads are stored
+NLTK_DATA_DIR = os.environ.get("RAG_NLTK_DATA") or os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "nltk_data"
+)
+
+# Sentence boundaries used when NLTK's punkt model is not available
+SENTENCE_END_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+# Tokens kept after stopword removal: purely alphabetic ASCII words
+WORD_PATTERN = re.compile(r"[a-zA-Z]+")
+
+# NLTK's English stopword list, used when its corpus is not available
+ENGLISH_STOP_WORDS = frozenset("""
+    a about above after again against ain all am an and any are aren aren't as
+    at be because been before being below between both but by can couldn
+    couldn't d did didn didn't do does doesn doesn't doing don don't down
+    during each few for from further had hadn hadn't has hasn hasn't have
+    haven haven't having he her here hers herself him himself his how i if in
+    into is isn isn't it it's its itself just ll m ma me mightn mightn't more
+    most mustn mustn't my myself needn needn't no nor not now o of off on once
+    only or other our ours ourselves out over own re s same shan shan't she
+    she's should should've shouldn shouldn't so some such t than that that'll
+    the their theirs them themselves then there these they this those through
+    to too under until up ve very was wasn wasn't we were weren weren't what
+    when where which while who whom why will with won won't wouldn wouldn't y
+    you you'd you'll you're you've your yours yourself yourselves
+    """.split())
+
+# Smallest batch worth sending to the executor; smaller batches (such as the
+# top-k results of a query) are processed inline, where a round trip to a
+# worker would cost more than the tokenization itself
+MIN_OFFLOAD_CHUNKS = 64
+
+logger = logging.getLogger(__name__)
+
+# Word-level tokens of processed chunks by chunk ID; kept apart from the
+# embedding tokenizer's cache, whose tokens are filtered differently
+word_token_cache = TokenCache()
+
+
+def _nltk_resource(
+    probe: Callable[[], Any], packages: List[str], data_dir: str, download: bool
+) -> Any:
+    """
+    Resolve an NLTK resource, searching data_dir and optionally downloading into it.
+
+    Args:
+        probe (Callable[[], Any]): Loads the resource, raising LookupError if its data is missing.
+        packages (List[str]): NLTK packages that provide the data.
+        data_dir (str): Local NLTK data directory.
+        download (bool): Whether to download missing packages into data_dir.
+
+    Returns:
+        Any: The result of probe(), or None if the data is not available.
+    """
+    import nltk
+
+    if data_dir not in nltk.data.path:
+        nltk.data.path.insert(0, data_dir)
+    try:
+        return probe()
+    except LookupError:
+        if not download:
+            return None
+
+    for package in packages:
+        try:
+            nltk.download(package, download_dir=data_dir, quiet=True)
+        except Exception as e:
+            logger.error(f"Error downloading NLTK package {package}: {e}")
+    try:
+        return probe()
+    except LookupError:
+        return None
+
+
+@lru_cache(maxsize=None)
+def load_stop_words(
+    data_dir: str = NLTK_DATA_DIR, download: bool = False
+) -> FrozenSet[str]:
+    """
+    Load NLTK's English stopwords, falling back to the bundled copy.
+
+    Args:
+        data_dir (str): Local NLTK data directory.
+        download (bool): Whether to download the corpus if it is missing.
+
+    Returns:
+        FrozenSet[str]: Lowercase stopwords.
+    """
+
+    def probe():
+        from nltk.corpus import stopwords
+
+        return frozenset(stopwords.words("english"))
+
+    stop_words = _nltk_resource(probe, ["stopwords"], data_dir, download)
+    if stop_words is None:
+        logger.warning("NLTK stopwords not found; using the bundled list")
+        return ENGLISH_STOP_WORDS
+    return stop_words
+
+
+@lru_cache(maxsize=None)
+def load_word_tokenizer(
+    data_dir: str = NLTK_DATA_DIR, download: bool = False
+) -> Callable[[str], List[str]]:
+    """
+    Load NLTK's word_tokenize, splitting sentences with a regex if punkt is missing.
+
+    The word-level rules need no NLTK data, so without punkt only the
+    sentence boundaries are approximated, which decides whether a period
+    is split off an abbreviation such as "Dr.".
+
+    Args:
+        data_dir (str): Local NLTK data directory.
+        download (bool): Whether to download the punkt model if it is missing.
+
+    Returns:
+        Callable[[str], List[str]]: Function splitting a text into word-level tokens.
+    """
+
+    def probe():
+        from nltk.tokenize import word_tokenize
+
+        word_tokenize("Probe.")
+        return word_tokenize
+
+    word_tokenize = _nltk_resource(probe, ["punkt", "punkt_tab"], data_dir, download)
+    if word_tokenize is not None:
+        return word_tokenize
+
+    from nltk.tokenize import NLTKWordTokenizer
+
+    logger.warning("NLTK punkt model not found; splitting sentences with a regex")
+    word_tokenizer = NLTKWordTokenizer()
+
+    def fallback_tokenize(text: str) -> List[str]:
+        return [
+            token
+            for sentence in SENTENCE_END_PATTERN.split(text)
+            for token in word_tokenizer.tokenize(sentence)
+        ]
+
+    return fallback_tokenize
+
+
+def process_text(
+    chunk: Dict[str, Any],
+    stop_words: FrozenSet[str],
+    tokens: Optional[List[str]] = None,
+    tokenizer: Optional[Callable[[str], List[str]]] = None,
+) -> Dict[str, Any]:
+    """
+    Drop stopwords and non-alphabetic tokens from a chunk, lowercasing the rest.
+
+    Args:
+        chunk (Dict[str, Any]): Dictionary containing chunk information.
+        stop_words (FrozenSet[str]): Lowercase words to drop.
+        tokens (Optional[List[str]]): Word-level tokens of the chunk's text, if already
+            known; otherwise the text is split with tokenizer here.
+        tokenizer (Optional[Callable[[str], List[str]]]): Word tokenizer. Defaults to
+            load_word_tokenizer().
+
+    Returns:
+        Dict[str, Any]: Dictionary with processed chunk information.
+    """
+    if tokens is None:
+        tokens = (tokenizer or load_word_tokenizer())(chunk["text"])
+    is_word = WORD_PATTERN.fullmatch
+    filtered_tokens = [
+        word
+        for word in (token.lower() for token in tokens if is_word(token))
+        if word not in stop_words
+    ]
+
+    return {
+        "id": chunk["id"],
+        "original_text": chunk["text"],
+        "processed_text": " ".join(filtered_tokens),
+        "token_count": len(filtered_tokens),
+        "similarity": chunk.get("similarity", 0.0),
+    }
+
+
+def process_batch(
+    chunks: List[Dict[str, Any]],
+    stop_words: FrozenSet[str],
+    data_dir: str = NLTK_DATA_DIR,
+) -> List[Dict[str, Any]]:
+    """
+    Process a batch of chunks, in an executor worker.
+
+    Args:
+        chunks (List[Dict[str, Any]]): List of dictionaries containing chunk information.
+        stop_words (FrozenSet[str]): Lowercase words to drop.
+        data_dir (str): Local NLTK data directory the word tokenizer is loaded from.
+
+    Returns:
+        List[Dict[str, Any]]: List of dictionaries with processed chunk information,
+            or an error entry for each chunk that could not be processed.
+    """
+    tokenizer = load_word_tokenizer(data_dir)
+    results = []
+    for chunk in chunks:
+        try:
+            results.append(process_text(chunk, stop_words, tokenizer=tokenizer))
+        except Exception as e:
+            results.append({"id": chunk.get("id", "unknown"), "error": str(e)})
+    return results
 
 
 class TextProcessor:
@@ -15,16 +231,82 @@ class TextProcessor:
     Class for asynchronously processing retrieved text chunks.
     """
 
-    def __init__(self):
+    def __init__(
+        self,
+        executor: Optional[Executor] = None,
+        min_offload_chunks: int = MIN_OFFLOAD_CHUNKS,
+        data_dir: str = NLTK_DATA_DIR,
+        download: bool = False,
+        cache: TokenCache = word_token_cache,
+    ):
         """
         Initialize the TextProcessor.
+
+        Chunks are split into words with NLTK's word_tokenize (unlike the
+        embedding tokenizer, it drops no short or long words), and the tokens
+        are cached by chunk ID. NLTK and its data are only loaded when the
+        first chunk is processed; if the stopwords corpus is not found, a
+        bundled stopword list is used instead.
+
+        Args:
+            executor (Optional[Executor]): Executor that tokenizes large batches. Defaults
+                to a process pool, started on first use and shut down by close().
+            min_offload_chunks (int): Smallest batch sent to the executor; smaller batches
+                are processed on the event loop.
+            data_dir (str): Local NLTK data directory, searched before NLTK's default paths.
+            download (bool): Whether to download missing NLTK data into data_dir.
+            cache (TokenCache): Cache of word-level chunk tokens by chunk ID.
         """
         self.logger = logging.getLogger(__name__)
-        self.stop_words = set(stopwords.words("english"))
+        self.min_offload_chunks = min_offload_chunks
+        self.data_dir = data_dir
+        self.download = download
+        self.cache = cache
+        self._executor = executor
+        self._owns_executor = executor is None
+        self._executor_lock = threading.Lock()
+
+    @property
+    def stop_words(self) -> FrozenSet[str]:
+        """
+        Lowercase stopwords, loaded on first use.
+        """
+        return load_stop_words(self.data_dir, self.download)
+
+    @property
+    def word_tokenizer(self) -> Callable[[str], List[str]]:
+        """
+        Word tokenizer, loaded on first use.
+        """
+        return load_word_tokenizer(self.data_dir, self.download)
+
+    def _get_executor(self) -> Executor:
+        """
+        Return the executor, starting the default process pool on first use.
+
+        Returns:
+            Executor: The executor for large batches.
+        """
+        with self._executor_lock:
+            if self._executor is None:
+                self.logger.info(
+                    f"Starting text processing pool with {os.cpu_count()} processes"
+                )
+                self._executor = ProcessPoolExecutor()
+            return self._executor
+
+    def close(self) -> None:
+        """
+        Shut down the default process pool if one was started.
+        """
+        with self._executor_lock:
+            if self._owns_executor and self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
 
     async def process_chunk(self, chunk: Dict[str, Any]) -> Dict[str, Any]:
         """
-        Process a single text chunk asynchronously.
+        Process a single text chunk.
 
         Args:
             chunk (Dict[str, Any]): Dictionary containing chunk information.
@@ -33,33 +315,11 @@ class TextProcessor:
             Dict[str, Any]: Dictionary with processed chunk information.
         """
         try:
-            # Simulate some async processing time
-            await asyncio.sleep(0.01)
-
-            # Tokenize text
-            tokens = word_tokenize(chunk["text"])
-
-            # Remove stopwords and punctuation
-            filtered_tokens = [
-                token.lower()
-                for token in tokens
-                if token.lower() not in self.stop_words
-                and re.match(r"^[a-zA-Z]+$", token)
-            ]
-
-            # Create processed text
-            processed_text = " ".join(filtered_tokens)
-
-            # Create result dictionary
-            result = {
-                "id": chunk["id"],
-                "original_text": chunk["text"],
-                "processed_text": processed_text,
-                "token_count": len(filtered_tokens),
-                "similarity": chunk.get("similarity", 0.0),
-            }
-
-            return result
+            tokens = self.cache.get(chunk["id"], chunk["text"])
+            if tokens is None:
+                tokens = self.word_tokenizer(chunk["text"])
+                self.cache.put(chunk["id"], chunk["text"], tokens)
+            return process_text(chunk, self.stop_words, tokens)
         except Exception as e:
             self.logger.error(
                 f"Error processing chunk {chunk.get('id', 'unknown')}: {e}"
@@ -72,6 +332,10 @@ class TextProcessor:
         """
         Process multiple text chunks concurrently.
 
+        Batches of at least min_offload_chunks chunks are split across the
+        executor's workers, so tokenization runs in parallel and the event
+        loop stays free; smaller batches are processed inline.
+
         Args:
             chunks (List[Dict[str, Any]]): List of dictionaries containing chunk information.
 
@@ -83,14 +347,60 @@ class TextProcessor:
             return []
 
         try:
-            # Create a list of tasks for asynchronous processing
-            tasks = [self.process_chunk(chunk) for chunk in chunks]
-
-            # Execute all tasks concurrently and collect results
-            processed_chunks = await asyncio.gather(*tasks)
+            with metrics.timer(
+                "text_processing_seconds", "Time to process a batch of retrieved chunks"
+            ):
+                if len(chunks) < self.min_offload_chunks:
+                    processed_chunks = await asyncio.gather(
+                        *[self.process_chunk(chunk) for chunk in chunks]
+                    )
+                else:
+                    processed_chunks = await self._process_offloaded(chunks)
+            metrics.counter(
+                "text_processing_chunks_total", "Retrieved chunks processed"
+            ).inc(len(processed_chunks))
 
             self.logger.info(f"Processed {len(processed_chunks)} chunks successfully")
             return processed_chunks
         except Exception as e:
             self.logger.error(f"Error in concurrent chunk processing: {e}")
             return []
+
+    async def _process_offloaded(
+        self, chunks: List[Dict[str, Any]]
+    ) -> List[Dict[str, Any]]:
+        """
+        Process chunks in the executor, in about one contiguous batch per CPU.
+
+        Args:
+            chunks (List[Dict[str, Any]]): List of dictionaries containing chunk information.
+
+        Returns:
+            List[Dict[str, Any]]: List of dictionaries with processed chunk information, in order.
+        """
+        executor = self._get_executor()
+        # Download missing punkt data here, once, before the workers load it
+        load_word_tokenizer(self.data_dir, self.download)
+        batch_size = max(self.min_offload_chunks, -(-len(chunks) // os.cpu_count()))
+
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(
+            *[
+                loop.run_in_executor(
+                    executor,
+                    process_batch,
+                    chunks[start : start + batch_size],
+                    self.stop_words,
+                    self.data_dir,
+                )
+                for start in range(0, len(chunks), batch_size)
+            ]
+        )
+
+        processed_chunks = [result for batch in batches for result in batch]
+        for result in processed_chunks:
+            if "error" in result:
+                self.logger.error(
+                    f"Error processing chunk {result['id']}: {result['error']}"
+                )
+        return processed_chunks
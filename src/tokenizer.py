@@ -0,0 +1,141 @@
+import re
+import threading
+import logging
+from collections import OrderedDict
+from typing import List, Tuple, Optional
+
+# Runs of word characters that do not start with a digit, the same tokens
+# as gensim's simple_preprocess
+TOKEN_PATTERN = re.compile(r"(?:(?!\d)\w)+")
+
+# Tokens outside this length range are dropped, as in simple_preprocess
+MIN_TOKEN_LEN = 2
+MAX_TOKEN_LEN = 15
+
+# Number of chunks whose tokens the shared cache keeps
+TOKEN_CACHE_SIZE = 65536
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Split a text into lowercase word tokens.
+
+    Produces the same tokens as gensim's simple_preprocess with its default
+    arguments, without importing gensim.
+
+    Args:
+        text (str): Text to tokenize.
+
+    Returns:
+        List[str]: The tokens, in order.
+    """
+    return [
+        token
+        for token in TOKEN_PATTERN.findall(text.lower())
+        if MIN_TOKEN_LEN <= len(token) <= MAX_TOKEN_LEN and token[0] != "_"
+    ]
+
+
+class TokenCache:
+    """
+    Least-recently-used cache of chunk tokens, keyed by chunk ID.
+
+    Tokens computed for a chunk while embedding it are reused when the same
+    chunk is indexed for BM25 or post-processed after retrieval. Each entry
+    remembers the text it was computed from, so a chunk whose text changed
+    is tokenized again instead of returning stale tokens.
+    """
+
+    def __init__(self, max_entries: int = TOKEN_CACHE_SIZE):
+        """
+        Initialize an empty cache.
+
+        Args:
+            max_entries (int): Maximum number of chunks kept; the least recently used are evicted.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Tuple[str, List[str]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, chunk_id: str, text: str) -> Optional[List[str]]:
+        """
+        Look up the tokens of a chunk.
+
+        Args:
+            chunk_id (str): ID of the chunk.
+            text (str): Current text of the chunk.
+
+        Returns:
+            Optional[List[str]]: The cached tokens, or None if the chunk is not
+                cached or was cached with a different text.
+        """
+        with self._lock:
+            entry = self._entries.get(chunk_id)
+            if entry is None or (entry[0] is not text and entry[0] != text):
+                self.misses += 1
+                return None
+            self._entries.move_to_end(chunk_id)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, chunk_id: str, text: str, tokens: List[str]) -> None:
+        """
+        Store the tokens of a chunk, evicting the least recently used chunks if full.
+
+        Args:
+            chunk_id (str): ID of the chunk.
+            text (str): Text the tokens were computed from.
+            tokens (List[str]): The tokens.
+        """
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[chunk_id] = (text, tokens)
+            self._entries.move_to_end(chunk_id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def tokens(self, chunk_id: str, text: str) -> List[str]:
+        """
+        Return the tokens of a chunk, tokenizing and caching it on a miss.
+
+        Args:
+            chunk_id (str): ID of the chunk.
+            text (str): Current text of the chunk.
+
+        Returns:
+            List[str]: The tokens, in order. The list is shared with the cache
+                and must not be modified.
+        """
+        tokens = self.get(chunk_id, text)
+        if tokens is None:
+            tokens = tokenize(text)
+            self.put(chunk_id, text, tokens)
+        return tokens
+
+    def discard(self, chunk_id: str) -> None:
+        """
+        Drop a chunk from the cache if it is present.
+
+        Args:
+            chunk_id (str): ID of the chunk.
+        """
+        with self._lock:
+            self._entries.pop(chunk_id, None)
+
+    def clear(self) -> None:
+        """
+        Drop every cached chunk.
+        """
+        with self._lock:
+            self._entries.clear()
+
+
+# Cache shared by the embedding, BM25 and text processing stages
+token_cache = TokenCache()
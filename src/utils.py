@@ -1,6 +1,7 @@
 import os
 import logging
 from datetime import datetime
+from typing import List, Dict, Any
 
 
 def setup_logging(log_level: str = "INFO") -> None:
@@ -47,3 +48,27 @@ def format_time(seconds: float) -> str:
         return f"{seconds * 1000:.2f} ms"
     else:
         return f"{seconds:.2f} s"
+
+
+def format_metrics(snapshot: Dict[str, Dict[str, Any]]) -> List[str]:
+    """
+    Format a metrics snapshot as one human-readable line per metric.
+
+    Args:
+        snapshot (Dict[str, Dict[str, Any]]): Metrics by name, as returned by
+            MetricsRegistry.snapshot().
+
+    Returns:
+        List[str]: Formatted lines, with durations in the most readable unit.
+    """
+    lines = []
+    for name, metric in snapshot.items():
+        if metric["type"] == "counter":
+            lines.append(f"{name}: {metric['value']:g}")
+        elif metric["count"]:
+            lines.append(
+                f"{name}: {metric['count']} calls, total {format_time(metric['sum'])}, "
+                f"p50 {format_time(metric['p50'])}, p95 {format_time(metric['p95'])}, "
+                f"p99 {format_time(metric['p99'])}"
+            )
+    return lines
@@ -0,0 +1,670 @@
+import os
+import copy
+import json
+import heapq
+import numpy as np
+import logging
+from concurrent.futures import Executor
+from itertools import chain
+from operator import itemgetter
+from typing import List, Dict, Tuple, Any, Iterable, Optional
+
+# Smallest number of rows worth scoring on a separate thread
+MIN_SHARD_ROWS = 32768
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """
+    Scale each row of a matrix to unit L2 norm.
+
+    Rows with zero norm are left as zeros so that their cosine similarity
+    with any query is 0, matching scikit-learn's cosine_similarity.
+
+    Args:
+        matrix (np.ndarray): 2-D array of row vectors.
+
+    Returns:
+        np.ndarray: Contiguous float32 array with unit-norm rows.
+    """
+    matrix = np.ascontiguousarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """
+    Return the indices of the top-k scores in descending score order.
+
+    Uses argpartition so that only the k selected scores are sorted.
+
+    Args:
+        scores (np.ndarray): 1-D array of scores.
+        top_k (int): Number of indices to return.
+
+    Returns:
+        np.ndarray: Indices of the highest scores, best first.
+    """
+    n = scores.shape[0]
+    if top_k <= 0 or n == 0:
+        return np.empty(0, dtype=np.int64)
+    if top_k >= n:
+        return np.argsort(-scores, kind="stable")
+    candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def merge_top_k(
+    scores: np.ndarray, indices: np.ndarray, top_k: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Keep the top-k candidates of each row of a candidate block.
+
+    Args:
+        scores (np.ndarray): 2-D array of candidate scores, one row per query.
+        indices (np.ndarray): Row indices of the candidates, same shape as scores.
+        top_k (int): Number of candidates to keep per row.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Scores and indices of the kept candidates (unordered).
+    """
+    if scores.shape[1] <= top_k:
+        return scores, indices
+    keep = np.argpartition(-scores, top_k - 1, axis=1)[:, :top_k]
+    return np.take_along_axis(scores, keep, axis=1), np.take_along_axis(
+        indices, keep, axis=1
+    )
+
+
+def merge_shard_results(
+    shard_results: Iterable[List[Tuple[int, float]]], top_k: int
+) -> List[Tuple[int, float]]:
+    """
+    Merge per-shard top-k lists into the overall top-k.
+
+    Each shard contributes at most top_k candidates, so a heap selects the
+    result from num_shards * top_k pairs instead of sorting every score.
+    Ties keep shard order, which matches the row order of a single scan.
+
+    Args:
+        shard_results (Iterable[List[Tuple[int, float]]]): (row, similarity) pairs of each shard.
+        top_k (int): Number of results to return.
+
+    Returns:
+        List[Tuple[int, float]]: (row, similarity) pairs, best first.
+    """
+    return heapq.nlargest(top_k, chain.from_iterable(shard_results), key=itemgetter(1))
+
+
+def scan_top_k(
+    matrix: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    start: int,
+    end: int,
+    deleted: Optional[np.ndarray] = None,
+    corpus_block: int = 16384,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Find the top-k rows of a row range for each query, one corpus tile at a time.
+
+    Each tile is a single matrix-matrix product whose per-query top-k is
+    merged into a running candidate set, so memory stays bounded by the
+    tile size.
+
+    Args:
+        matrix (np.ndarray): Normalized row vectors.
+        queries (np.ndarray): 2-D array of normalized queries.
+        top_k (int): Number of candidates to keep per query.
+        start (int): First row to scan.
+        end (int): End of the row range.
+        deleted (Optional[np.ndarray]): Mask of removed rows, which are scored -inf.
+        corpus_block (int): Maximum number of rows scored per tile.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Scores and row indices of the candidates
+            (unordered), one row per query.
+    """
+    best_scores = np.empty((queries.shape[0], 0), dtype=np.float32)
+    best_indices = np.empty((queries.shape[0], 0), dtype=np.int64)
+
+    for c_start in range(start, end, corpus_block):
+        c_end = min(c_start + corpus_block, end)
+        tile_scores = queries @ matrix[c_start:c_end].T
+        if deleted is not None:
+            tile_scores[:, deleted[c_start:c_end]] = -np.inf
+        tile_indices = np.broadcast_to(np.arange(c_start, c_end), tile_scores.shape)
+        tile_scores, tile_indices = merge_top_k(tile_scores, tile_indices, top_k)
+        best_scores, best_indices = merge_top_k(
+            np.hstack([best_scores, tile_scores]),
+            np.hstack([best_indices, tile_indices]),
+            top_k,
+        )
+    return best_scores, best_indices
+
+
+class VectorIndex:
+    """
+    Exact cosine-similarity index over a contiguous, pre-normalized matrix.
+
+    The embeddings are packed once into a float32 matrix whose rows line up
+    with a parallel list of chunk IDs, so a query is a single matrix-vector
+    product followed by a top-k selection.
+
+    The index can change without a rebuild: add() appends rows into spare
+    capacity at the end of the matrix, remove() only marks rows with a
+    tombstone that searches skip, and compacted() returns a copy without
+    the removed rows. Appends write the new rows before publishing the
+    longer matrix, so a concurrent search sees either the old or the new
+    rows, never a half-written one.
+    """
+
+    INDEX_FILE = "index.json"
+    IDS_FILE = "ids.txt"
+
+    def __init__(self, embeddings: Dict[str, np.ndarray]):
+        """
+        Build the index from a dictionary of embeddings.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+        """
+        self.logger = logging.getLogger(__name__)
+        self.ids: List[str] = list(embeddings.keys())
+
+        if self.ids:
+            matrix = np.vstack(
+                [
+                    np.asarray(vector, dtype=np.float32).ravel()
+                    for vector in embeddings.values()
+                ]
+            )
+        else:
+            matrix = np.empty((0, 0), dtype=np.float32)
+
+        self.matrix = normalize_rows(matrix)
+        self._reset_tombstones()
+        self.logger.debug(
+            f"Built vector index with {len(self.ids)} vectors of dimension {self.dim}"
+        )
+
+    def __len__(self) -> int:
+        return len(self.ids) - self.num_deleted
+
+    def _reset_tombstones(self) -> None:
+        """
+        Start with no removed rows, no ID lookup table and no spare capacity.
+        """
+        self.deleted: Optional[np.ndarray] = None
+        self.num_deleted = 0
+        self._rows: Optional[Dict[str, int]] = None
+        self._buffers: Dict[str, np.ndarray] = {}
+
+    def _row_map(self) -> Dict[str, int]:
+        """
+        Map each live chunk ID to its row, building the table on first use.
+        """
+        if self._rows is None:
+            self._rows = {
+                chunk_id: i
+                for i, chunk_id in enumerate(self.ids)
+                if self.deleted is None or not self.deleted[i]
+            }
+        return self._rows
+
+    def _append_array(self, name: str, rows: np.ndarray) -> None:
+        """
+        Append rows to an array attribute, growing its buffer geometrically.
+
+        The attribute stays a view of a larger buffer, so repeated appends
+        copy the existing rows only when the buffer is full.
+
+        Args:
+            name (str): Name of the array attribute.
+            rows (np.ndarray): Rows to append.
+        """
+        current = getattr(self, name)
+        size = 0 if current is None else current.shape[0]
+        if size == 0:
+            current = np.empty((0,) + rows.shape[1:], dtype=rows.dtype)
+        buffer = self._buffers.get(name)
+        if (
+            buffer is None
+            or current.base is not buffer
+            or len(buffer) < size + len(rows)
+        ):
+            buffer = self._new_buffer(
+                (max(2 * size, size + len(rows), 16),) + current.shape[1:],
+                current.dtype,
+            )
+            buffer[:size] = current
+            self._buffers[name] = buffer
+        buffer[size : size + len(rows)] = rows
+        setattr(self, name, buffer[: size + len(rows)])
+
+    def _new_buffer(self, shape: Tuple[int, ...], dtype: np.dtype) -> np.ndarray:
+        """
+        Allocate storage for a growing per-row array.
+
+        Args:
+            shape (Tuple[int, ...]): Shape of the buffer.
+            dtype (np.dtype): Data type of the buffer.
+
+        Returns:
+            np.ndarray: Uninitialized buffer.
+        """
+        return np.empty(shape, dtype=dtype)
+
+    def _append(self, matrix: np.ndarray) -> None:
+        """
+        Store normalized vectors for rows appended to the ID list.
+
+        Args:
+            matrix (np.ndarray): Normalized vectors, one per new row.
+        """
+        self._append_array("matrix", matrix)
+
+    def _compact(self, keep: np.ndarray) -> None:
+        """
+        Keep only the given rows of every per-row array.
+
+        Args:
+            keep (np.ndarray): Indices of the rows to keep, in order.
+        """
+        self.matrix = self.matrix[keep]
+
+    def add(self, embeddings: Dict[str, np.ndarray]) -> None:
+        """
+        Add vectors, replacing the vectors of IDs that are already indexed.
+
+        Args:
+            embeddings (Dict[str, np.ndarray]): Dictionary mapping chunk IDs to embedding vectors.
+        """
+        if not embeddings:
+            return
+        rows = self._row_map()
+        self.remove([chunk_id for chunk_id in embeddings if chunk_id in rows])
+
+        matrix = normalize_rows(
+            np.vstack(
+                [
+                    np.asarray(vector, dtype=np.float32).ravel()
+                    for vector in embeddings.values()
+                ]
+            )
+        )
+        start = len(self.ids)
+        self.ids.extend(embeddings)
+        if self.deleted is not None:
+            self._append_array("deleted", np.zeros(len(embeddings), dtype=bool))
+        rows.update((chunk_id, start + i) for i, chunk_id in enumerate(embeddings))
+        # Publish the new rows last, once their IDs are in place
+        self._append(matrix)
+
+    def remove(self, chunk_ids: Iterable[str]) -> int:
+        """
+        Mark the rows of chunk IDs as removed.
+
+        Args:
+            chunk_ids (Iterable[str]): IDs of the chunks to remove.
+
+        Returns:
+            int: Number of rows that were removed.
+        """
+        rows = self._row_map()
+        positions = [rows.pop(chunk_id) for chunk_id in chunk_ids if chunk_id in rows]
+        if positions:
+            if self.deleted is None:
+                self._append_array("deleted", np.zeros(len(self.ids), dtype=bool))
+            self.deleted[positions] = True
+            self.num_deleted += len(positions)
+        return len(positions)
+
+    def needs_compaction(self, threshold: float) -> bool:
+        """
+        Whether enough rows are wasted to make compaction worthwhile.
+
+        Args:
+            threshold (float): Maximum fraction of removed rows.
+
+        Returns:
+            bool: True if the fraction of removed rows exceeds the threshold.
+        """
+        return self.num_deleted > threshold * max(len(self.ids), 1)
+
+    def compacted(self) -> "VectorIndex":
+        """
+        Return a copy of the index without the removed rows.
+
+        The original index is left untouched, so it can keep serving
+        searches until the copy replaces it.
+
+        Returns:
+            VectorIndex: The compacted index.
+        """
+        keep = (
+            np.flatnonzero(~self.deleted)
+            if self.num_deleted
+            else np.arange(len(self.ids))
+        )
+        index = copy.copy(self)
+        index.ids = [self.ids[i] for i in keep]
+        index._reset_tombstones()
+        index._compact(keep)
+        return index
+
+    def close(self) -> None:
+        """
+        Release resources held by the index beyond its arrays.
+        """
+
+    def _live(self, scores: np.ndarray, start: int = 0) -> np.ndarray:
+        """
+        Give removed rows a score of -inf so they are never selected.
+
+        Args:
+            scores (np.ndarray): Scores of consecutive rows, one row per column
+                for a 2-D array of query scores.
+            start (int): Row of the first score.
+
+        Returns:
+            np.ndarray: The scores, modified in place.
+        """
+        if self.num_deleted:
+            end = start + scores.shape[-1]
+            scores[..., self.deleted[start:end]] = -np.inf
+        return scores
+
+    def _arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Arrays that make up the index state, saved as one .npy file each.
+        """
+        return {"matrix": self.matrix, "deleted": self.deleted}
+
+    def _params(self) -> Dict[str, Any]:
+        """
+        JSON-serializable settings saved alongside the arrays.
+        """
+        return {}
+
+    def _restore(self, arrays: Dict[str, np.ndarray], params: Dict[str, Any]) -> None:
+        """
+        Set the index state from saved arrays and settings.
+
+        Args:
+            arrays (Dict[str, np.ndarray]): Arrays returned by _arrays() when saving.
+            params (Dict[str, Any]): Settings returned by _params() when saving.
+        """
+        self._reset_tombstones()
+        self.matrix = arrays.get("matrix")
+        if "deleted" in arrays:
+            self.deleted = np.array(arrays["deleted"])
+            self.num_deleted = int(self.deleted.sum())
+
+    def save(self, directory: str) -> None:
+        """
+        Save the index to a directory.
+
+        Every array is written as a plain .npy file, so load() can
+        memory-map it instead of reading it into memory.
+
+        Args:
+            directory (str): Directory to write the index to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        arrays = {name: a for name, a in self._arrays().items() if a is not None}
+        for name, array in arrays.items():
+            np.save(os.path.join(directory, f"{name}.npy"), np.ascontiguousarray(array))
+        with open(
+            os.path.join(directory, self.IDS_FILE), "w", encoding="utf-8", newline="\n"
+        ) as f:
+            f.writelines(f"{chunk_id}\n" for chunk_id in self.ids)
+        with open(os.path.join(directory, self.INDEX_FILE), "w", encoding="utf-8") as f:
+            json.dump({"arrays": sorted(arrays), "params": self._params()}, f)
+
+    @classmethod
+    def load(
+        cls,
+        directory: str,
+        mmap: bool = True,
+        params: Optional[Dict[str, Any]] = None,
+    ) -> "VectorIndex":
+        """
+        Load an index saved with save().
+
+        Args:
+            directory (str): Directory containing the saved index.
+            mmap (bool): Open the arrays read-only with memory mapping.
+            params (Optional[Dict[str, Any]]): Settings overriding the saved ones, e.g.
+                num_shards; None values keep the saved setting.
+
+        Returns:
+            VectorIndex: The loaded index.
+        """
+        with open(os.path.join(directory, cls.INDEX_FILE), encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(os.path.join(directory, cls.IDS_FILE), encoding="utf-8") as f:
+            ids = f.read().split("\n")[:-1]
+
+        index = cls.__new__(cls)
+        index.logger = logging.getLogger(__name__)
+        index.ids = ids
+        index._restore(
+            {
+                name: np.load(
+                    os.path.join(directory, f"{name}.npy"),
+                    mmap_mode="r" if mmap else None,
+                )
+                for name in meta["arrays"]
+            },
+            {
+                **meta["params"],
+                **{name: v for name, v in (params or {}).items() if v is not None},
+            },
+        )
+        return index
+
+    @property
+    def dim(self) -> int:
+        """
+        Dimensionality of the indexed vectors.
+        """
+        return self.matrix.shape[1]
+
+    def prepare_query(self, query_embedding: np.ndarray) -> np.ndarray:
+        """
+        Convert a query embedding into a unit-norm float32 vector.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+
+        Returns:
+            np.ndarray: Normalized query vector.
+        """
+        return normalize_rows(np.asarray(query_embedding).reshape(1, -1))[0]
+
+    def scores(self, query_embedding: np.ndarray) -> np.ndarray:
+        """
+        Compute cosine similarities between the query and every indexed vector.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+
+        Returns:
+            np.ndarray: Similarity score for each row of the index.
+        """
+        return self.matrix @ self.prepare_query(query_embedding)
+
+    def search(
+        self, query_embedding: np.ndarray, top_k: int = 3
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors to the query.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        if not len(self):
+            return []
+
+        scores = self._live(self.scores(query_embedding))
+        return [
+            (self.ids[i], float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] > -np.inf
+        ]
+
+    def _score_rows(self, query: np.ndarray, start: int, end: int) -> np.ndarray:
+        """
+        Compute the similarities of a normalized query with a range of rows.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            start (int): First row.
+            end (int): End of the row range.
+
+        Returns:
+            np.ndarray: Similarity score for each row in the range.
+        """
+        return self.matrix[start:end] @ query
+
+    def _search_shard(
+        self, query: np.ndarray, start: int, end: int, top_k: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Find the top-k rows of one shard.
+
+        Args:
+            query (np.ndarray): Normalized query vector.
+            start (int): First row of the shard.
+            end (int): End of the shard.
+            top_k (int): Number of results to return.
+
+        Returns:
+            List[Tuple[int, float]]: (row, similarity) pairs, best first.
+        """
+        scores = self._live(self._score_rows(query, start, end), start)
+        return [
+            (start + i, float(scores[i]))
+            for i in top_k_indices(scores, top_k)
+            if scores[i] > -np.inf
+        ]
+
+    def search_parallel(
+        self,
+        query_embedding: np.ndarray,
+        top_k: int,
+        executor: Executor,
+        num_shards: int,
+    ) -> List[Tuple[str, float]]:
+        """
+        Find the top-k most similar vectors by scanning row shards on an executor.
+
+        The rows are split into contiguous shards of at least MIN_SHARD_ROWS
+        rows. Each shard is scored and reduced to its own top-k on a worker
+        thread (NumPy releases the GIL), and the shard results are merged
+        with a heap. Small indexes are searched on the calling thread.
+
+        Args:
+            query_embedding (np.ndarray): Query embedding vector.
+            top_k (int): Number of results to return.
+            executor (Executor): Long-lived thread pool that scores the shards.
+            num_shards (int): Maximum number of shards.
+
+        Returns:
+            List[Tuple[str, float]]: (chunk ID, similarity) pairs, best first.
+        """
+        num_rows = len(self.ids)
+        num_shards = min(num_shards, num_rows // MIN_SHARD_ROWS)
+        if num_shards <= 1:
+            return self.search(query_embedding, top_k)
+
+        query = self.prepare_query(query_embedding)
+        bounds = np.linspace(0, num_rows, num_shards + 1).astype(int)
+        futures = [
+            executor.submit(self._search_shard, query, start, end, top_k)
+            for start, end in zip(bounds[:-1], bounds[1:])
+        ]
+        return [
+            (self.ids[row], score)
+            for row, score in merge_shard_results(
+                (future.result() for future in futures), top_k
+            )
+        ]
+
+    def search_batch(
+        self,
+        query_matrix: np.ndarray,
+        top_k: int = 3,
+        query_block: int = 1024,
+        corpus_block: int = 16384,
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Find the top-k most similar vectors for each row of a query matrix.
+
+        Queries and corpus are processed in tiles of at most
+        query_block x corpus_block scores (see scan_top_k), so peak memory
+        stays bounded regardless of how many queries or vectors there are.
+
+        Args:
+            query_matrix (np.ndarray): 2-D array with one query embedding per row.
+            top_k (int): Number of results to return per query.
+            query_block (int): Maximum number of queries scored per tile.
+            corpus_block (int): Maximum number of indexed vectors scored per tile.
+
+        Returns:
+            List[List[Tuple[str, float]]]: For each query, (chunk ID, similarity) pairs, best first.
+        """
+        queries = normalize_rows(np.atleast_2d(query_matrix))
+        num_queries = queries.shape[0]
+        matrix = self.matrix
+        top_k = min(top_k, len(self))
+        if top_k <= 0:
+            return [[] for _ in range(num_queries)]
+
+        deleted = self.deleted if self.num_deleted else None
+        results = []
+        for q_start in range(0, num_queries, query_block):
+            best_scores, best_indices = scan_top_k(
+                matrix,
+                queries[q_start : q_start + query_block],
+                top_k,
+                0,
+                matrix.shape[0],
+                deleted,
+                corpus_block,
+            )
+
+            results.extend(self._rank_candidates(best_scores, best_indices, top_k))
+
+        return results
+
+    def _rank_candidates(
+        self, scores: np.ndarray, indices: np.ndarray, top_k: int
+    ) -> List[List[Tuple[str, float]]]:
+        """
+        Turn per-query candidate blocks into ranked (chunk ID, similarity) lists.
+
+        Args:
+            scores (np.ndarray): Candidate scores, one row per query.
+            indices (np.ndarray): Row indices of the candidates, same shape as scores.
+            top_k (int): Number of results to return per query.
+
+        Returns:
+            List[List[Tuple[str, float]]]: For each query, (chunk ID, similarity) pairs, best first.
+        """
+        order = np.argsort(-scores, axis=1, kind="stable")[:, :top_k]
+        scores = np.take_along_axis(scores, order, axis=1)
+        indices = np.take_along_axis(indices, order, axis=1)
+        return [
+            [
+                (self.ids[i], float(score))
+                for i, score in zip(row_indices, row_scores)
+                if score > -np.inf
+            ]
+            for row_scores, row_indices in zip(scores, indices)
+        ]
@@ -0,0 +1,252 @@
+import os
+import gzip
+import numpy as np
+import logging
+from collections import Counter
+from typing import List, Iterable, Mapping, Optional
+
+try:
+    from .tokenizer import tokenize
+except ImportError:
+    from tokenizer import tokenize
+
+
+class WordVectorTable:
+    """
+    Word embedding table stored as a vocabulary list plus a contiguous matrix.
+
+    The table is saved as a plain ``.npy`` vector matrix and a vocabulary file
+    so it can be opened with ``mmap_mode="r"`` and shared read-only between
+    processes through the page cache. It supports the subset of the gensim
+    KeyedVectors interface used by the pipeline (``in``, ``[]`` and
+    ``vector_size``).
+
+    A table pruned to the vocabulary of a corpus may name the directory of
+    the full table it was cut from, to look up words it does not hold.
+    """
+
+    VECTORS_FILE = "vectors.npy"
+    VOCAB_FILE = "vocab.txt"
+    FALLBACK_FILE = "fallback.txt"
+
+    def __init__(
+        self,
+        words: List[str],
+        vectors: np.ndarray,
+        fallback_dir: Optional[str] = None,
+    ):
+        """
+        Initialize the table.
+
+        Args:
+            words (List[str]): Vocabulary, in the same order as the vector rows.
+            vectors (np.ndarray): 2-D array with one word vector per row.
+            fallback_dir (Optional[str]): Directory of the full table this one was pruned from.
+        """
+        if len(words) != vectors.shape[0]:
+            raise ValueError(
+                f"Vocabulary size {len(words)} does not match {vectors.shape[0]} vectors"
+            )
+        self.words = words
+        self.vectors = vectors
+        self.key_to_index = {word: i for i, word in enumerate(words)}
+        self.fallback_dir = fallback_dir
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def __contains__(self, word: str) -> bool:
+        return word in self.key_to_index
+
+    def __getitem__(self, word: str) -> np.ndarray:
+        return self.vectors[self.key_to_index[word]]
+
+    @property
+    def vector_size(self) -> int:
+        """
+        Dimensionality of the word vectors.
+        """
+        return self.vectors.shape[1]
+
+    @classmethod
+    def from_keyed_vectors(cls, keyed_vectors) -> "WordVectorTable":
+        """
+        Build a table from a gensim KeyedVectors model.
+
+        Args:
+            keyed_vectors: A loaded gensim KeyedVectors instance.
+
+        Returns:
+            WordVectorTable: Table holding the same vocabulary and vectors.
+        """
+        return cls(
+            list(keyed_vectors.index_to_key),
+            np.ascontiguousarray(keyed_vectors.vectors, dtype=np.float32),
+        )
+
+    @classmethod
+    def from_text(cls, path: str) -> "WordVectorTable":
+        """
+        Read word vectors from a text file in the GloVe or word2vec format.
+
+        Every line holds a word followed by its vector components. A
+        word2vec header line (word count and dimensionality) is skipped.
+        Files ending in .gz are decompressed on the fly.
+
+        Args:
+            path (str): Path of the text file.
+
+        Returns:
+            WordVectorTable: Table holding the words and vectors of the file.
+        """
+        opener = gzip.open if path.endswith(".gz") else open
+        words, rows = [], []
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line_number, line in enumerate(f):
+                parts = line.rstrip().split(" ")
+                if line_number == 0 and len(parts) == 2:
+                    continue
+                if len(parts) < 2:
+                    continue
+                words.append(parts[0])
+                rows.append(np.asarray(parts[1:], dtype=np.float32))
+        if not rows:
+            raise ValueError(f"No word vectors found in {path}")
+        return cls(words, np.vstack(rows))
+
+    def pruned(
+        self,
+        word_counts: Mapping[str, int],
+        min_count: int = 1,
+        dtype: type = np.float32,
+        fallback_dir: Optional[str] = None,
+    ) -> "WordVectorTable":
+        """
+        Build a table holding only the words of a corpus, most frequent first.
+
+        Frequent words get the first rows, so the vectors gathered most
+        often share a small, cache-resident part of the matrix.
+
+        Args:
+            word_counts (Mapping[str, int]): Number of occurrences of each corpus word.
+            min_count (int): Minimum number of occurrences of a kept word.
+            dtype (type): Data type of the stored vectors, e.g. np.float16 to halve their size.
+            fallback_dir (Optional[str]): Directory of this table, recorded for words outside the corpus.
+
+        Returns:
+            WordVectorTable: The pruned table.
+        """
+        kept = [
+            word
+            for word, count in word_counts.items()
+            if count >= min_count and word in self.key_to_index
+        ]
+        # Ties keep the order of the full table, which is by frequency too
+        kept.sort(key=lambda word: (-word_counts[word], self.key_to_index[word]))
+        rows = np.fromiter(
+            (self.key_to_index[word] for word in kept), dtype=np.int64, count=len(kept)
+        )
+        vectors = np.asarray(self.vectors[rows], dtype=dtype).reshape(
+            len(kept), self.vector_size
+        )
+        return WordVectorTable(kept, vectors, fallback_dir)
+
+    @classmethod
+    def exists(cls, directory: str) -> bool:
+        """
+        Check whether a saved table is present in a directory.
+
+        Args:
+            directory (str): Directory to check.
+
+        Returns:
+            bool: True if both the vector matrix and vocabulary file exist.
+        """
+        return os.path.exists(
+            os.path.join(directory, cls.VECTORS_FILE)
+        ) and os.path.exists(os.path.join(directory, cls.VOCAB_FILE))
+
+    def save(self, directory: str) -> None:
+        """
+        Save the table to a directory.
+
+        Files are written under temporary names and renamed into place, so a
+        process opening the directory never sees a partially written table.
+
+        Args:
+            directory (str): Directory to write the table to.
+        """
+        os.makedirs(directory, exist_ok=True)
+        vectors_path = os.path.join(directory, self.VECTORS_FILE)
+        vocab_path = os.path.join(directory, self.VOCAB_FILE)
+        fallback_path = os.path.join(directory, self.FALLBACK_FILE)
+        # float16 tables stay float16; anything else is stored as float32
+        dtype = np.float16 if self.vectors.dtype == np.float16 else np.float32
+
+        with open(vectors_path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(self.vectors, dtype=dtype))
+        _write_lines(vocab_path + ".tmp", self.words)
+
+        os.replace(vectors_path + ".tmp", vectors_path)
+        os.replace(vocab_path + ".tmp", vocab_path)
+        if self.fallback_dir:
+            _write_lines(fallback_path, [os.path.abspath(self.fallback_dir)])
+        elif os.path.exists(fallback_path):
+            os.remove(fallback_path)
+        logging.getLogger(__name__).info(
+            f"Saved {len(self.words)} word vectors to {directory}"
+        )
+
+    @classmethod
+    def load(cls, directory: str, mmap: bool = True) -> "WordVectorTable":
+        """
+        Load a table saved with save().
+
+        Args:
+            directory (str): Directory containing the saved table.
+            mmap (bool): Open the vector matrix read-only with memory mapping.
+
+        Returns:
+            WordVectorTable: The loaded table.
+        """
+        vectors = np.load(
+            os.path.join(directory, cls.VECTORS_FILE), mmap_mode="r" if mmap else None
+        )
+        with open(os.path.join(directory, cls.VOCAB_FILE), encoding="utf-8") as f:
+            words = f.read().split("\n")[:-1]
+        fallback_dir = None
+        fallback_path = os.path.join(directory, cls.FALLBACK_FILE)
+        if os.path.exists(fallback_path):
+            with open(fallback_path, encoding="utf-8") as f:
+                fallback_dir = f.read().strip() or None
+        return cls(words, vectors, fallback_dir)
+
+
+def count_words(texts: Iterable[str]) -> Counter:
+    """
+    Count the tokens of a corpus, as the embedding stage tokenizes them.
+
+    Args:
+        texts (Iterable[str]): Texts of the corpus.
+
+    Returns:
+        Counter: Number of occurrences of each token.
+    """
+    counts = Counter()
+    for text in texts:
+        counts.update(tokenize(text))
+    return counts
+
+
+def _write_lines(path: str, lines: Iterable[str]) -> None:
+    """
+    Write one string per line to a UTF-8 text file.
+
+    Args:
+        path (str): Output file path.
+        lines (Iterable[str]): Strings to write.
+    """
+    with open(path, "w", encoding="utf-8", newline="\n") as f:
+        for line in lines:
+            f.write(line)
+            f.write("\n")
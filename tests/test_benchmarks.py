@@ -0,0 +1,126 @@
+import json
+import pytest
+import numpy as np
+from benchmarks.synthetic import (
+    make_vocabulary,
+    make_word_vector_table,
+    make_chunks,
+    make_embeddings,
+    make_wikipedia_html,
+)
+from benchmarks.run_benchmarks import (
+    measure,
+    compare_results,
+    run_benchmarks,
+    save_results,
+    load_results,
+    PROFILES,
+)
+from src.data_extraction import DataExtractor
+from src.tokenizer import tokenize
+
+
+def test_synthetic_data_is_deterministic():
+    """Test that the same seed always generates the same corpus and vectors."""
+    vocabulary = make_vocabulary(500, seed=3)
+    assert vocabulary == make_vocabulary(500, seed=3)
+    assert vocabulary != make_vocabulary(500, seed=4)
+    assert len(set(vocabulary)) == 500
+
+    assert make_chunks(20, vocabulary, seed=3) == make_chunks(20, vocabulary, seed=3)
+    table = make_word_vector_table(vocabulary, vector_size=8, seed=3)
+    np.testing.assert_array_equal(
+        table.vectors, make_word_vector_table(vocabulary, 8, seed=3).vectors
+    )
+    assert make_wikipedia_html(3, seed=3) == make_wikipedia_html(3, seed=3)
+
+
+def test_vocabulary_size_limit():
+    """Test that a vocabulary larger than the distinct pseudo-words is rejected."""
+    with pytest.raises(ValueError):
+        make_vocabulary(10_000_000)
+
+
+def test_synthetic_words_survive_tokenization():
+    """Test that every generated word is a token, so all of them hit the vector table."""
+    vocabulary = make_vocabulary(200)
+    table = make_word_vector_table(vocabulary, vector_size=8)
+    for chunk in make_chunks(10, vocabulary):
+        tokens = tokenize(chunk["text"])
+        assert len(tokens) == 80
+        assert all(token in table for token in tokens)
+
+
+def test_synthetic_html_is_cleaned_like_a_wikipedia_page():
+    """Test that clean_data finds the paragraphs and skips the trailing sections."""
+    extractor = DataExtractor(url="https://en.wikipedia.org/wiki/Synthetic")
+    extractor.raw_content = make_wikipedia_html(4, paragraphs_per_section=3)
+
+    chunks = extractor.clean_data()
+
+    assert sum(chunk["id"].startswith("para-") for chunk in chunks) == 12
+    assert sum(chunk["id"].startswith("heading-") for chunk in chunks) == 4
+    assert not any("[" in chunk["text"] for chunk in chunks)
+    assert not any("skips" in chunk["text"] for chunk in chunks)
+
+
+def test_make_embeddings():
+    """Test that embeddings are keyed like the synthetic chunks."""
+    embeddings = make_embeddings(5, vector_size=4)
+    assert list(embeddings) == [f"para-{i}" for i in range(5)]
+    assert embeddings["para-0"].shape == (4,)
+
+
+def test_measure():
+    """Test that measure reports per-call times over the requested repeats."""
+    calls = []
+    timing = measure(lambda: calls.append(1), repeat=3, min_time=0.001)
+
+    assert timing["repeat"] == 3
+    assert len(calls) == 1 + 3 * timing["number"]
+    assert 0 < timing["min"] <= timing["median"]
+
+
+def test_compare_results():
+    """Test that only changes beyond the threshold are flagged."""
+    baseline = {
+        "a": {"min": 1.0},
+        "b": {"min": 1.0},
+        "c": {"min": 1.0},
+        "d": {"min": 1.0},
+    }
+    current = {
+        "a": {"min": 1.1},
+        "b": {"min": 1.5},
+        "c": {"min": 0.5},
+        "e": {"min": 1.0},
+    }
+
+    comparison = {
+        entry["name"]: entry for entry in compare_results(baseline, current, 0.25)
+    }
+
+    assert set(comparison) == {"a", "b", "c"}
+    assert comparison["a"]["status"] == "unchanged"
+    assert comparison["b"]["status"] == "regression"
+    assert comparison["b"]["ratio"] == 1.5
+    assert comparison["c"]["status"] == "improvement"
+
+
+def test_save_and_load_latest(tmp_path):
+    """Test that "latest" loads the newest saved run."""
+    save_results({"results": {"old": {}}}, str(tmp_path / "20260101_000000.json"))
+    save_results({"results": {"new": {}}}, str(tmp_path / "20260102_000000.json"))
+
+    assert load_results("latest", str(tmp_path)) == {"results": {"new": {}}}
+    with open(tmp_path / "20260101_000000.json") as f:
+        assert json.load(f) == load_results(str(tmp_path / "20260101_000000.json"))
+
+
+def test_run_benchmarks_filter():
+    """Test a small run restricted to one suite."""
+    results = run_benchmarks("quick", name_filter="clean_data[sections=20]", repeat=1)
+
+    assert list(results) == ["clean_data[sections=20]"]
+    assert results["clean_data[sections=20]"]["params"] == {"sections": 20}
+    assert set(PROFILES) == {"quick", "full"}
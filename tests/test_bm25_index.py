@@ -0,0 +1,160 @@
+import pytest
+import numpy as np
+from src import bm25_index
+from src.bm25_index import BM25Index, PostingSegment
+
+
+@pytest.fixture
+def chunks():
+    """Chunks with repeated and rare terms."""
+    return [
+        {"id": "para-0", "text": "NASA launched the rocket. The rocket reached orbit."},
+        {"id": "para-1", "text": "The cat sat on the mat."},
+        {"id": "para-2", "text": "A rocket is a vehicle that uses jet propulsion."},
+        {
+            "id": "para-3",
+            "text": "The dog chased the cat around the garden and the yard.",
+        },
+    ]
+
+
+@pytest.fixture
+def corpus():
+    """A larger random corpus with a skewed term distribution."""
+    rng = np.random.default_rng(0)
+    probabilities = 1.0 / np.arange(1, 301)
+    probabilities /= probabilities.sum()
+    return [
+        {
+            "id": f"doc-{i}",
+            "text": " ".join(
+                f"term{j}"
+                for j in rng.choice(300, rng.integers(5, 40), p=probabilities)
+            ),
+        }
+        for i in range(500)
+    ]
+
+
+def brute_force(index, query, top_k):
+    """Rank every matching document by its exact BM25 score."""
+    ranked = sorted(index.scores(query).items(), key=lambda item: -item[1])
+    return ranked[:top_k]
+
+
+def reference_bm25(chunks, query, k1=1.2, b=0.75):
+    """Textbook BM25 over whitespace tokens of two or more letters."""
+    docs = [
+        [w for w in chunk["text"].lower().replace(".", "").split() if len(w) > 1]
+        for chunk in chunks
+    ]
+    avgdl = sum(len(doc) for doc in docs) / len(docs)
+    scores = {}
+    for chunk, doc in zip(chunks, docs):
+        score = 0.0
+        for term in set(query.split()):
+            df = sum(term in d for d in docs)
+            tf = doc.count(term)
+            if tf:
+                idf = np.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+                score += (
+                    idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * len(doc) / avgdl))
+                )
+        if score:
+            scores[chunk["id"]] = score
+    return scores
+
+
+def test_posting_segment_layout():
+    """Test that postings are grouped by term with ascending rows."""
+    segment = PostingSegment.from_postings(
+        np.array([2, 0, 2, 0]), np.array([5, 7, 3, 1]), np.array([1, 2, 3, 4]), 4
+    )
+
+    assert segment.offsets.tolist() == [0, 2, 2, 4, 4]
+    assert [a.tolist() for a in segment.postings(2)] == [[3, 5], [3, 1]]
+    assert segment.postings(1)[0].tolist() == []
+    assert segment.postings(9)[0].tolist() == []
+    assert segment.docs.dtype == np.int32 and segment.tfs.dtype == np.uint16
+
+
+def test_scores_match_reference_bm25(chunks):
+    """Test that scores follow the BM25 formula."""
+    index = BM25Index(chunks)
+
+    scores = index.scores("rocket cat")
+
+    expected = reference_bm25(chunks, "rocket cat")
+    assert scores.keys() == expected.keys()
+    for chunk_id, score in expected.items():
+        assert scores[chunk_id] == pytest.approx(score, rel=1e-5)
+
+
+def test_search_ranks_exact_term_matches(chunks):
+    """Test that rare query terms rank their documents first."""
+    index = BM25Index(chunks)
+
+    results = index.search("nasa rocket", top_k=2)
+
+    assert [chunk_id for chunk_id, _ in results] == ["para-0", "para-2"]
+    assert index.search("unknown words", top_k=2) == []
+    assert BM25Index([]).search("rocket") == []
+
+
+@pytest.mark.parametrize("top_k", [1, 5, 20])
+def test_maxscore_matches_exhaustive_scoring(corpus, top_k):
+    """Test that pruned search returns the same top-k as scoring every posting."""
+    index = BM25Index(corpus)
+    rng = np.random.default_rng(1)
+
+    for _ in range(20):
+        query = " ".join(f"term{j}" for j in rng.integers(0, 300, 4))
+        results = index.search(query, top_k)
+        expected = brute_force(index, query, top_k)
+
+        assert np.allclose([s for _, s in results], [s for _, s in expected])
+
+
+def test_add_remove_and_compact(corpus, monkeypatch):
+    """Test that appended segments are merged and removed documents skipped."""
+    monkeypatch.setattr(bm25_index, "MAX_SEGMENTS", 3)
+    index = BM25Index(corpus[:100])
+    for start in range(100, 500, 100):
+        index.add(corpus[start : start + 100])
+    index.add([{"id": "doc-0", "text": "rareword rareword term1"}])
+    removed = index.remove([f"doc-{i}" for i in range(1, 500, 2)])
+    query = "rareword term5 term1"
+
+    results = index.search(query, top_k=10)
+    compacted = index.compacted()
+
+    assert removed == 250
+    assert len(index.segments) <= 3
+    assert np.allclose(
+        [s for _, s in results], [s for _, s in brute_force(index, query, 10)]
+    )
+    assert results[0][0] == "doc-0"
+    assert not any(int(chunk_id.split("-")[1]) % 2 for chunk_id, _ in results)
+    assert len(compacted) == len(compacted.ids) == 250
+    assert len(compacted.segments) == 1
+    assert np.allclose(
+        [s for _, s in compacted.search(query, 10)],
+        [s for _, s in brute_force(compacted, query, 10)],
+    )
+    assert len(index.ids) == 501
+
+
+@pytest.mark.parametrize("mmap", [True, False])
+def test_save_and_load(tmp_path, corpus, mmap):
+    """Test that a loaded index returns the same results."""
+    index = BM25Index(corpus[:300])
+    index.add(corpus[300:])
+    index.remove(["doc-3"])
+
+    index.save(str(tmp_path))
+    loaded = BM25Index.load(str(tmp_path), mmap=mmap)
+
+    assert loaded.ids == index.ids
+    assert isinstance(loaded.segments[0].docs, np.memmap) == mmap
+    for query in ("term3 term7", "term1 term250 term17"):
+        assert loaded.search(query, 10) == index.search(query, 10)
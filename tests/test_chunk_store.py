@@ -0,0 +1,66 @@
+import pytest
+import numpy as np
+from src.chunk_store import ChunkStore
+
+
+@pytest.fixture
+def chunks():
+    """Chunks with multi-byte characters."""
+    return [
+        {"id": "para-0", "text": "Café au lait."},
+        {"id": "para-1", "text": ""},
+        {"id": "doc-1/para-2", "text": "Ünïcödé text spanning several bytes."},
+    ]
+
+
+@pytest.mark.parametrize("mmap_texts", [True, False])
+def test_round_trip(tmp_path, chunks, mmap_texts):
+    """Test that every chunk reads back unchanged."""
+    ChunkStore.write(str(tmp_path), chunks)
+
+    store = ChunkStore.load(str(tmp_path), mmap_texts=mmap_texts)
+
+    assert len(store) == 3
+    assert list(store) == ["para-0", "para-1", "doc-1/para-2"]
+    assert [store[chunk["id"]] for chunk in chunks] == chunks
+    assert "para-1" in store
+    assert "para-9" not in store
+
+
+def test_offsets_are_byte_offsets(tmp_path, chunks):
+    """Test that offsets index the UTF-8 encoded texts."""
+    ChunkStore.write(str(tmp_path), chunks)
+
+    offsets = np.load(tmp_path / ChunkStore.OFFSETS_FILE)
+
+    assert offsets.tolist() == [0, 14, 14, 14 + len(chunks[2]["text"].encode())]
+
+
+def test_empty_store(tmp_path):
+    """Test that an empty store can be written and opened."""
+    ChunkStore.write(str(tmp_path), [])
+
+    store = ChunkStore.load(str(tmp_path))
+
+    assert len(store) == 0
+    with pytest.raises(KeyError):
+        store["para-0"]
+
+
+def test_changes_overlay_the_files(tmp_path, chunks):
+    """Test that added, replaced and removed chunks are reflected without rewriting."""
+    ChunkStore.write(str(tmp_path / "a"), chunks)
+    store = ChunkStore.load(str(tmp_path / "a"))
+
+    store["para-1"] = {"id": "para-1", "text": "Replaced."}
+    store["para-3"] = {"id": "para-3", "text": "Added."}
+    del store["para-0"]
+    ChunkStore.write(str(tmp_path / "b"), store.values())
+
+    assert len(store) == 3
+    assert list(store) == ["para-1", "doc-1/para-2", "para-3"]
+    assert "para-0" not in store
+    assert store["para-1"]["text"] == "Replaced."
+    with pytest.raises(KeyError):
+        del store["para-0"]
+    assert list(ChunkStore.load(str(tmp_path / "b")).values()) == list(store.values())
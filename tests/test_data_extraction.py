@@ -1,8 +1,11 @@
 import pytest
+import time
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
 from unittest.mock import patch, MagicMock
 from bs4 import BeautifulSoup
 import requests
-from src.data_extraction import DataExtractor
+from src.data_extraction import DataExtractor, BatchDataExtractor, clean_paragraph_text
 
 
 class TestDataExtractor:
@@ -94,3 +97,160 @@ class TestDataExtractor:
         assert "AI has a long history" in result[2]["text"]
         assert not any("See also" in item["text"] for item in result)
         assert not any("too short" in item["text"] for item in result)
+
+    def test_clean_data_lxml_matches_soup(self, data_extractor, mock_wikipedia_html):
+        """Test that the lxml fast path produces the same chunks as BeautifulSoup."""
+        pytest.importorskip("lxml")
+        # Setup
+        html = mock_wikipedia_html.replace(
+            "<p>AI has", "<p><style>.x{color:red}</style><!-- note -->AI has"
+        )
+        soup_extractor = DataExtractor(data_extractor.url)
+        soup_extractor.soup = BeautifulSoup(html, "html.parser")
+        data_extractor.raw_content = html
+
+        # Call the method
+        result = data_extractor.clean_data()
+
+        # Assertions
+        assert data_extractor._soup is None
+        assert result == soup_extractor.clean_data()
+        assert not any("TOC" in item["text"] for item in result)
+
+    @pytest.mark.parametrize(
+        "body",
+        [
+            "<p>An unclosed paragraph that runs on for more than fifty characters"
+            "<p>and a second one, also unclosed, that is long enough to be kept</div>",
+            "<p>A paragraph holding a division <div>with text inside it</div> "
+            "and text after the division.</p></div>",
+            "<p>A paragraph holding a table <table><tr><td>with a cell</td></tr>"
+            "</table> and text after the table.</p></div>",
+        ],
+        ids=["unclosed-p", "div-in-p", "table-in-p"],
+    )
+    def test_clean_data_malformed_html_matches_html_parser(self, data_extractor, body):
+        """Test that paragraphs lxml would close early are cleaned like with html.parser."""
+        pytest.importorskip("lxml")
+        # Setup
+        html = (
+            f'<html><body><div id="mw-content-text"><h2>Intro</h2>{body}</body></html>'
+        )
+        soup_extractor = DataExtractor(data_extractor.url)
+        soup_extractor.soup = BeautifulSoup(html, "html.parser")
+        data_extractor.raw_content = html
+
+        # Call the method
+        result = data_extractor.clean_data()
+
+        # Assertions
+        assert result == soup_extractor.clean_data()
+        assert "after the" in result[1]["text"] or "second one" in result[1]["text"]
+
+    def test_iter_chunks_is_lazy(self, data_extractor, mock_wikipedia_html):
+        """Test that iter_chunks yields the same chunks as clean_data, one at a time."""
+        # Setup
+        data_extractor.soup = BeautifulSoup(mock_wikipedia_html, "html.parser")
+
+        # Call the method
+        chunks = data_extractor.iter_chunks(id_prefix="doc-0/")
+
+        # Assertions
+        assert next(chunks) == {"id": "doc-0/heading-0", "text": "Introduction"}
+        assert [chunk["id"] for chunk in chunks] == [
+            chunk["id"] for chunk in data_extractor.clean_data(id_prefix="doc-0/")
+        ][1:]
+
+    def test_clean_paragraph_text(self):
+        """Test reference, bracket and whitespace clean-up."""
+        assert clean_paragraph_text("  AI[1][23] is  [citation needed]\n fun ") == (
+            "AI is fun"
+        )
+        assert clean_paragraph_text("a [b[1]c] d") == "a d"
+        assert clean_paragraph_text("no brackets\there") == "no brackets here"
+
+
+class PageHandler(BaseHTTPRequestHandler):
+    """Serves a small Wikipedia-like page per path and tracks concurrency."""
+
+    active = 0
+    max_active = 0
+    lock = threading.Lock()
+
+    def do_GET(self):
+        with PageHandler.lock:
+            PageHandler.active += 1
+            PageHandler.max_active = max(PageHandler.max_active, PageHandler.active)
+        try:
+            time.sleep(0.05)
+            if self.path == "/missing":
+                self.send_response(404)
+                self.end_headers()
+                return
+            body = (
+                '<html><body><div id="mw-content-text">'
+                f"<h2>Page {self.path}</h2>"
+                f"<p>This is a long enough paragraph about the page {self.path} for the filter.</p>"
+                "</div></body></html>"
+            ).encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/html")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+        finally:
+            with PageHandler.lock:
+                PageHandler.active -= 1
+
+    def log_message(self, format, *args):
+        pass
+
+
+class TestBatchDataExtractor:
+    @pytest.fixture
+    def base_url(self):
+        """Local stand-in HTTP server for Wikipedia."""
+        PageHandler.active = PageHandler.max_active = 0
+        server = ThreadingHTTPServer(("127.0.0.1", 0), PageHandler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        server.server_close()
+
+    def test_extract_all_unique_ids_in_url_order(self, base_url):
+        """Test that chunks from all pages come back in URL order with unique IDs."""
+        # Setup
+        urls = [f"{base_url}/page-{i}" for i in range(6)]
+
+        # Call the method
+        chunks = BatchDataExtractor(urls, max_workers=4, per_host_limit=4).extract_all()
+
+        # Assertions
+        assert len(chunks) == 12
+        assert len({chunk["id"] for chunk in chunks}) == 12
+        assert chunks[0] == {"id": "doc-0/heading-0", "text": "Page /page-0"}
+        assert chunks[-1]["id"] == "doc-5/para-1"
+        assert "/page-5" in chunks[-1]["text"]
+
+    def test_per_host_limit(self, base_url):
+        """Test that concurrent requests to one host respect the per-host limit."""
+        # Setup
+        urls = [f"{base_url}/page-{i}" for i in range(8)]
+
+        # Call the method
+        BatchDataExtractor(urls, max_workers=8, per_host_limit=2).extract_all()
+
+        # Assertions
+        assert PageHandler.max_active <= 2
+
+    def test_failed_pages_are_skipped(self, base_url):
+        """Test that a failed fetch does not stop the other pages."""
+        # Setup
+        urls = [f"{base_url}/missing", f"{base_url}/page-1"]
+
+        # Call the method
+        chunks = BatchDataExtractor(urls).extract_all()
+
+        # Assertions
+        assert [chunk["id"] for chunk in chunks] == ["doc-1/heading-0", "doc-1/para-1"]
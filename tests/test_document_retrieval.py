@@ -1,9 +1,15 @@
 import pytest
 import numpy as np
 from unittest.mock import patch, MagicMock
-import queue
-import threading
-from src.document_retrieval import DocumentRetriever
+from src import vector_index
+from src.document_retrieval import (
+    DocumentRetriever,
+    reciprocal_rank_fusion,
+    weighted_fusion,
+)
+from src.chunk_store import ChunkStore
+from src.metrics import metrics
+from src.ivf_index import IVFIndex
 
 
 class TestDocumentRetriever:
@@ -40,27 +46,33 @@ class TestDocumentRetriever:
         }
         assert document_retriever.num_threads == 4
 
-    def test_compute_similarities_thread(self, document_retriever):
-        """Test similarity computation in a thread."""
+    def test_init_builds_index(self, document_retriever):
+        """Test that the embeddings are packed into a normalized index."""
+        # Assertions
+        assert document_retriever.index.ids == ["para-0", "para-1", "para-2"]
+        assert document_retriever.index.matrix.shape == (3, 3)
+        assert document_retriever.index.matrix.dtype == np.float32
+        assert np.allclose(np.linalg.norm(document_retriever.index.matrix, axis=1), 1.0)
+
+    def test_retrieve_documents_matches_cosine_similarity(self, document_retriever):
+        """Test that similarity scores are plain cosine similarities."""
         # Setup
-        chunk_ids = ["para-0", "para-1"]
-        query_embedding = np.array([0.1, 0.2, 0.3])
-        result_queue = queue.Queue()
+        query_embedding = np.array([0.3, 0.1, 0.2])
 
         # Call the method
-        document_retriever._compute_similarities_thread(
-            chunk_ids, query_embedding, result_queue
-        )
-
-        # Get results from queue
-        similarities = result_queue.get()
+        results = document_retriever.retrieve_documents(query_embedding, top_k=3)
 
         # Assertions
-        assert len(similarities) == 2
-        assert similarities[0][0] == "para-0"
-        assert similarities[1][0] == "para-1"
-        assert isinstance(similarities[0][1], float)
-        assert isinstance(similarities[1][1], float)
+        for result in results:
+            vector = document_retriever.embeddings[result["id"]]
+            expected = np.dot(vector, query_embedding) / (
+                np.linalg.norm(vector) * np.linalg.norm(query_embedding)
+            )
+            assert isinstance(result["similarity"], float)
+            assert result["similarity"] == pytest.approx(expected, rel=1e-5)
+        assert [r["similarity"] for r in results] == sorted(
+            (r["similarity"] for r in results), reverse=True
+        )
 
     def test_retrieve_documents(self, document_retriever):
         """Test document retrieval."""
@@ -78,6 +90,19 @@ class TestDocumentRetriever:
         # The most similar document should be the first one based on our sample data
         assert results[0]["id"] == "para-0"
 
+    def test_retrieve_documents_records_metrics(self, document_retriever):
+        """Test that each retrieval is timed and counted."""
+        # Setup
+        queries = metrics.counter("retrieval_queries_total")
+        search = metrics.histogram("retrieval_search_seconds")
+        before = (queries.value, search.count)
+
+        # Call the method
+        document_retriever.retrieve_documents(np.array([0.1, 0.2, 0.3]), top_k=2)
+
+        # Assertions
+        assert (queries.value, search.count) == (before[0] + 1, before[1] + 1)
+
     def test_retrieve_documents_empty_embeddings(self):
         """Test document retrieval with empty embeddings."""
         # Setup
@@ -89,3 +114,398 @@ class TestDocumentRetriever:
 
         # Assertions
         assert results == []
+
+    def test_retrieve_documents_batch(self, document_retriever):
+        """Test batched retrieval for several queries at once."""
+        # Setup
+        query_matrix = np.array([[0.1, 0.2, 0.3], [0.7, 0.8, 0.9]])
+
+        # Call the method
+        results = document_retriever.retrieve_documents_batch(query_matrix, top_k=2)
+
+        # Assertions
+        assert len(results) == 2
+        assert all(len(query_results) == 2 for query_results in results)
+        assert results[0][0]["id"] == "para-0"
+        assert results[1][0]["id"] == "para-2"
+        assert results[0][0]["text"] == "This is the first paragraph."
+
+    def test_retrieve_documents_batch_empty_embeddings(self):
+        """Test batched retrieval with empty embeddings."""
+        # Setup
+        retriever = DocumentRetriever({}, [])
+
+        # Call the method
+        results = retriever.retrieve_documents_batch(np.ones((2, 3)))
+
+        # Assertions
+        assert results == [[], []]
+
+    def test_ivf_backend(self, sample_embeddings, sample_chunks):
+        """Test that the IVF backend is selected at construction time."""
+        # Setup
+        retriever = DocumentRetriever(
+            sample_embeddings,
+            sample_chunks,
+            backend="ivf",
+            index_params={"nlist": 2, "nprobe": 2},
+        )
+
+        # Call the method
+        results = retriever.retrieve_documents(np.array([0.7, 0.8, 0.9]), top_k=3)
+
+        # Assertions
+        assert isinstance(retriever.index, IVFIndex)
+        assert [result["id"] for result in results] == ["para-2", "para-1", "para-0"]
+
+    def test_quantized_backend(self, sample_embeddings, sample_chunks):
+        """Test that the quantized backend does not keep the float embeddings."""
+        # Setup
+        retriever = DocumentRetriever(
+            sample_embeddings,
+            sample_chunks,
+            backend="quantized",
+            index_params={"quantization": "int8"},
+        )
+
+        # Call the method
+        results = retriever.retrieve_documents(np.array([0.1, 0.2, 0.3]), top_k=1)
+
+        # Assertions
+        assert retriever.embeddings == {}
+        assert results[0]["id"] == "para-0"
+
+    def test_unknown_backend(self, sample_embeddings, sample_chunks):
+        """Test that an unknown backend is rejected."""
+        with pytest.raises(ValueError):
+            DocumentRetriever(sample_embeddings, sample_chunks, backend="hnsw")
+
+    @pytest.mark.parametrize(
+        "backend, index_params",
+        [
+            ("exact", None),
+            ("ivf", {"nlist": 2, "nprobe": 1}),
+            ("quantized", {"quantization": "pq", "num_subspaces": 1, "rerank": 2}),
+            ("quantized", {"quantization": "int8"}),
+            ("sharded", {"num_shards": 2, "min_shard_rows": 1}),
+        ],
+    )
+    def test_save_and_load(
+        self, tmp_path, sample_embeddings, sample_chunks, backend, index_params
+    ):
+        """Test that a loaded retriever returns the same results as the saved one."""
+        # Setup
+        retriever = DocumentRetriever(
+            sample_embeddings, sample_chunks, backend=backend, index_params=index_params
+        )
+        query = np.array([0.2, 0.1, 0.4])
+        path = str(tmp_path / "index")
+
+        # Call the method
+        saved = retriever.save(path)
+        loaded = DocumentRetriever.load(path, mmap=True)
+
+        # Assertions
+        assert saved is True
+        assert loaded.backend == backend
+        assert isinstance(loaded.chunks, ChunkStore)
+        assert loaded.retrieve_documents(query, top_k=3) == (
+            retriever.retrieve_documents(query, top_k=3)
+        )
+
+    def test_load_memory_maps_vectors(self, tmp_path, document_retriever):
+        """Test that mmap=True opens the vector matrix without reading it."""
+        # Setup
+        path = str(tmp_path / "index")
+        document_retriever.save(path)
+
+        # Call the method
+        mapped = DocumentRetriever.load(path, mmap=True)
+        in_memory = DocumentRetriever.load(path, mmap=False)
+
+        # Assertions
+        assert isinstance(mapped.index.matrix, np.memmap)
+        assert not isinstance(in_memory.index.matrix, np.memmap)
+        assert np.array_equal(mapped.index.matrix, document_retriever.index.matrix)
+
+    def test_load_builds_no_throwaway_index(
+        self, tmp_path, sample_embeddings, sample_chunks
+    ):
+        """Test that loading only restores the saved index instead of building one first."""
+        # Setup
+        path = str(tmp_path / "index")
+        retriever = DocumentRetriever(
+            sample_embeddings,
+            sample_chunks,
+            backend="sharded",
+            index_params={"num_shards": 2},
+        )
+        retriever.save(path)
+        retriever.close()
+
+        # Call the method
+        with patch(
+            "src.sharded_index.ShardedIndex.__init__", side_effect=AssertionError
+        ):
+            loaded = DocumentRetriever.load(path)
+
+        # Assertions
+        assert loaded.index.num_shards == 2
+        assert loaded.embeddings == {}
+        assert len(loaded.index) == len(sample_embeddings)
+        loaded.close()
+
+    def test_save_replaces_existing_index(self, tmp_path, sample_chunks):
+        """Test that saving over an existing directory swaps in the new index."""
+        # Setup
+        path = str(tmp_path / "index")
+        DocumentRetriever({"para-0": np.ones(3)}, sample_chunks).save(path)
+        retriever = DocumentRetriever(
+            {"para-1": np.ones(3), "para-2": np.ones(3)}, sample_chunks
+        )
+
+        # Call the method
+        retriever.save(path)
+        loaded = DocumentRetriever.load(path)
+
+        # Assertions
+        assert loaded.index.ids == ["para-1", "para-2"]
+        assert not (tmp_path / "index.tmp").exists()
+        assert not (tmp_path / "index.old").exists()
+
+    def test_load_rejects_unknown_version(self, tmp_path, document_retriever):
+        """Test that an index written in another format version is not loaded."""
+        # Setup
+        path = tmp_path / "index"
+        document_retriever.save(str(path))
+        (path / "meta.json").write_text('{"format_version": 99, "backend": "exact"}')
+
+        # Call the method
+        result = DocumentRetriever.load(str(path))
+
+        # Assertions
+        assert result is None
+
+    def test_load_missing_directory(self, tmp_path):
+        """Test that loading a missing directory returns None."""
+        assert DocumentRetriever.load(str(tmp_path / "missing")) is None
+
+    def test_add_chunks(self, document_retriever):
+        """Test that added chunks are retrievable and existing IDs are replaced."""
+        # Setup
+        chunks = [
+            {"id": "para-3", "text": "A new paragraph."},
+            {"id": "para-0", "text": "The first paragraph, rewritten."},
+            {"id": "para-4", "text": "A paragraph without an embedding."},
+        ]
+        embeddings = {"para-3": np.array([0.0, 0.0, 1.0]), "para-0": np.ones(3)}
+
+        # Call the method
+        added = document_retriever.add_chunks(chunks, embeddings)
+        results = document_retriever.retrieve_documents(np.ones(3), top_k=5)
+
+        # Assertions
+        assert added == 2
+        assert len(document_retriever.index) == 4
+        assert results[0]["id"] == "para-0"
+        assert results[0]["text"] == "The first paragraph, rewritten."
+        assert results[0]["similarity"] == pytest.approx(1.0, rel=1e-5)
+        assert "para-4" not in document_retriever.chunks
+        assert np.array_equal(document_retriever.embeddings["para-0"], np.ones(3))
+
+    def test_update_chunks_skips_unknown_ids(self, document_retriever):
+        """Test that update_chunks only replaces chunks that are indexed."""
+        # Setup
+        chunks = [
+            {"id": "para-1", "text": "Updated."},
+            {"id": "para-9", "text": "Unknown."},
+        ]
+        embeddings = {"para-1": np.array([1.0, 0.0, 0.0]), "para-9": np.ones(3)}
+
+        # Call the method
+        updated = document_retriever.update_chunks(chunks, embeddings)
+        results = document_retriever.retrieve_documents(np.array([1.0, 0, 0]), top_k=1)
+
+        # Assertions
+        assert updated == 1
+        assert len(document_retriever.index) == 3
+        assert "para-9" not in document_retriever.chunks
+        assert results == [{"id": "para-1", "text": "Updated.", "similarity": 1.0}]
+
+    def test_remove_chunks_compacts_past_threshold(self, document_retriever):
+        """Test that removed chunks are not retrieved and enough removals compact the index."""
+        # Setup
+        document_retriever.compact_threshold = 0.4
+        query = np.array([0.7, 0.8, 0.9])
+
+        # Call the method
+        first = document_retriever.remove_chunks(["para-2", "para-7"])
+        rows_after_first = len(document_retriever.index.ids)
+        second = document_retriever.remove_chunks(["para-1"])
+
+        # Assertions
+        assert (first, second) == (1, 1)
+        assert rows_after_first == 3
+        assert document_retriever.index.ids == ["para-0"]
+        assert document_retriever.index.num_deleted == 0
+        assert list(document_retriever.chunks) == ["para-0"]
+        assert "para-2" not in document_retriever.embeddings
+        assert [r["id"] for r in document_retriever.retrieve_documents(query)] == [
+            "para-0"
+        ]
+
+    def test_remove_chunks_with_repeated_ids(self, sample_embeddings):
+        """Test that an ID listed twice is removed once, from every structure."""
+        # Setup
+        chunks = [
+            {"id": "para-0", "text": "Alpha beta."},
+            {"id": "para-1", "text": "Gamma delta."},
+            {"id": "para-2", "text": "Epsilon zeta."},
+        ]
+        retriever = DocumentRetriever(
+            sample_embeddings, chunks, sparse_index=True, compact_threshold=0.9
+        )
+
+        # Call the method
+        removed = retriever.remove_chunks(["para-1", "para-1", "para-9"])
+
+        # Assertions
+        assert removed == 1
+        assert list(retriever.chunks) == ["para-0", "para-2"]
+        assert len(retriever.index) == 2
+        assert len(retriever.sparse_index) == 2
+        assert "para-1" not in retriever.embeddings
+        retriever.close()
+
+    @pytest.mark.parametrize(
+        "backend, index_params",
+        [
+            ("exact", None),
+            ("ivf", {"nlist": 2, "nprobe": 2}),
+            ("quantized", {"quantization": "int8", "rerank": 3}),
+        ],
+    )
+    def test_changes_on_loaded_index(
+        self, tmp_path, sample_embeddings, sample_chunks, backend, index_params
+    ):
+        """Test that a memory-mapped retriever can be changed, compacted and saved again."""
+        # Setup
+        path = str(tmp_path / "index")
+        DocumentRetriever(
+            sample_embeddings, sample_chunks, backend=backend, index_params=index_params
+        ).save(path)
+        retriever = DocumentRetriever.load(path)
+        query = np.array([0.0, 1.0, 0.0])
+
+        # Call the method
+        retriever.add_chunks(
+            [{"id": "para-3", "text": "New."}], {"para-3": np.array([0.0, 1.0, 0.0])}
+        )
+        retriever.remove_chunks(["para-0"])
+        before = retriever.retrieve_documents(query, top_k=3)
+        retriever.compact()
+        retriever.save(path)
+        reloaded = DocumentRetriever.load(path)
+
+        # Assertions
+        assert retriever.embeddings == {}
+        assert before[0]["id"] == "para-3"
+        assert [r["id"] for r in before] == ["para-3", "para-2", "para-1"]
+        assert retriever.retrieve_documents(query, top_k=3) == before
+        assert reloaded.retrieve_documents(query, top_k=3) == before
+        assert sorted(reloaded.chunks) == ["para-1", "para-2", "para-3"]
+
+    def test_retrieve_documents_uses_thread_pool(self, monkeypatch):
+        """Test that large indexes are scanned in shards on the retriever's thread pool."""
+        # Setup
+        monkeypatch.setattr(vector_index, "MIN_SHARD_ROWS", 10)
+        rng = np.random.default_rng(0)
+        embeddings = {f"para-{i}": v for i, v in enumerate(rng.normal(size=(100, 4)))}
+        chunks = [{"id": chunk_id, "text": chunk_id} for chunk_id in embeddings]
+        retriever = DocumentRetriever(embeddings, chunks, num_threads=3)
+        query = rng.normal(size=4)
+
+        # Call the method
+        with patch.object(
+            retriever._executor, "submit", wraps=retriever._executor.submit
+        ) as submit:
+            results = retriever.retrieve_documents(query, top_k=5)
+        retriever.close()
+
+        # Assertions
+        assert submit.call_count == 3
+        assert [r["id"] for r in results] == [
+            chunk_id for chunk_id, _ in retriever.index.search(query, top_k=5)
+        ]
+        with pytest.raises(RuntimeError):
+            retriever.retrieve_documents(query, top_k=5)
+
+    def test_reciprocal_rank_and_weighted_fusion(self):
+        """Test the two fusion formulas on small ranked lists."""
+        # Setup
+        dense = [("a", 0.9), ("b", 0.5), ("c", 0.1)]
+        sparse = [("c", 12.0), ("d", 2.0)]
+
+        # Call the method
+        rrf = reciprocal_rank_fusion([dense, sparse], k=60)
+        weighted = weighted_fusion([dense, sparse], [0.25, 0.75])
+
+        # Assertions
+        assert rrf["c"] == pytest.approx(1 / 63 + 1 / 61)
+        assert rrf["a"] == pytest.approx(1 / 61)
+        assert max(rrf, key=rrf.get) == "c"
+        assert weighted == pytest.approx({"a": 0.25, "b": 0.125, "c": 0.75, "d": 0.0})
+
+    @pytest.mark.parametrize("fusion", ["rrf", "weighted"])
+    def test_retrieve_hybrid_finds_exact_terms(self, fusion):
+        """Test that hybrid retrieval surfaces a keyword match the embeddings miss."""
+        # Setup
+        chunks = [
+            {"id": "para-0", "text": "General discussion of space agencies."},
+            {"id": "para-1", "text": "NASA launched Artemis."},
+            {"id": "para-2", "text": "Unrelated text about cooking."},
+        ]
+        embeddings = {
+            "para-0": np.array([1.0, 0.0]),
+            "para-1": np.array([0.0, 1.0]),
+            "para-2": np.array([0.7, 0.7]),
+        }
+        retriever = DocumentRetriever(embeddings, chunks, sparse_index=True)
+
+        # Call the method
+        dense = retriever.retrieve_documents(np.array([1.0, 0.1]), top_k=1)
+        hybrid = retriever.retrieve_hybrid(
+            "artemis", np.array([1.0, 0.1]), top_k=2, fusion=fusion
+        )
+
+        # Assertions
+        assert dense[0]["id"] == "para-0"
+        assert "para-1" in [result["id"] for result in hybrid]
+        assert hybrid[0]["text"] in {chunk["text"] for chunk in chunks}
+        with pytest.raises(ValueError):
+            retriever.retrieve_hybrid("artemis", np.ones(2), fusion="max")
+
+    def test_sparse_index_follows_changes_and_save(self, tmp_path, sample_embeddings):
+        """Test that chunk mutations and save/load keep the BM25 index in sync."""
+        # Setup
+        chunks = [
+            {"id": "para-0", "text": "Alpha beta."},
+            {"id": "para-1", "text": "Gamma delta."},
+            {"id": "para-2", "text": "Epsilon zeta."},
+        ]
+        retriever = DocumentRetriever(sample_embeddings, chunks, sparse_index=True)
+        path = str(tmp_path / "index")
+
+        # Call the method
+        retriever.add_chunks(
+            [{"id": "para-3", "text": "Omega omega."}], {"para-3": np.ones(3)}
+        )
+        retriever.remove_chunks(["para-1"])
+        retriever.save(path)
+        loaded = DocumentRetriever.load(path)
+
+        # Assertions
+        for candidate in (retriever, loaded):
+            assert candidate.sparse_index.search("omega")[0][0] == "para-3"
+            assert candidate.sparse_index.search("gamma") == []
+        assert DocumentRetriever(sample_embeddings, chunks).sparse_index is None
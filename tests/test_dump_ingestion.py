@@ -0,0 +1,211 @@
+import bz2
+import gzip
+import io
+import json
+import tarfile
+import pytest
+from src.data_extraction import DataExtractor
+from src import dump_ingestion
+from src.dump_ingestion import (
+    DumpReader,
+    _iter_ndjson_pages,
+    _iter_task_pages,
+    PAGES_PER_TASK,
+    TASKS_IN_FLIGHT_PER_PROCESS,
+)
+
+
+def make_page(title, paragraphs=3):
+    """Build Parsoid-style article HTML without a mw-content-text div."""
+    body = "".join(
+        f"<p>{title} paragraph {i} has enough text to pass the fifty character filter.[{i}]</p>"
+        for i in range(paragraphs)
+    )
+    return (
+        f"<html><head><title>{title}</title></head><body>"
+        f"<h2>{title} overview</h2>{body}"
+        "<h2>See also</h2><p>Skipped paragraph in a section we do not want in the corpus.</p>"
+        "</body></html>"
+    )
+
+
+def make_ndjson(titles):
+    """Build an NDJSON dump in the Wikimedia Enterprise record layout."""
+    return "".join(
+        json.dumps({"name": title, "article_body": {"html": make_page(title)}}) + "\n"
+        for title in titles
+    ).encode("utf-8")
+
+
+class TestDumpReader:
+    @pytest.fixture
+    def ndjson_path(self, tmp_path):
+        """An uncompressed NDJSON dump with many articles."""
+        path = tmp_path / "articles.ndjson"
+        path.write_bytes(make_ndjson([f"Article {i}" for i in range(40)]))
+        return path
+
+    def test_html_file_uses_clean_data_rules(self, tmp_path):
+        """Test that a gzipped HTML page is cleaned like DataExtractor.clean_data."""
+        # Setup
+        html = make_page("Robots")
+        path = tmp_path / "robots.html.gz"
+        path.write_bytes(gzip.compress(html.encode("utf-8")))
+        extractor = DataExtractor("robots.html", body_fallback=True)
+        extractor.raw_content = html
+
+        # Call the method
+        chunks = DumpReader([str(path)], num_processes=1).extract_all()
+
+        # Assertions
+        assert chunks == extractor.clean_data(id_prefix="robots.html.gz/")
+        assert chunks[0] == {
+            "id": "robots.html.gz/heading-0",
+            "text": "Robots overview",
+        }
+        assert "See also" not in [chunk["text"] for chunk in chunks]
+        assert "[0]" not in chunks[1]["text"]
+
+    def test_ndjson_byte_ranges_match_whole_file(self, ndjson_path):
+        """Test that splitting an NDJSON file into ranges neither drops nor repeats pages."""
+        # Setup
+        whole = DumpReader([str(ndjson_path)], num_processes=1)
+        split = DumpReader([str(ndjson_path)], num_processes=7, min_range_bytes=1)
+
+        # Call the method
+        tasks = split.tasks()
+        split_pages = [page for task in tasks for page in _iter_task_pages(task)]
+
+        # Assertions
+        assert len(whole.tasks()) == 1
+        assert len(tasks) == 7
+        assert split_pages == list(whole.iter_pages())
+        assert len(split_pages) == 40
+
+    def test_ndjson_page_keys_are_line_offsets(self):
+        """Test that page keys hold the byte offset of each record."""
+        # Setup
+        data = make_ndjson(["First", "Second"])
+        stream = io.BytesIO(data)
+
+        # Call the method
+        keys = [key for key, _ in _iter_ndjson_pages(stream, "dump.ndjson")]
+
+        # Assertions
+        second_offset = data.index(b"\n") + 1
+        assert keys == ["dump.ndjson@0", f"dump.ndjson@{second_offset}"]
+
+    def test_skips_malformed_and_empty_records(self, tmp_path):
+        """Test that bad NDJSON lines are skipped without stopping ingestion."""
+        # Setup
+        path = tmp_path / "mixed.jsonl"
+        path.write_bytes(
+            b"not json\n\n"
+            + json.dumps({"name": "No body"}).encode("utf-8")
+            + b"\n"
+            + make_ndjson(["Valid"])
+        )
+
+        # Call the method
+        pages = list(DumpReader([str(path)], num_processes=1).iter_pages())
+
+        # Assertions
+        assert len(pages) == 1
+        assert "Valid overview" in pages[0][1]
+
+    def test_compressed_and_tar_inputs(self, tmp_path):
+        """Test bz2 NDJSON files and gzipped tar archives found in a directory."""
+        # Setup
+        (tmp_path / "a.ndjson.bz2").write_bytes(bz2.compress(make_ndjson(["Alpha"])))
+        member = make_ndjson(["Beta", "Gamma"])
+        with tarfile.open(tmp_path / "b.json.tar.gz", "w:gz") as archive:
+            info = tarfile.TarInfo("enwiki_namespace_0_0.ndjson")
+            info.size = len(member)
+            archive.addfile(info, io.BytesIO(member))
+        (tmp_path / "notes.txt").write_text("not a dump")
+
+        # Call the method
+        reader = DumpReader([str(tmp_path)], num_processes=1)
+        chunks = reader.extract_all()
+
+        # Assertions
+        assert [task[1] for task in reader.tasks()] == ["ndjson", "tar"]
+        headings = [c["text"] for c in chunks if "/heading-" in c["id"]]
+        assert headings == ["Alpha overview", "Beta overview", "Gamma overview"]
+        assert chunks[-1]["id"].startswith("b.json.tar.gz/enwiki_namespace_0_0.ndjson@")
+        assert len({chunk["id"] for chunk in chunks}) == len(chunks)
+
+    def test_same_named_files_get_distinct_ids(self, tmp_path):
+        """Test that files with the same name in different directories keep their chunks apart."""
+        # Setup
+        for directory, title in (("a", "Alpha"), ("b", "Beta")):
+            (tmp_path / directory).mkdir()
+            (tmp_path / directory / "part.ndjson").write_bytes(make_ndjson([title]))
+
+        # Call the method
+        chunks = DumpReader([str(tmp_path)], num_processes=1).extract_all()
+        direct = DumpReader(
+            [str(tmp_path / "a" / "part.ndjson"), str(tmp_path / "b" / "part.ndjson")],
+            num_processes=1,
+        ).extract_all()
+
+        # Assertions
+        assert len({chunk["id"] for chunk in chunks}) == len(chunks) == 10
+        assert chunks[0]["id"] == "a/part.ndjson@0/heading-0"
+        assert chunks[-1]["id"].startswith("b/part.ndjson@0/")
+        assert len({chunk["id"] for chunk in direct}) == len(direct) == 10
+
+    def test_parallel_matches_sequential(self, ndjson_path):
+        """Test that parsing with a process pool gives the same chunks in the same order."""
+        # Setup
+        sequential = DumpReader([str(ndjson_path)], num_processes=1)
+        parallel = DumpReader([str(ndjson_path)], num_processes=3, min_range_bytes=1)
+
+        # Call the method
+        expected = sequential.extract_all()
+        result = parallel.extract_all()
+
+        # Assertions
+        assert len(parallel.tasks()) == 3
+        assert result == expected
+        assert len({chunk["id"] for chunk in result}) == len(result)
+
+    @pytest.mark.parametrize("num_processes", [1, 2])
+    def test_single_archive_is_streamed(self, tmp_path, monkeypatch, num_processes):
+        """Test that chunks of one compressed file come out before the file is read."""
+        # Setup
+        path = tmp_path / "dump.ndjson.gz"
+        path.write_bytes(gzip.compress(make_ndjson([f"Page {i}" for i in range(300)])))
+        pages_read = []
+
+        def counting_pages(task):
+            for page in _iter_task_pages(task):
+                pages_read.append(page[0])
+                yield page
+
+        monkeypatch.setattr(dump_ingestion, "_iter_task_pages", counting_pages)
+        chunks = DumpReader([str(path)], num_processes=num_processes).iter_chunks()
+
+        # Call the method
+        first = next(chunks)
+        read_before_first = len(pages_read)
+        rest = list(chunks)
+
+        # Assertions
+        assert first["id"] == "dump.ndjson.gz@0/heading-0"
+        limit = PAGES_PER_TASK * TASKS_IN_FLIGHT_PER_PROCESS * num_processes
+        assert read_before_first <= limit
+        assert len(pages_read) == 300
+        assert len(rest) == 300 * 5 - 1
+
+    def test_unreadable_file_returns_no_chunks(self, tmp_path):
+        """Test that a corrupt compressed file is logged and skipped."""
+        # Setup
+        path = tmp_path / "broken.ndjson.gz"
+        path.write_bytes(b"definitely not gzip")
+
+        # Call the method
+        chunks = DumpReader([str(path)], num_processes=1).extract_all()
+
+        # Assertions
+        assert chunks == []
@@ -0,0 +1,104 @@
+import pytest
+import numpy as np
+from src.embedding_cache import EmbeddingCache
+
+
+@pytest.fixture
+def cache_dir(tmp_path):
+    """Directory for the cache files."""
+    return str(tmp_path / "model-a")
+
+
+def test_empty_cache_has_no_hits(cache_dir):
+    """Test that a new cache reports only misses."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+
+    assert len(cache) == 0
+    assert cache.get_many(["some text"]) == {}
+
+
+def test_put_and_get(cache_dir):
+    """Test that stored vectors are returned by position for hits only."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cache.put_many(["alpha", "beta"], np.array([[1.0, 2.0], [3.0, 4.0]]))
+
+    hits = cache.get_many(["beta", "gamma", "alpha"])
+
+    assert sorted(hits) == [0, 2]
+    assert np.array_equal(hits[0], [3.0, 4.0])
+    assert np.array_equal(hits[2], [1.0, 2.0])
+
+
+def test_persists_across_instances_and_appends(cache_dir):
+    """Test that entries survive reopening and later appends extend the cache."""
+    EmbeddingCache(cache_dir, "model-a").put_many(["alpha"], np.array([[1.0, 2.0]]))
+
+    reopened = EmbeddingCache(cache_dir, "model-a")
+    reopened.put_many(["alpha", "beta"], np.array([[9.0, 9.0], [3.0, 4.0]]))
+    hits = EmbeddingCache(cache_dir, "model-a").get_many(["alpha", "beta"])
+
+    assert len(reopened) == 2
+    assert np.array_equal(hits[0], [1.0, 2.0])
+    assert np.array_equal(hits[1], [3.0, 4.0])
+
+
+def test_key_depends_on_model_name(cache_dir):
+    """Test that the same text hashes differently for different models."""
+    assert EmbeddingCache(cache_dir, "model-a").key("text") != EmbeddingCache(
+        cache_dir, "model-b"
+    ).key("text")
+
+
+def test_truncated_vectors_file_is_ignored(cache_dir):
+    """Test that index entries without a fully written vector are dropped."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cache.put_many(["alpha", "beta"], np.array([[1.0, 2.0], [3.0, 4.0]]))
+    with open(cache._path(EmbeddingCache.VECTORS_FILE), "r+b") as f:
+        f.truncate(12)
+
+    reopened = EmbeddingCache(cache_dir, "model-a")
+
+    assert len(reopened) == 1
+    assert list(reopened.get_many(["alpha", "beta"])) == [0]
+
+
+def test_torn_writes_keep_rows_aligned(cache_dir):
+    """Test that appends after an interrupted write map every key to its own vector."""
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cache.put_many(["alpha"], np.array([[1.0, 1.0]]))
+    # Vectors written, index line lost
+    with open(cache._path(EmbeddingCache.VECTORS_FILE), "ab") as f:
+        f.write(np.array([[9.0, 9.0]], dtype=np.float32).tobytes())
+
+    reopened = EmbeddingCache(cache_dir, "model-a")
+    reopened.put_many(["beta"], np.array([[2.0, 2.0]]))
+    # Index line written, vector lost
+    with open(reopened._path(EmbeddingCache.INDEX_FILE), "a") as f:
+        f.write(f"{reopened.key('gamma')}\n")
+
+    again = EmbeddingCache(cache_dir, "model-a")
+    again.put_many(["delta"], np.array([[4.0, 4.0]]))
+    hits = EmbeddingCache(cache_dir, "model-a").get_many(
+        ["alpha", "beta", "gamma", "delta"]
+    )
+
+    assert sorted(hits) == [0, 1, 3]
+    assert np.array_equal(hits[1], [2.0, 2.0])
+    assert np.array_equal(hits[3], [4.0, 4.0])
+
+
+def test_mismatched_vectors_are_not_cached(cache_dir):
+    """Test that rows of another size or dtype never reach the vectors file."""
+    EmbeddingCache(cache_dir, "model-a").put_many(["alpha"], np.array([[1.0, 2.0]]))
+
+    cache = EmbeddingCache(cache_dir, "model-a")
+    cache.put_many(["beta"], np.array([[1.0, 2.0, 3.0]]))
+    cache.put_many(["gamma"], np.array([["x", "y"]]))
+    cache.put_many(["delta"], np.array([3.0, 4.0]))
+    cache.put_many(["epsilon"], np.array([[5.0, 6.0]]))
+    reopened = EmbeddingCache(cache_dir, "model-a")
+    hits = reopened.get_many(["alpha", "beta", "gamma", "delta", "epsilon"])
+
+    assert len(reopened) == 2
+    assert sorted(hits) == [0, 4]
+    assert np.array_equal(hits[4], [5.0, 6.0])
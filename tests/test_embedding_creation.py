@@ -1,15 +1,16 @@
+import os
 import pytest
 import numpy as np
 from unittest.mock import patch, MagicMock
-from multiprocessing import Pool
-from src.embedding_creation import EmbeddingCreator
+from src.embedding_creation import EmbeddingCreator, _mean_word_vectors
+from src.word_vectors import WordVectorTable
 
 
 class TestEmbeddingCreator:
     @pytest.fixture
-    def embedding_creator(self):
+    def embedding_creator(self, tmp_path):
         """Create an EmbeddingCreator instance."""
-        return EmbeddingCreator()
+        return EmbeddingCreator(cache_dir=str(tmp_path))
 
     @pytest.fixture
     def sample_chunks(self):
@@ -21,10 +22,11 @@ class TestEmbeddingCreator:
 
     @patch("gensim.downloader.load")
     def test_load_model_success(self, mock_load, embedding_creator):
-        """Test successful model loading."""
+        """Test that the first load converts the downloaded model to a memory-mapped table."""
         # Setup mock model
         mock_model = MagicMock()
-        mock_model.vector_size = 100
+        mock_model.index_to_key = ["first", "second"]
+        mock_model.vectors = np.ones((2, 100))
         mock_load.return_value = mock_model
 
         # Call the method
@@ -32,10 +34,131 @@ class TestEmbeddingCreator:
 
         # Assertions
         assert result is True
-        assert embedding_creator.model == mock_model
+        assert isinstance(embedding_creator.model, WordVectorTable)
+        assert isinstance(embedding_creator.model.vectors, np.memmap)
+        assert embedding_creator.model.words == ["first", "second"]
         assert embedding_creator.vector_size == 100
+        assert WordVectorTable.exists(embedding_creator.vectors_dir)
         mock_load.assert_called_once_with("glove-wiki-gigaword-100")
 
+    @patch("gensim.downloader.load")
+    def test_load_model_reuses_converted_table(self, mock_load, tmp_path):
+        """Test that a converted table is memory-mapped without calling gensim."""
+        WordVectorTable(["cat"], np.ones((1, 4), dtype=np.float32)).save(
+            str(tmp_path / "glove-wiki-gigaword-100")
+        )
+        embedding_creator = EmbeddingCreator(cache_dir=str(tmp_path))
+
+        assert embedding_creator.load_model() is True
+        assert embedding_creator.vector_size == 4
+        assert isinstance(embedding_creator.model.vectors, np.memmap)
+        mock_load.assert_not_called()
+
+    @patch("gensim.downloader.load")
+    def test_load_model_from_vectors_path(self, mock_load, tmp_path):
+        """Test loading a saved table from a local directory, offline."""
+        vectors_dir = str(tmp_path / "vectors")
+        WordVectorTable(["cat"], np.ones((1, 4), dtype=np.float32)).save(vectors_dir)
+        embedding_creator = EmbeddingCreator(
+            cache_dir=str(tmp_path / "cache"), vectors_path=vectors_dir
+        )
+
+        assert embedding_creator.load_model() is True
+        assert embedding_creator.vectors_dir == vectors_dir
+        assert "cat" in embedding_creator.model
+        mock_load.assert_not_called()
+
+    @patch("gensim.downloader.load")
+    def test_load_model_from_text_file(self, mock_load, tmp_path):
+        """Test that a GloVe text file is converted into the cache once."""
+        text_path = tmp_path / "glove.test.3d.txt"
+        text_path.write_text("cat 1 0 0\ndog 0 1 0\n")
+        embedding_creator = EmbeddingCreator(
+            cache_dir=str(tmp_path / "cache"), vectors_path=str(text_path)
+        )
+
+        assert embedding_creator.load_model() is True
+        assert os.path.dirname(embedding_creator.vectors_dir) == str(tmp_path / "cache")
+        assert os.path.basename(embedding_creator.vectors_dir).startswith(
+            "glove.test.3d-"
+        )
+        assert WordVectorTable.exists(embedding_creator.vectors_dir)
+        assert np.array_equal(embedding_creator.model["dog"], [0, 1, 0])
+        mock_load.assert_not_called()
+
+    def test_text_file_conversion_follows_the_source(self, tmp_path):
+        """Test that a changed file, or another file of the same name, is converted again."""
+        cache_dir = str(tmp_path / "cache")
+        first_path, second_path = (
+            tmp_path / "a" / "glove.txt",
+            tmp_path / "b" / "glove.txt",
+        )
+        for path, row in ((first_path, "cat 1 0"), (second_path, "cat 0 1")):
+            path.parent.mkdir()
+            path.write_text(f"{row}\n")
+
+        first = EmbeddingCreator(cache_dir=cache_dir, vectors_path=str(first_path))
+        second = EmbeddingCreator(cache_dir=cache_dir, vectors_path=str(second_path))
+        assert first.load_model() and second.load_model()
+        assert first.vectors_dir != second.vectors_dir
+        assert np.array_equal(first.model["cat"], [1, 0])
+        assert np.array_equal(second.model["cat"], [0, 1])
+
+        first_path.write_text("cat 0.5 0.5 0.5\n")
+        os.utime(first_path, ns=(0, 10**9))
+        changed = EmbeddingCreator(cache_dir=cache_dir, vectors_path=str(first_path))
+        assert changed.load_model() is True
+        assert np.array_equal(changed.model["cat"], [0.5, 0.5, 0.5])
+
+    def test_embed_query_falls_back_to_full_table(self, tmp_path):
+        """Test that queries with words outside a pruned table use the full table."""
+        full_dir, pruned_dir = str(tmp_path / "full"), str(tmp_path / "pruned")
+        full = WordVectorTable(
+            ["cat", "dog"], np.array([[1.0, 0.0], [0.0, 1.0]], dtype=np.float32)
+        )
+        full.save(full_dir)
+        full.pruned({"cat": 1}, fallback_dir=full_dir).save(pruned_dir)
+        embedding_creator = EmbeddingCreator(
+            cache_dir=str(tmp_path / "cache"), vectors_path=pruned_dir
+        )
+
+        assert np.array_equal(embedding_creator.embed_query("cat"), [1.0, 0.0])
+        assert embedding_creator._fallback is None
+        assert np.array_equal(embedding_creator.embed_query("cat dog"), [0.5, 0.5])
+        assert len(embedding_creator._fallback) == 2
+
+    def test_cache_is_keyed_by_vectors_table(self, tmp_path):
+        """Test that replacing the local table never returns embeddings of the old one."""
+        vectors_dir, cache_dir = str(tmp_path / "vectors"), str(tmp_path / "cache")
+        WordVectorTable(["cat", "dog"], np.ones((2, 3), dtype=np.float32)).save(
+            vectors_dir
+        )
+        first_run = EmbeddingCreator(cache_dir=cache_dir, vectors_path=vectors_dir)
+        first_run.create_embeddings([{"id": "para-0", "text": "cat"}])
+
+        WordVectorTable(["cat", "dog"], np.ones((2, 4), dtype=np.float32)).save(
+            vectors_dir
+        )
+        second_run = EmbeddingCreator(cache_dir=cache_dir, vectors_path=vectors_dir)
+        result = second_run.create_embeddings(
+            [{"id": "para-0", "text": "cat"}, {"id": "para-1", "text": "dog"}]
+        )
+
+        assert first_run.cache.model_name != second_run.cache.model_name
+        assert first_run.cache.directory != second_run.cache.directory
+        assert [vector.shape for vector in result.values()] == [(4,), (4,)]
+
+    @patch("gensim.downloader.load")
+    def test_load_model_missing_vectors_path(self, mock_load, tmp_path):
+        """Test that a missing local table fails instead of downloading."""
+        embedding_creator = EmbeddingCreator(
+            cache_dir=str(tmp_path), vectors_path=str(tmp_path / "missing")
+        )
+
+        assert embedding_creator.load_model() is False
+        assert embedding_creator.model is None
+        mock_load.assert_not_called()
+
     @patch("gensim.downloader.load")
     def test_load_model_failure(self, mock_load, embedding_creator):
         """Test model loading failure."""
@@ -87,21 +210,31 @@ class TestEmbeddingCreator:
         assert isinstance(embedding, np.ndarray)
         assert embedding.shape == (3,)
 
-    @patch("multiprocessing.Pool")
-    def test_create_embeddings(self, mock_pool, embedding_creator, sample_chunks):
+    @pytest.fixture
+    def word_vector_table(self):
+        """Small word vector table for testing."""
+        return WordVectorTable(
+            ["first", "second", "paragraph"],
+            np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0]]),
+        )
+
+    @patch("src.embedding_creation.Pool")
+    def test_create_embeddings(
+        self, mock_pool, embedding_creator, sample_chunks, word_vector_table, tmp_path
+    ):
         """Test embedding creation for multiple chunks."""
         # Setup
-        mock_model = MagicMock()
-        mock_model.vector_size = 3
-        embedding_creator.model = mock_model
+        embedding_creator.model = word_vector_table
+        embedding_creator.vector_size = 3
+        embedding_creator.cache_dir = str(tmp_path)
+        embedding_creator.num_processes = 2
+        embedding_creator.parallel_min_chars = 0
 
         # Mock the pool.map result
-        mock_instance = MagicMock()
-        mock_instance.map.return_value = [
-            ("para-0", np.array([0.1, 0.2, 0.3])),
-            ("para-1", np.array([0.4, 0.5, 0.6])),
+        mock_pool.return_value.map.return_value = [
+            (["para-0"], np.array([[0.1, 0.2, 0.3]])),
+            (["para-1"], np.array([[0.4, 0.5, 0.6]])),
         ]
-        mock_pool.return_value.__enter__.return_value = mock_instance
 
         # Call the method
         result = embedding_creator.create_embeddings(sample_chunks)
@@ -112,3 +245,158 @@ class TestEmbeddingCreator:
         assert "para-1" in result
         assert isinstance(result["para-0"], np.ndarray)
         assert isinstance(result["para-1"], np.ndarray)
+        # Workers receive only chunk ID and text, never the creator or model
+        batches = mock_pool.return_value.map.call_args[0][1]
+        assert batches == [
+            (["para-0"], ["This is the first paragraph."]),
+            (["para-1"], ["This is the second paragraph."]),
+        ]
+        assert WordVectorTable.exists(embedding_creator.vectors_dir)
+
+    @patch("src.embedding_creation.Pool")
+    def test_create_embeddings_reuses_pool(
+        self, mock_pool, embedding_creator, sample_chunks, word_vector_table, tmp_path
+    ):
+        """Test that the worker pool is started once and reused across calls."""
+        # Setup
+        embedding_creator.model = word_vector_table
+        embedding_creator.vector_size = 3
+        embedding_creator.cache_dir = str(tmp_path)
+        embedding_creator.num_processes = 2
+        embedding_creator.parallel_min_chars = 0
+        mock_pool.return_value.map.return_value = []
+
+        # Call the method twice
+        embedding_creator.create_embeddings(sample_chunks)
+        embedding_creator.create_embeddings(sample_chunks)
+        embedding_creator.close()
+
+        # Assertions
+        assert mock_pool.call_count == 1
+        mock_pool.return_value.close.assert_called_once()
+
+    def test_create_embeddings_with_worker_processes(
+        self, sample_chunks, word_vector_table, tmp_path
+    ):
+        """Test that real pool workers match in-process embeddings."""
+        # Setup
+        with EmbeddingCreator(
+            cache_dir=str(tmp_path), num_processes=2, parallel_min_chars=0
+        ) as creator:
+            creator.model = word_vector_table
+            creator.vector_size = 3
+
+            # Call the method
+            result = creator.create_embeddings(sample_chunks)
+
+            # Assertions
+            for chunk in sample_chunks:
+                _, expected = creator._create_embedding_for_chunk(chunk)
+                assert np.allclose(result[chunk["id"]], expected)
+
+    @patch("src.embedding_creation.Pool")
+    def test_create_embeddings_small_batch_in_process(
+        self, mock_pool, embedding_creator, sample_chunks, word_vector_table
+    ):
+        """Test that small batches are embedded without starting a pool."""
+        # Setup
+        embedding_creator.model = word_vector_table
+        embedding_creator.vector_size = 3
+
+        # Call the method
+        result = embedding_creator.create_embeddings(
+            sample_chunks + [{"id": "para-2", "text": "Nothing known here"}]
+        )
+
+        # Assertions
+        mock_pool.assert_not_called()
+        assert np.allclose(result["para-0"], [0.5, 0.0, 0.5])
+        assert np.allclose(result["para-1"], [0.0, 0.5, 0.5])
+        assert np.array_equal(result["para-2"], np.zeros(3))
+
+    def test_mean_word_vectors_matches_per_word_average(self, word_vector_table):
+        """Test that the vectorized segment sum matches a plain average."""
+        # Setup
+        texts = ["first second", "", "paragraph paragraph first unknown", "second"]
+
+        # Call the method
+        embeddings = _mean_word_vectors(word_vector_table, texts, 3)
+
+        # Assertions
+        assert embeddings.shape == (4, 3)
+        assert np.allclose(embeddings[0], [0.5, 0.5, 0.0])
+        assert np.array_equal(embeddings[1], np.zeros(3))
+        assert np.allclose(embeddings[2], [1 / 3, 0.0, 2 / 3])
+        assert np.allclose(embeddings[3], [0.0, 1.0, 0.0])
+
+    def test_create_embeddings_uses_cache(
+        self, sample_chunks, word_vector_table, tmp_path
+    ):
+        """Test that a second run reads cached embeddings without the model."""
+        # Setup
+        first_run = EmbeddingCreator(cache_dir=str(tmp_path))
+        first_run.model = word_vector_table
+        first_run.vector_size = 3
+        expected = first_run.create_embeddings(sample_chunks)
+
+        second_run = EmbeddingCreator(cache_dir=str(tmp_path))
+        second_run.load_model = MagicMock(return_value=False)
+
+        # Call the method
+        result = second_run.create_embeddings(sample_chunks)
+
+        # Assertions
+        second_run.load_model.assert_not_called()
+        assert second_run.model is None
+        assert list(result) == ["para-0", "para-1"]
+        for chunk_id in expected:
+            assert np.array_equal(result[chunk_id], expected[chunk_id])
+
+    def test_create_embeddings_stream_is_lazy(
+        self, embedding_creator, word_vector_table
+    ):
+        """Test that streamed batches are produced before the input is exhausted."""
+        # Setup
+        embedding_creator.model = word_vector_table
+        embedding_creator.vector_size = 3
+        pulled = []
+
+        def chunk_source():
+            for i in range(10):
+                pulled.append(i)
+                yield {"id": f"para-{i}", "text": f"first paragraph {i}"}
+
+        # Call the method
+        stream = embedding_creator.create_embeddings_stream(
+            chunk_source(), batch_size=4, parallel=False
+        )
+        batch, embeddings = next(stream)
+
+        # Assertions
+        assert len(pulled) == 4
+        assert [chunk["id"] for chunk in batch] == [f"para-{i}" for i in range(4)]
+        assert list(embeddings) == [f"para-{i}" for i in range(4)]
+        assert [len(batch) for batch, _ in stream] == [4, 2]
+
+    def test_create_embeddings_stream_with_worker_processes(
+        self, word_vector_table, tmp_path
+    ):
+        """Test that pooled streaming matches in-process embeddings in order."""
+        # Setup
+        chunks = [
+            {"id": f"para-{i}", "text": ["first", "second paragraph"][i % 2]}
+            for i in range(9)
+        ]
+        with EmbeddingCreator(cache_dir=str(tmp_path), num_processes=2) as creator:
+            creator.model = word_vector_table
+            creator.vector_size = 3
+
+            # Call the method
+            batches = list(creator.create_embeddings_stream(iter(chunks), batch_size=2))
+
+            # Assertions
+            assert [chunk for batch, _ in batches for chunk in batch] == chunks
+            for batch, embeddings in batches:
+                for chunk in batch:
+                    _, expected = creator._create_embedding_for_chunk(chunk)
+                    assert np.allclose(embeddings[chunk["id"]], expected)
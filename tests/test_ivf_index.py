@@ -0,0 +1,124 @@
+import pytest
+import numpy as np
+from src.ivf_index import IVFIndex, assign_to_centroids, train_centroids
+from src.vector_index import VectorIndex, normalize_rows
+
+
+@pytest.fixture
+def clustered_embeddings():
+    """Embeddings drawn around a few well separated centers."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    labels = rng.integers(0, 20, 2000)
+    vectors = centers[labels] + 0.3 * rng.normal(size=(2000, 16))
+    return {f"para-{i}": vector for i, vector in enumerate(vectors)}
+
+
+def test_train_centroids_returns_unit_norm_centroids():
+    """Test that k-means produces the requested number of normalized centroids."""
+    rng = np.random.default_rng(0)
+    sample = normalize_rows(rng.normal(size=(300, 8)))
+
+    centroids = train_centroids(sample, 10, 5, rng)
+
+    assert centroids.shape == (10, 8)
+    assert np.allclose(np.linalg.norm(centroids, axis=1), 1.0, atol=1e-5)
+
+
+def test_assign_to_centroids_matches_argmax_across_blocks():
+    """Test that blocked assignment matches a single argmax."""
+    rng = np.random.default_rng(1)
+    matrix = normalize_rows(rng.normal(size=(50, 4)))
+    centroids = normalize_rows(rng.normal(size=(6, 4)))
+
+    assignments = assign_to_centroids(matrix, centroids, block=7)
+
+    assert assignments.tolist() == np.argmax(matrix @ centroids.T, axis=1).tolist()
+
+
+def test_lists_partition_all_vectors(clustered_embeddings):
+    """Test that every vector is stored in exactly one contiguous list."""
+    index = IVFIndex(clustered_embeddings, nlist=20)
+
+    assert len(index) == 2000
+    assert sorted(index.ids) == sorted(clustered_embeddings)
+    assert index.list_offsets[0] == 0
+    assert index.list_offsets[-1] == 2000
+    assert np.all(np.diff(index.list_offsets) >= 0)
+
+
+def test_probing_every_list_matches_exact_search(clustered_embeddings):
+    """Test that nprobe == nlist returns the exact results."""
+    index = IVFIndex(clustered_embeddings, nlist=20)
+    exact = VectorIndex(clustered_embeddings)
+    query = np.random.default_rng(2).normal(size=16)
+
+    results = index.search(query, top_k=10, nprobe=20)
+    expected = exact.search(query, top_k=10)
+
+    assert [chunk_id for chunk_id, _ in results] == [
+        chunk_id for chunk_id, _ in expected
+    ]
+    assert np.allclose(
+        [score for _, score in results], [score for _, score in expected], atol=1e-5
+    )
+
+
+def test_recall_with_few_probes(clustered_embeddings):
+    """Test that probing a few lists keeps recall high on clustered data."""
+    index = IVFIndex(clustered_embeddings, nlist=40, nprobe=4)
+
+    assert index.recall(top_k=10) >= 0.9
+    assert index.recall(top_k=10, nprobe=40) == 1.0
+    assert index.recall(top_k=10, nprobe=1) <= index.recall(top_k=10, nprobe=8)
+
+
+def test_search_batch_matches_search(clustered_embeddings):
+    """Test that batched approximate search matches per-query search."""
+    index = IVFIndex(clustered_embeddings, nlist=20, nprobe=3)
+    queries = np.random.default_rng(3).normal(size=(5, 16))
+
+    assert index.search_batch(queries, top_k=4) == [
+        index.search(query, top_k=4) for query in queries
+    ]
+
+
+def test_small_and_empty_index():
+    """Test that nlist is capped by the number of vectors."""
+    small = IVFIndex({"a": np.array([1.0, 0.0]), "b": np.array([0.0, 1.0])}, nlist=8)
+    empty = IVFIndex({})
+
+    assert small.nlist == 2
+    assert small.search(np.array([1.0, 0.1]), top_k=1, nprobe=2)[0][0] == "a"
+    assert empty.search(np.array([1.0, 0.0])) == []
+
+
+def test_add_remove_and_compact(clustered_embeddings):
+    """Test that appended rows are probed and compaction regroups them."""
+    items = list(clustered_embeddings.items())
+    index = IVFIndex(dict(items[:1500]), nlist=20, nprobe=20)
+    exact = VectorIndex(dict(items[100:]))
+    query = items[1700][1]
+
+    index.add(dict(items[1500:]))
+    index.remove([chunk_id for chunk_id, _ in items[:100]])
+    compacted = index.compacted()
+
+    assert len(index) == len(compacted) == 1900
+    assert len(index.tail_lists) == 500
+    assert index.needs_compaction(0.2)
+    assert len(compacted.tail_lists) == 0
+    assert compacted.list_offsets[-1] == 1900
+    for result in (index.search(query, top_k=10), compacted.search(query, top_k=10)):
+        assert [i for i, _ in result] == [i for i, _ in exact.search(query, top_k=10)]
+
+
+def test_add_to_empty_index_builds_lists(clustered_embeddings):
+    """Test that the first vectors added to an empty index train the lists."""
+    index = IVFIndex({}, nprobe=4)
+
+    index.add(clustered_embeddings)
+
+    assert index.nlist == int(4 * np.sqrt(2000))
+    assert index.list_offsets[-1] == 2000
+    assert index.recall(top_k=10, nprobe=index.nlist) == 1.0
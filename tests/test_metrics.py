@@ -0,0 +1,100 @@
+import json
+import pytest
+import numpy as np
+from src.metrics import MetricsRegistry, Histogram
+
+
+@pytest.fixture
+def registry():
+    """Empty metrics registry."""
+    return MetricsRegistry()
+
+
+def test_counter_and_histogram_snapshot(registry):
+    """Test that counters add up and histograms report count, sum and percentiles."""
+    registry.counter("chunks_total").inc()
+    registry.counter("chunks_total").inc(4)
+    for value in range(1, 101):
+        registry.histogram("latency_seconds").observe(value / 1000)
+
+    snapshot = registry.snapshot()
+
+    assert snapshot["chunks_total"] == {"type": "counter", "value": 5}
+    latency = snapshot["latency_seconds"]
+    assert latency["count"] == 100
+    assert latency["sum"] == pytest.approx(5.05)
+    assert latency["p50"] == pytest.approx(np.percentile(np.arange(1, 101), 50) / 1000)
+    assert latency["p95"] == pytest.approx(0.09505)
+    assert latency["p99"] == pytest.approx(0.09901)
+
+
+def test_histogram_keeps_recent_samples():
+    """Test that percentiles use only the most recent observations."""
+    histogram = Histogram("h", max_samples=10)
+    for value in [100.0] * 10 + [1.0] * 10:
+        histogram.observe(value)
+
+    assert histogram.count == 20
+    assert histogram.percentiles()["p99"] == 1.0
+
+
+def test_timer_and_decorator_observe_calls(registry):
+    """Test that timers record every call, including calls that raise."""
+
+    @registry.timed("work_seconds")
+    def work(x):
+        if x < 0:
+            raise ValueError("negative")
+        return 2 * x
+
+    assert work(2) == 4
+    with pytest.raises(ValueError):
+        work(-1)
+    with registry.timer("block_seconds"):
+        pass
+
+    assert registry.histogram("work_seconds").count == 2
+    assert registry.histogram("block_seconds").count == 1
+
+
+def test_metric_type_conflict(registry):
+    """Test that a name cannot be reused for a different metric type."""
+    registry.counter("events_total")
+
+    with pytest.raises(ValueError):
+        registry.histogram("events_total")
+
+
+def test_prometheus_export(registry):
+    """Test the Prometheus text exposition format."""
+    registry.counter("chunks_total", "Chunks seen").inc(3)
+    histogram = registry.histogram("latency_seconds", "Latency")
+    histogram.observe(0.0002)
+    histogram.observe(0.003)
+    histogram.observe(100.0)
+
+    lines = registry.to_prometheus().splitlines()
+
+    assert "# HELP chunks_total Chunks seen" in lines
+    assert "# TYPE chunks_total counter" in lines
+    assert "chunks_total 3" in lines
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.0001"} 0' in lines
+    assert 'latency_seconds_bucket{le="0.0005"} 1' in lines
+    assert 'latency_seconds_bucket{le="0.005"} 2' in lines
+    assert 'latency_seconds_bucket{le="60"} 2' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 3' in lines
+    assert "latency_seconds_count 3" in lines
+
+
+def test_save_as_json_and_prometheus(registry, tmp_path):
+    """Test that the file format follows the file extension."""
+    registry.counter("chunks_total").inc()
+
+    assert registry.save(str(tmp_path / "metrics.json"))
+    assert registry.save(str(tmp_path / "metrics.prom"))
+    assert not registry.save(str(tmp_path / "missing" / "metrics.json"))
+
+    saved = json.loads((tmp_path / "metrics.json").read_text())
+    assert saved["chunks_total"]["value"] == 1
+    assert "chunks_total 1" in (tmp_path / "metrics.prom").read_text()
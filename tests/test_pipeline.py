@@ -0,0 +1,209 @@
+import time
+import threading
+import pytest
+import numpy as np
+from src.pipeline import Pipeline, IngestionPipeline, iter_batches
+from src.embedding_creation import EmbeddingCreator
+from src.document_retrieval import DocumentRetriever
+from src.word_vectors import WordVectorTable
+
+
+def test_iter_batches():
+    """Test that items are grouped into batches of the requested size."""
+    assert list(iter_batches(range(7), 3)) == [[0, 1, 2], [3, 4, 5], [6]]
+    assert list(iter_batches([], 3)) == []
+
+
+@pytest.mark.asyncio
+async def test_pipeline_runs_stages_in_order():
+    """Test that items pass through every stage in order and None drops an item."""
+    results = []
+    pipeline = (
+        Pipeline(queue_size=2)
+        .add_stage("double", lambda x: 2 * x)
+        .add_stage("drop_six", lambda x: None if x == 6 else x)
+        .add_stage("collect", lambda x: results.append(x) or x)
+    )
+
+    count = await pipeline.run(range(5))
+
+    assert results == [0, 2, 4, 8]
+    assert count == 4
+    assert set(pipeline.busy_times) == {"source", "double", "drop_six", "collect"}
+
+
+@pytest.mark.asyncio
+async def test_pipeline_overlaps_stages():
+    """Test that the wall time approaches the slowest stage, not the sum of stages."""
+    delay, num_items = 0.05, 6
+
+    def slow(x):
+        time.sleep(delay)
+        return x
+
+    pipeline = Pipeline().add_stage("a", slow).add_stage("b", slow).add_stage("c", slow)
+
+    count = await pipeline.run(range(num_items))
+
+    assert count == num_items
+    assert pipeline.wall_time < 0.7 * 3 * delay * num_items
+
+
+@pytest.mark.asyncio
+async def test_pipeline_applies_backpressure():
+    """Test that a slow stage stops the source from running far ahead."""
+    produced, consumed, lead = [0], [0], []
+    lock = threading.Lock()
+
+    def source():
+        for i in range(30):
+            with lock:
+                produced[0] += 1
+                lead.append(produced[0] - consumed[0])
+            yield i
+
+    def slow_sink(x):
+        time.sleep(0.005)
+        with lock:
+            consumed[0] += 1
+        return x
+
+    pipeline = Pipeline(queue_size=1).add_stage("fast", lambda x: x)
+    pipeline.add_stage("slow", slow_sink)
+
+    assert await pipeline.run(source()) == 30
+    # At most one item per queue, one per stage and one being produced
+    assert max(lead) <= 5
+
+
+@pytest.mark.asyncio
+async def test_pipeline_propagates_errors():
+    """Test that an exception in a stage stops the pipeline and is raised."""
+
+    def fail(x):
+        if x == 3:
+            raise ValueError("bad item")
+        return x
+
+    pipeline = Pipeline(queue_size=1).add_stage("fail", fail).add_stage("id", str)
+
+    with pytest.raises(ValueError, match="bad item"):
+        await pipeline.run(range(100))
+
+
+@pytest.fixture
+def embedding_creator(tmp_path):
+    """EmbeddingCreator with a small in-memory word vector table."""
+    creator = EmbeddingCreator(cache_dir=str(tmp_path), use_cache=False)
+    creator.model = WordVectorTable(
+        ["alpha", "beta", "gamma", "delta"],
+        np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 0.0, 1.0], [1.0, 1.0, 0.0]]),
+    )
+    creator.vector_size = 3
+    return creator
+
+
+@pytest.fixture
+def chunks():
+    """Chunks spread over several batches."""
+    words = ["alpha", "beta", "gamma", "delta"]
+    return [
+        {"id": f"para-{i}", "text": f"{words[i % 4]} {words[(i // 4) % 4]}"}
+        for i in range(20)
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("backend", ["exact", "ivf"])
+async def test_ingestion_matches_direct_build(embedding_creator, chunks, backend):
+    """Test that batched ingestion indexes every chunk like a one-shot build."""
+    params = {"nlist": 2, "nprobe": 2} if backend == "ivf" else None
+    retriever = await IngestionPipeline(
+        embedding_creator,
+        batch_size=6,
+        queue_size=1,
+        backend=backend,
+        index_params=params,
+        sparse_index=True,
+    ).run(iter(chunks))
+    expected = DocumentRetriever(
+        embedding_creator.create_embeddings(chunks),
+        chunks,
+        backend=backend,
+        index_params=params,
+    )
+    query = np.array([1.0, 0.2, 0.0])
+
+    try:
+        assert len(retriever.index) == len(chunks)
+        assert set(retriever.chunks) == {chunk["id"] for chunk in chunks}
+        assert len(retriever.sparse_index) == len(chunks)
+        got = retriever.retrieve_documents(query, top_k=5)
+        want = expected.retrieve_documents(query, top_k=5)
+        assert np.allclose(
+            [r["similarity"] for r in got], [r["similarity"] for r in want]
+        )
+    finally:
+        retriever.close()
+        expected.close()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("quantization", ["int8", "pq"])
+async def test_ingestion_trains_quantizer_on_all_batches(
+    embedding_creator, chunks, quantization
+):
+    """Test that a quantized index is trained on the whole corpus, not the first batch."""
+    params = {"quantization": quantization}
+    retriever = await IngestionPipeline(
+        embedding_creator,
+        batch_size=4,
+        queue_size=1,
+        backend="quantized",
+        index_params=params,
+    ).run(iter(chunks))
+    expected = DocumentRetriever(
+        embedding_creator.create_embeddings(chunks),
+        chunks,
+        backend="quantized",
+        index_params=params,
+    )
+
+    try:
+        assert len(retriever.index) == len(chunks)
+        assert np.array_equal(retriever.index.codes, expected.index.codes)
+    finally:
+        retriever.close()
+        expected.close()
+
+
+@pytest.mark.asyncio
+async def test_ingestion_embeds_small_batches_in_worker_pool(embedding_creator, chunks):
+    """Test that every batch is embedded in the process pool, however small."""
+    embedding_creator.num_processes = 2
+    try:
+        retriever = await IngestionPipeline(
+            embedding_creator, batch_size=4, queue_size=1
+        ).run(iter(chunks))
+        assert embedding_creator._pool is not None
+    finally:
+        embedding_creator.close()
+    expected = DocumentRetriever(embedding_creator.create_embeddings(chunks), chunks)
+    query = np.array([1.0, 0.2, 0.0])
+
+    try:
+        assert len(retriever.index) == len(chunks)
+        got = retriever.retrieve_documents(query, top_k=5)
+        want = expected.retrieve_documents(query, top_k=5)
+        assert np.allclose(
+            [r["similarity"] for r in got], [r["similarity"] for r in want]
+        )
+    finally:
+        retriever.close()
+        expected.close()
+
+
+@pytest.mark.asyncio
+async def test_ingestion_of_empty_source(embedding_creator):
+    """Test that ingesting no chunks returns None."""
+    assert await IngestionPipeline(embedding_creator).run([]) is None
@@ -0,0 +1,29 @@
+import numpy as np
+from src.prune_vectors import build_pruned_table
+from src.word_vectors import WordVectorTable
+
+
+def test_build_pruned_table(tmp_path):
+    """Test that the pruned table holds the corpus words and points at the full table."""
+    full_dir, output_dir = str(tmp_path / "full"), str(tmp_path / "pruned")
+    WordVectorTable(
+        ["the", "cat", "dog", "fish"], np.arange(8, dtype=np.float32).reshape(4, 2)
+    ).save(full_dir)
+
+    table = build_pruned_table(
+        ["The dog chased the cat.", "A dog!"], full_dir, output_dir, float16=True
+    )
+
+    loaded = WordVectorTable.load(output_dir)
+    assert table.words == loaded.words == ["the", "dog", "cat"]
+    assert loaded.vectors.dtype == np.float16
+    assert np.array_equal(loaded["dog"], [4.0, 5.0])
+    assert loaded.fallback_dir == full_dir
+
+
+def test_build_pruned_table_missing_source(tmp_path):
+    """Test that a missing full table is reported as a failure."""
+    assert (
+        build_pruned_table(["text"], str(tmp_path / "missing"), str(tmp_path / "out"))
+        is None
+    )
@@ -0,0 +1,167 @@
+import pytest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src import vector_index
+from src.quantization import (
+    QuantizedIndex,
+    Int8Quantizer,
+    ProductQuantizer,
+    Float16Quantizer,
+)
+from src.vector_index import VectorIndex, normalize_rows
+
+
+@pytest.fixture
+def clustered_embeddings():
+    """Embeddings drawn around a few well separated centers."""
+    rng = np.random.default_rng(0)
+    centers = rng.normal(size=(20, 16))
+    vectors = centers[rng.integers(0, 20, 1500)] + 0.3 * rng.normal(size=(1500, 16))
+    return {f"para-{i}": vector for i, vector in enumerate(vectors)}
+
+
+@pytest.fixture
+def queries():
+    """Random query embeddings."""
+    return np.random.default_rng(1).normal(size=(20, 16))
+
+
+def overlap(results, expected):
+    """Fraction of the expected IDs found in the results."""
+    found = sum(
+        len({i for i, _ in r} & {i for i, _ in e}) for r, e in zip(results, expected)
+    )
+    return found / sum(len(e) for e in expected)
+
+
+@pytest.mark.parametrize("quantizer", [Float16Quantizer(), Int8Quantizer()])
+def test_scalar_quantizer_scores_close_to_exact(quantizer):
+    """Test that float16 and int8 scores stay close to float32 inner products."""
+    rng = np.random.default_rng(2)
+    matrix = normalize_rows(rng.normal(size=(100, 12)))
+    query = normalize_rows(rng.normal(size=(1, 12)))[0]
+
+    quantizer.train(matrix)
+    scores = quantizer.scores(quantizer.encode(matrix), query)
+
+    assert np.allclose(scores, matrix @ query, atol=0.02)
+
+
+def test_int8_codes_use_full_range_per_dimension():
+    """Test that each dimension is scaled by its own largest absolute value."""
+    quantizer = Int8Quantizer()
+    matrix = np.array([[1.0, 0.005], [-0.25, -0.02]], dtype=np.float32)
+
+    quantizer.train(matrix)
+    codes = quantizer.encode(matrix)
+
+    assert codes.dtype == np.int8
+    assert codes.tolist() == [[127, 32], [-32, -127]]
+
+
+def test_product_quantizer_codes_and_adc():
+    """Test PQ code shape and that ADC equals scoring the reconstructed vectors."""
+    rng = np.random.default_rng(3)
+    matrix = normalize_rows(rng.normal(size=(300, 10)))
+    query = rng.normal(size=10).astype(np.float32)
+    quantizer = ProductQuantizer(num_subspaces=3, num_centroids=16)
+
+    quantizer.train(matrix)
+    codes = quantizer.encode(matrix)
+    reconstructed = np.hstack([quantizer.codebooks[s][codes[:, s]] for s in range(3)])[
+        :, :10
+    ]
+
+    assert codes.shape == (300, 3)
+    assert codes.dtype == np.uint8
+    assert np.allclose(quantizer.scores(codes, query), reconstructed @ query, atol=1e-5)
+
+
+@pytest.mark.parametrize(
+    "quantization, ratio, min_overlap",
+    [("float16", 2, 0.95), ("int8", 3.9, 0.9), ("pq", 4, 0.3)],
+)
+def test_quantized_index_memory_and_quality(
+    clustered_embeddings, queries, quantization, ratio, min_overlap
+):
+    """Test that each storage mode shrinks the index and keeps useful rankings."""
+    exact = VectorIndex(clustered_embeddings)
+    index = QuantizedIndex(clustered_embeddings, quantization=quantization)
+
+    results = index.search_batch(queries, top_k=10)
+
+    assert index.matrix is None
+    assert index.dim == 16
+    assert exact.matrix.nbytes / index.nbytes >= ratio
+    assert overlap(results, exact.search_batch(queries, top_k=10)) >= min_overlap
+
+
+def test_rerank_restores_exact_scores(clustered_embeddings, queries):
+    """Test that re-ranking a PQ shortlist returns exact similarities."""
+    exact = VectorIndex(clustered_embeddings)
+    index = QuantizedIndex(clustered_embeddings, quantization="pq", rerank=100)
+
+    results = index.search_batch(queries, top_k=5)
+    expected = exact.search_batch(queries, top_k=5)
+
+    assert overlap(results, expected) >= 0.95
+    for result, reference in zip(results[0], expected[0]):
+        if result[0] == reference[0]:
+            assert result[1] == pytest.approx(reference[1], abs=1e-5)
+    assert index.search(queries[0], top_k=5, rerank=0) != results[0]
+
+
+def test_unknown_quantization():
+    """Test that an unknown storage mode is rejected."""
+    with pytest.raises(ValueError):
+        QuantizedIndex({"a": np.ones(3)}, quantization="int4")
+
+
+def test_empty_quantized_index():
+    """Test that an empty index returns no results."""
+    assert QuantizedIndex({}, quantization="pq").search(np.ones(3)) == []
+
+
+@pytest.mark.parametrize("rerank", [0, 50])
+def test_add_remove_and_compact(clustered_embeddings, queries, rerank):
+    """Test that added rows are encoded with the trained quantizer and removed rows skipped."""
+    items = list(clustered_embeddings.items())
+    index = QuantizedIndex(dict(items[:1000]), quantization="int8", rerank=rerank)
+    scale = index.quantizer.scale.copy()
+
+    index.add(dict(items[1000:]))
+    index.remove([chunk_id for chunk_id, _ in items[:500]])
+    results = index.search_batch(queries, top_k=10)
+    compacted = index.compacted()
+
+    assert np.array_equal(index.quantizer.scale, scale)
+    assert index.codes.shape[0] == 1500
+    assert compacted.codes.shape[0] == len(compacted) == 1000
+    assert all(int(i.split("-")[1]) >= 500 for r in results for i, _ in r)
+    assert compacted.search_batch(queries, top_k=10) == results
+
+
+def test_add_to_empty_quantized_index(clustered_embeddings):
+    """Test that the first vectors added to an empty index train the quantizer."""
+    index = QuantizedIndex({}, quantization="pq", rerank=20, num_subspaces=4)
+
+    index.add(clustered_embeddings)
+
+    assert index.dim == 16
+    assert index.codes.shape == (1500, 4)
+    assert index.search(clustered_embeddings["para-7"], top_k=1)[0][0] == "para-7"
+
+
+@pytest.mark.parametrize("rerank", [0, 50])
+def test_search_parallel_matches_search(
+    monkeypatch, clustered_embeddings, queries, rerank
+):
+    """Test that sharded scans of the codes return the same results as search."""
+    monkeypatch.setattr(vector_index, "MIN_SHARD_ROWS", 100)
+    index = QuantizedIndex(clustered_embeddings, quantization="int8", rerank=rerank)
+
+    with ThreadPoolExecutor(max_workers=3) as executor:
+        results = [index.search_parallel(q, 5, executor, 3) for q in queries]
+
+    expected = [index.search(q, 5) for q in queries]
+    assert [[i for i, _ in r] for r in results] == [[i for i, _ in r] for r in expected]
@@ -0,0 +1,247 @@
+import pytest
+import json
+import asyncio
+import threading
+import numpy as np
+from unittest.mock import MagicMock
+from src.document_retrieval import DocumentRetriever
+from src.embedding_creation import EmbeddingCreator
+from src.server import RAGService, RAGServer, run_server
+from src.word_vectors import WordVectorTable
+
+
+class EchoTextProcessor:
+    """Text processor stand-in that copies the text through."""
+
+    async def process_chunks(self, chunks):
+        return [
+            {
+                "id": chunk["id"],
+                "original_text": chunk["text"],
+                "processed_text": chunk["text"].lower(),
+                "similarity": chunk["similarity"],
+            }
+            for chunk in chunks
+        ]
+
+    def close(self):
+        pass
+
+
+@pytest.fixture
+def service(tmp_path):
+    """RAGService over a tiny hand-built index."""
+    embedding_creator = EmbeddingCreator(cache_dir=str(tmp_path), use_cache=False)
+    embedding_creator.model = WordVectorTable(
+        ["cats", "dogs"], np.array([[1.0, 0.0], [0.0, 1.0]])
+    )
+    embedding_creator.vector_size = 2
+    chunks = [
+        {"id": "para-0", "text": "Cats purr."},
+        {"id": "para-1", "text": "Dogs bark."},
+    ]
+    retriever = DocumentRetriever(
+        {"para-0": np.array([1.0, 0.1]), "para-1": np.array([0.1, 1.0])}, chunks
+    )
+    return RAGService(embedding_creator, retriever, EchoTextProcessor(), top_k=1)
+
+
+async def send_request(port, request):
+    """Send a raw HTTP request and return status and JSON body."""
+    reader, writer = await asyncio.open_connection("127.0.0.1", port)
+    writer.write(request.encode("latin-1"))
+    await writer.drain()
+    response = await reader.read()
+    writer.close()
+    head, _, body = response.partition(b"\r\n\r\n")
+    return int(head.split()[1]), json.loads(body)
+
+
+@pytest.mark.asyncio
+async def test_answer_uses_resident_index(service):
+    """Test that the service answers from its resident index."""
+    result = await service.answer("dogs")
+
+    assert result["query"] == "dogs"
+    assert [r["id"] for r in result["results"]] == ["para-1"]
+    assert result["took_ms"] >= 0
+
+
+@pytest.mark.asyncio
+async def test_load_index_serves_saved_retriever(service, tmp_path):
+    """Test that a service can answer from a retriever saved to disk."""
+    service.document_retriever.save(str(tmp_path / "index"))
+    loaded = RAGService(
+        service.embedding_creator, text_processor=EchoTextProcessor(), top_k=1
+    )
+
+    assert loaded.load_index(str(tmp_path / "index")) is True
+    result = await loaded.answer("cats")
+
+    assert loaded.ready
+    assert [r["id"] for r in result["results"]] == ["para-0"]
+    assert result["results"][0]["original_text"] == "Cats purr."
+
+
+@pytest.mark.asyncio
+async def test_server_handles_concurrent_queries(service):
+    """Test GET and POST queries served concurrently over HTTP."""
+    server = RAGServer(service)
+    await server.start(port=0)
+    try:
+        get = "GET /query?q=cats&top_k=2 HTTP/1.1\r\nConnection: close\r\n\r\n"
+        body = json.dumps({"query": "dogs"})
+        post = (
+            "POST /query HTTP/1.1\r\nConnection: close\r\n"
+            f"Content-Length: {len(body)}\r\n\r\n{body}"
+        )
+
+        responses = await asyncio.gather(
+            *[send_request(server.port, get) for _ in range(5)],
+            send_request(server.port, post),
+        )
+    finally:
+        await server.close()
+
+    for status, payload in responses[:5]:
+        assert status == 200
+        assert [r["id"] for r in payload["results"]] == ["para-0", "para-1"]
+    assert responses[5][0] == 200
+    assert [r["id"] for r in responses[5][1]["results"]] == ["para-1"]
+
+
+@pytest.mark.asyncio
+async def test_server_error_responses(service):
+    """Test health, unknown path and missing query responses."""
+    server = RAGServer(service)
+    await server.start(port=0)
+    try:
+        health = await send_request(
+            server.port, "GET /health HTTP/1.1\r\nConnection: close\r\n\r\n"
+        )
+        missing = await send_request(
+            server.port, "GET /nope HTTP/1.1\r\nConnection: close\r\n\r\n"
+        )
+        no_query = await send_request(
+            server.port, "GET /query HTTP/1.1\r\nConnection: close\r\n\r\n"
+        )
+        not_objects = [
+            await send_request(
+                server.port,
+                "POST /query HTTP/1.1\r\nConnection: close\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n{body}",
+            )
+            for body in ("[]", '"q"')
+        ]
+        bad_params = [
+            await send_request(
+                server.port,
+                "POST /query HTTP/1.1\r\nConnection: close\r\n"
+                f"Content-Length: {len(body)}\r\n\r\n{body}",
+            )
+            for body in (
+                '{"query": 5}',
+                '{"query": "  "}',
+                '{"query": "cats", "top_k": [1]}',
+                '{"query": "cats", "top_k": -1}',
+                '{"query": "cats", "top_k": true}',
+            )
+        ]
+        bad_get = await send_request(
+            server.port,
+            "GET /query?q=cats&top_k=0 HTTP/1.1\r\nConnection: close\r\n\r\n",
+        )
+    finally:
+        await server.close()
+
+    assert health == (200, {"status": "ok"})
+    assert missing[0] == 404
+    assert no_query[0] == 400
+    assert [status for status, _ in not_objects] == [400, 400]
+    assert [status for status, _ in bad_params] == [400] * 5
+    assert bad_get[0] == 400
+
+
+@pytest.mark.asyncio
+async def test_health_reports_not_ready():
+    """Test that an unbuilt service reports itself as starting."""
+    server = RAGServer(RAGService(text_processor=MagicMock()))
+    status, payload = await server._dispatch("GET", "/health", b"")
+
+    assert status == 503
+    assert payload == {"status": "starting"}
+
+
+@pytest.mark.asyncio
+async def test_run_server_listens_while_loading(service, tmp_path, monkeypatch):
+    """Test that /health reports 503 until the index is loaded and shutdown closes the service."""
+    loaded = threading.Event()
+    closed = []
+
+    def load_index(self, path):
+        loaded.wait(timeout=10)
+        self.embedding_creator = service.embedding_creator
+        self.document_retriever = service.document_retriever
+        return True
+
+    monkeypatch.setattr(RAGService, "load_index", load_index)
+    monkeypatch.setattr(RAGService, "close", lambda self: closed.append(self))
+    socket_path = str(tmp_path / "rag.sock")
+
+    async def health():
+        reader, writer = await asyncio.open_unix_connection(socket_path)
+        writer.write(b"GET /health HTTP/1.1\r\nConnection: close\r\n\r\n")
+        response = await reader.read()
+        writer.close()
+        return int(response.split()[1])
+
+    task = asyncio.create_task(
+        run_server(
+            [],
+            index_path="saved",
+            unix_socket=socket_path,
+            text_processor=EchoTextProcessor(),
+        )
+    )
+    try:
+        while not (tmp_path / "rag.sock").exists():
+            await asyncio.sleep(0.01)
+        starting = await health()
+        loaded.set()
+        while await health() != 200:
+            await asyncio.sleep(0.01)
+    finally:
+        loaded.set()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    assert starting == 503
+    assert len(closed) == 1
+
+
+@pytest.mark.asyncio
+async def test_metrics_endpoint(service):
+    """Test that stage metrics are served as Prometheus text and JSON."""
+    server = RAGServer(service)
+    await server.start(port=0)
+    try:
+        await service.answer("cats")
+        reader, writer = await asyncio.open_connection("127.0.0.1", server.port)
+        writer.write(b"GET /metrics HTTP/1.1\r\nConnection: close\r\n\r\n")
+        await writer.drain()
+        response = await reader.read()
+        writer.close()
+        status, payload = await send_request(
+            server.port,
+            "GET /metrics?format=json HTTP/1.1\r\nConnection: close\r\n\r\n",
+        )
+    finally:
+        await server.close()
+
+    head, _, body = response.partition(b"\r\n\r\n")
+    assert b"Content-Type: text/plain" in head
+    assert b"# TYPE server_query_seconds histogram" in body
+    assert b"# TYPE retrieval_search_seconds histogram" in body
+    assert status == 200
+    assert payload["server_query_seconds"]["count"] >= 1
@@ -0,0 +1,120 @@
+import gc
+import os
+import pytest
+import numpy as np
+from src.sharded_index import ShardedIndex, SHARED_DIR
+from src.vector_index import VectorIndex
+
+
+@pytest.fixture
+def embeddings():
+    """Random embeddings for testing."""
+    rng = np.random.default_rng(0)
+    return {f"para-{i}": vector for i, vector in enumerate(rng.normal(size=(600, 8)))}
+
+
+@pytest.fixture
+def queries():
+    """Random query embeddings."""
+    return np.random.default_rng(1).normal(size=(5, 8))
+
+
+@pytest.fixture
+def sharded(embeddings):
+    """A sharded index small enough shards to use three worker processes."""
+    index = ShardedIndex(embeddings, num_shards=3, min_shard_rows=100)
+    yield index
+    index.close()
+
+
+def ranked_ids(results):
+    """Chunk IDs of each result list."""
+    return [[chunk_id for chunk_id, _ in result] for result in results]
+
+
+def shared_files():
+    """Files currently backing shared arrays."""
+    return {f for f in os.listdir(SHARED_DIR) if f.startswith("rag-shard-")}
+
+
+def test_matches_exact_search(sharded, embeddings, queries):
+    """Test that merging per-shard top-k gives the exact results."""
+    exact = VectorIndex(embeddings)
+
+    results = sharded.search_batch(queries, top_k=10)
+
+    assert sharded._pool is not None
+    assert isinstance(sharded.matrix, np.memmap)
+    assert ranked_ids(results) == ranked_ids(exact.search_batch(queries, top_k=10))
+    assert np.allclose(
+        [score for _, score in results[0]],
+        [score for _, score in exact.search(queries[0], top_k=10)],
+    )
+    assert ranked_ids([sharded.search(queries[0], top_k=10)]) == ranked_ids(results[:1])
+
+
+def test_workers_see_added_and_removed_rows(sharded, embeddings, queries):
+    """Test that appends and tombstones written after the pool started reach the workers."""
+    exact = VectorIndex(embeddings)
+    sharded.search_batch(queries)
+    removed = [f"para-{i}" for i in range(0, 600, 2)]
+    added = {"para-new": queries[0]}
+
+    for index in (sharded, exact):
+        index.remove(removed)
+        index.add(added)
+    results = sharded.search_batch(queries, top_k=10)
+
+    assert results[0][0] == ("para-new", pytest.approx(1.0))
+    assert not set(removed) & {i for result in ranked_ids(results) for i in result}
+    assert ranked_ids(results) == ranked_ids(exact.search_batch(queries, top_k=10))
+    assert ranked_ids(sharded.compacted().search_batch(queries, top_k=10)) == (
+        ranked_ids(results)
+    )
+
+
+def test_small_index_is_searched_locally(embeddings, queries):
+    """Test that an index below min_shard_rows per shard never starts a pool."""
+    index = ShardedIndex(embeddings, num_shards=4)
+
+    results = index.search_batch(queries, top_k=3)
+
+    assert index._pool is None
+    assert ranked_ids(results) == ranked_ids(
+        VectorIndex(embeddings).search_batch(queries, top_k=3)
+    )
+    assert ShardedIndex({}).search(queries[0]) == []
+
+
+def test_load_keeps_saved_num_shards(sharded, tmp_path):
+    """Test that a loaded index keeps its shard count unless the caller overrides it."""
+    sharded.save(str(tmp_path))
+
+    loaded = ShardedIndex.load(str(tmp_path))
+    overridden = ShardedIndex.load(str(tmp_path), params={"num_shards": 2})
+    try:
+        assert loaded.num_shards == 3
+        assert loaded.min_shard_rows == 100
+        assert overridden.num_shards == 2
+        assert (
+            ShardedIndex.load(str(tmp_path), params={"num_shards": None}).num_shards
+            == 3
+        )
+    finally:
+        loaded.close()
+        overridden.close()
+
+
+def test_shared_files_are_removed(embeddings):
+    """Test that the files behind shared arrays are deleted with the index."""
+    before = shared_files()
+    index = ShardedIndex(embeddings, num_shards=2, min_shard_rows=100)
+    index.remove(["para-0"])
+
+    created = shared_files() - before
+    index.close()
+    del index
+    gc.collect()
+
+    assert len(created) == 2
+    assert not created & shared_files()
@@ -1,7 +1,17 @@
 import pytest
+import sys
+import time
+import subprocess
 import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
-from src.text_processing import TextProcessor
+from src.text_processing import (
+    TextProcessor,
+    ENGLISH_STOP_WORDS,
+    load_stop_words,
+    process_text,
+)
+from src.tokenizer import TokenCache
 
 
 @pytest.fixture
@@ -142,3 +152,94 @@ async def test_process_chunks_concurrent_execution():
 
     # Check that there were multiple tasks (indicating concurrent execution)
     assert len(set(call_times)) > 1
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("executor_type", ["thread", "process"])
+async def test_process_chunks_offloads_large_batches(executor_type):
+    """Test that large batches processed in an executor match inline processing."""
+    chunks = [
+        {"id": f"chunk-{i}", "text": f"The {i}th chunk, about words!", "similarity": i}
+        for i in range(10)
+    ]
+    chunks[3] = {"id": "chunk-3", "wrong_key": "This will cause an error"}
+    inline = await TextProcessor().process_chunks(chunks)
+
+    executor = ThreadPoolExecutor(max_workers=2) if executor_type == "thread" else None
+    processor = TextProcessor(executor=executor, min_offload_chunks=4)
+    try:
+        results = await processor.process_chunks(chunks)
+    finally:
+        processor.close()
+        if executor is not None:
+            executor.shutdown()
+
+    assert results == inline
+    assert results[0]["processed_text"] == "chunk words"
+    assert results[3]["id"] == "chunk-3"
+    assert "error" in results[3]
+
+
+@pytest.mark.asyncio
+async def test_process_chunks_adds_no_fixed_latency():
+    """Test that processing a few chunks does not wait on anything."""
+    processor = TextProcessor()
+    chunks = [{"id": f"chunk-{i}", "text": "Short text"} for i in range(3)]
+    await processor.process_chunks(chunks)
+
+    start = time.perf_counter()
+    await processor.process_chunks(chunks)
+
+    assert time.perf_counter() - start < 0.01
+
+
+def test_import_defers_heavy_dependencies():
+    """Test that importing the pipeline modules does not load NLTK or gensim."""
+    code = (
+        "import sys; import src.text_processing, src.embedding_creation, "
+        "src.bm25_index; print(sorted({'nltk', 'gensim'} & set(sys.modules)))"
+    )
+    output = subprocess.run(
+        [sys.executable, "-c", code], capture_output=True, text=True, check=True
+    ).stdout
+
+    assert output.strip() == "[]"
+
+
+def test_process_text_keeps_word_tokenize_semantics():
+    """Test that short, long and numbered words are handled as with NLTK's word_tokenize."""
+    result = process_text(
+        {
+            "id": "para-0",
+            "text": "Internationalization of electroencephalography x C++ R AI, "
+            "the 0th e-mail. Don't stop!",
+        },
+        ENGLISH_STOP_WORDS,
+    )
+
+    assert result["processed_text"] == (
+        "internationalization electroencephalography x r ai stop"
+    )
+    assert result["token_count"] == 6
+
+
+def test_bundled_stop_words_match_nltk_list():
+    """Test that the bundled stopword list covers the common English stopwords."""
+    assert {"the", "and", "is", "a", "with", "don't"} <= ENGLISH_STOP_WORDS
+    assert len(ENGLISH_STOP_WORDS) == 179
+    assert "the" in load_stop_words()
+
+
+@pytest.mark.asyncio
+async def test_process_chunk_reuses_cached_tokens():
+    """Test that tokens cached for a chunk ID are reused while its text is unchanged."""
+    cache = TokenCache()
+    processor = TextProcessor(cache=cache)
+    chunk = {"id": "cached", "text": "Cached words here"}
+    cache.put("cached", chunk["text"], ["precomputed", "tokens"])
+
+    result = await processor.process_chunk(chunk)
+    changed = await processor.process_chunk({"id": "cached", "text": "New words"})
+
+    assert result["processed_text"] == "precomputed tokens"
+    assert changed["processed_text"] == "new words"
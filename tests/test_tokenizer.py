@@ -0,0 +1,50 @@
+import pytest
+from gensim.utils import simple_preprocess
+from src.tokenizer import TokenCache, tokenize
+
+
+@pytest.mark.parametrize(
+    "text",
+    [
+        "",
+        "This is the first paragraph.",
+        "Numbers 42 and 3rd place, snake_case _private names.",
+        "Ünïcödé, CAFÉ au lait and a supercalifragilisticword!",
+        "don't stop—mixed-up punctuation...",
+    ],
+)
+def test_tokenize_matches_simple_preprocess(text):
+    """Test that the tokenizer produces the same tokens as gensim's simple_preprocess."""
+    assert tokenize(text) == simple_preprocess(text)
+
+
+def test_cache_reuses_tokens_for_unchanged_text():
+    """Test that a chunk is tokenized once while its text does not change."""
+    cache = TokenCache()
+
+    first = cache.tokens("para-0", "Some cached words")
+    second = cache.tokens("para-0", "Some cached words")
+    changed = cache.tokens("para-0", "Different words")
+
+    assert first is second
+    assert first == ["some", "cached", "words"]
+    assert changed == ["different", "words"]
+    assert (cache.hits, cache.misses) == (1, 2)
+
+
+def test_cache_evicts_least_recently_used():
+    """Test that the cache keeps at most max_entries chunks."""
+    cache = TokenCache(max_entries=2)
+    cache.tokens("a", "alpha")
+    cache.tokens("b", "beta")
+    cache.tokens("a", "alpha")
+    cache.tokens("c", "gamma")
+
+    assert len(cache) == 2
+    assert cache.get("b", "beta") is None
+    assert cache.get("a", "alpha") == ["alpha"]
+
+    cache.discard("a")
+    assert cache.get("a", "alpha") is None
+    cache.clear()
+    assert len(cache) == 0
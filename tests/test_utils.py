@@ -3,7 +3,7 @@ import os
 import logging
 import tempfile
 from unittest.mock import patch, MagicMock
-from src.utils import setup_logging, format_time
+from src.utils import setup_logging, format_time, format_metrics
 
 
 def test_format_time_microseconds():
@@ -99,3 +99,25 @@ def test_setup_logging_file_creation():
 
         # Return to original directory
         os.chdir(current_dir)
+
+
+def test_format_metrics():
+    """Test that counters and timers are formatted one per line."""
+    snapshot = {
+        "chunks_total": {"type": "counter", "value": 12.0},
+        "search_seconds": {
+            "type": "histogram",
+            "count": 3,
+            "sum": 0.006,
+            "mean": 0.002,
+            "p50": 0.002,
+            "p95": 0.0025,
+            "p99": 0.003,
+        },
+        "unused_seconds": {"type": "histogram", "count": 0, "sum": 0.0, "mean": 0.0},
+    }
+
+    assert format_metrics(snapshot) == [
+        "chunks_total: 12",
+        "search_seconds: 3 calls, total 6.00 ms, p50 2.00 ms, p95 2.50 ms, p99 3.00 ms",
+    ]
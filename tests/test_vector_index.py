@@ -0,0 +1,182 @@
+import pytest
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+from src import vector_index
+from src.vector_index import (
+    VectorIndex,
+    merge_shard_results,
+    normalize_rows,
+    top_k_indices,
+)
+
+
+@pytest.fixture
+def sample_embeddings():
+    """Sample embeddings for testing."""
+    return {
+        "para-0": np.array([1.0, 0.0, 0.0]),
+        "para-1": np.array([0.0, 2.0, 0.0]),
+        "para-2": np.array([1.0, 1.0, 0.0]),
+        "para-3": np.zeros(3),
+    }
+
+
+def test_normalize_rows_handles_zero_rows():
+    """Test that zero rows stay zero instead of producing NaNs."""
+    matrix = normalize_rows(np.array([[3.0, 4.0], [0.0, 0.0]]))
+
+    assert matrix.dtype == np.float32
+    assert np.allclose(matrix, [[0.6, 0.8], [0.0, 0.0]])
+
+
+def test_top_k_indices_orders_best_first():
+    """Test that top_k_indices returns the highest scores in order."""
+    scores = np.array([0.1, 0.9, 0.5, 0.7, 0.3])
+
+    assert top_k_indices(scores, 3).tolist() == [1, 3, 2]
+    assert top_k_indices(scores, 10).tolist() == [1, 3, 2, 4, 0]
+    assert top_k_indices(scores, 0).tolist() == []
+
+
+def test_search_returns_ranked_ids(sample_embeddings):
+    """Test that search ranks chunk IDs by cosine similarity."""
+    index = VectorIndex(sample_embeddings)
+
+    results = index.search(np.array([1.0, 0.2, 0.0]), top_k=3)
+
+    assert [chunk_id for chunk_id, _ in results] == ["para-0", "para-2", "para-1"]
+    assert results[0][1] == pytest.approx(1.0 / np.sqrt(1.04), rel=1e-5)
+
+
+def test_search_zero_vector_scores_zero(sample_embeddings):
+    """Test that zero vectors score 0 rather than NaN."""
+    index = VectorIndex(sample_embeddings)
+
+    scores = index.scores(np.array([0.0, 0.0, 1.0]))
+
+    assert np.allclose(scores, 0.0)
+
+
+def test_empty_index():
+    """Test that an empty index returns no results."""
+    index = VectorIndex({})
+
+    assert len(index) == 0
+    assert index.search(np.array([0.1, 0.2]), top_k=3) == []
+
+
+def test_search_batch_matches_search_across_tiles():
+    """Test that tiled batch search returns the same results as single search."""
+    rng = np.random.default_rng(0)
+    embeddings = {f"para-{i}": rng.normal(size=8) for i in range(50)}
+    index = VectorIndex(embeddings)
+    queries = rng.normal(size=(7, 8))
+
+    batch_results = index.search_batch(queries, top_k=5, query_block=3, corpus_block=9)
+
+    assert len(batch_results) == 7
+    for query, results in zip(queries, batch_results):
+        expected = index.search(query, top_k=5)
+        assert [chunk_id for chunk_id, _ in results] == [
+            chunk_id for chunk_id, _ in expected
+        ]
+        assert np.allclose([s for _, s in results], [s for _, s in expected], atol=1e-6)
+
+
+def test_search_batch_top_k_larger_than_index(sample_embeddings):
+    """Test that batch search caps top_k at the index size."""
+    index = VectorIndex(sample_embeddings)
+
+    results = index.search_batch(np.eye(3), top_k=10)
+
+    assert [len(r) for r in results] == [4, 4, 4]
+    assert results[0][0][0] == "para-0"
+    assert results[1][0][0] == "para-1"
+
+
+def test_add_and_remove(sample_embeddings):
+    """Test that added vectors are searchable and removed ones are skipped."""
+    index = VectorIndex(sample_embeddings)
+
+    index.add({"para-4": np.array([0.0, 0.0, 5.0])})
+    removed = index.remove(["para-0", "para-9"])
+    results = index.search(np.array([1.0, 0.2, 1.0]), top_k=10)
+
+    assert removed == 1
+    assert len(index) == 4
+    assert [chunk_id for chunk_id, _ in results] == [
+        "para-4",
+        "para-2",
+        "para-1",
+        "para-3",
+    ]
+    assert index.search_batch(np.array([[1.0, 0.0, 0.0]]), top_k=10)[0] == (
+        index.search(np.array([1.0, 0.0, 0.0]), top_k=10)
+    )
+
+
+def test_add_replaces_existing_id(sample_embeddings):
+    """Test that adding an indexed ID replaces its vector."""
+    index = VectorIndex(sample_embeddings)
+
+    index.add({"para-0": np.array([0.0, 0.0, 1.0])})
+
+    assert len(index) == 4
+    assert index.search(np.array([0.0, 0.0, 1.0]), top_k=1)[0][0] == "para-0"
+    assert index.search(np.array([1.0, 0.0, 0.0]), top_k=1)[0][0] == "para-2"
+
+
+def test_add_grows_buffer_without_copying_rows():
+    """Test that repeated appends reuse the spare capacity of the matrix."""
+    index = VectorIndex({})
+
+    for i in range(40):
+        index.add({f"para-{i}": np.eye(40)[i]})
+
+    assert len(index) == 40
+    assert index.matrix.shape == (40, 40)
+    assert index.matrix.base is not None and len(index.matrix.base) == 64
+    assert index.search(np.eye(40)[17], top_k=1)[0][0] == "para-17"
+
+
+def test_compacted_drops_removed_rows(sample_embeddings):
+    """Test that compaction returns an equivalent index without tombstones."""
+    index = VectorIndex(sample_embeddings)
+    index.remove(["para-1", "para-3"])
+    query = np.array([1.0, 0.5, 0.0])
+
+    compacted = index.compacted()
+
+    assert index.needs_compaction(0.2)
+    assert not compacted.needs_compaction(0.2)
+    assert compacted.ids == ["para-0", "para-2"]
+    assert compacted.matrix.shape == (2, 3)
+    assert compacted.search(query, top_k=3) == index.search(query, top_k=3)
+    assert len(index.ids) == 4
+
+
+def test_merge_shard_results_keeps_best_in_shard_order():
+    """Test that merged shard results are the overall top-k, ties in shard order."""
+    shards = [[(0, 0.9), (1, 0.5)], [(5, 0.7), (6, 0.5)], []]
+
+    assert merge_shard_results(shards, 3) == [(0, 0.9), (5, 0.7), (1, 0.5)]
+
+
+def test_search_parallel_matches_search(monkeypatch):
+    """Test that sharded search returns the same results as a single scan."""
+    monkeypatch.setattr(vector_index, "MIN_SHARD_ROWS", 100)
+    rng = np.random.default_rng(0)
+    index = VectorIndex(
+        {f"para-{i}": v for i, v in enumerate(rng.normal(size=(1000, 8)))}
+    )
+    index.remove([f"para-{i}" for i in range(0, 1000, 3)])
+    queries = rng.normal(size=(5, 8))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        results = [index.search_parallel(q, 10, executor, 4) for q in queries]
+        small = [index.search_parallel(q, 10, executor, 1) for q in queries]
+
+    expected = [index.search(q, 10) for q in queries]
+    for result, reference in zip(results + small, expected + expected):
+        assert [i for i, _ in result] == [i for i, _ in reference]
+        assert np.allclose([s for _, s in result], [s for _, s in reference])
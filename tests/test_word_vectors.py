@@ -0,0 +1,111 @@
+import gzip
+import pytest
+import numpy as np
+from unittest.mock import MagicMock
+from src.word_vectors import WordVectorTable, count_words
+
+
+@pytest.fixture
+def table():
+    """Small word vector table for testing."""
+    return WordVectorTable(
+        ["cat", "dog", "fish"],
+        np.array([[1.0, 0.0], [0.0, 1.0], [0.5, 0.5]], dtype=np.float32),
+    )
+
+
+def test_lookup(table):
+    """Test vocabulary membership and vector lookup."""
+    assert "dog" in table
+    assert "bird" not in table
+    assert len(table) == 3
+    assert table.vector_size == 2
+    assert np.array_equal(table["fish"], [0.5, 0.5])
+
+
+def test_mismatched_sizes_raise():
+    """Test that vocabulary and vector counts must match."""
+    with pytest.raises(ValueError):
+        WordVectorTable(["cat"], np.zeros((2, 2)))
+
+
+def test_save_and_load_mmap(table, tmp_path):
+    """Test that a saved table loads back memory-mapped and unchanged."""
+    table.save(str(tmp_path))
+
+    loaded = WordVectorTable.load(str(tmp_path), mmap=True)
+
+    assert WordVectorTable.exists(str(tmp_path))
+    assert isinstance(loaded.vectors, np.memmap)
+    assert loaded.words == table.words
+    assert np.array_equal(loaded.vectors, table.vectors)
+
+
+def test_from_keyed_vectors():
+    """Test conversion from a gensim KeyedVectors-like object."""
+    keyed_vectors = MagicMock()
+    keyed_vectors.index_to_key = ["a", "b"]
+    keyed_vectors.vectors = np.array([[1.0, 2.0], [3.0, 4.0]])
+
+    table = WordVectorTable.from_keyed_vectors(keyed_vectors)
+
+    assert table.words == ["a", "b"]
+    assert table.vectors.dtype == np.float32
+    assert np.array_equal(table["b"], [3.0, 4.0])
+
+
+def test_from_text(tmp_path):
+    """Test reading GloVe and word2vec text files, plain and gzipped."""
+    glove_path = tmp_path / "glove.txt"
+    glove_path.write_text("cat 1.0 0.0\ndog 0.0 1.0\n")
+    word2vec_path = tmp_path / "word2vec.txt.gz"
+    with gzip.open(word2vec_path, "wt") as f:
+        f.write("2 2\ncat 1.0 0.0\ndog 0.0 1.0\n")
+
+    for path in (glove_path, word2vec_path):
+        table = WordVectorTable.from_text(str(path))
+        assert table.words == ["cat", "dog"]
+        assert table.vectors.dtype == np.float32
+        assert np.array_equal(table["dog"], [0.0, 1.0])
+
+
+def test_from_text_empty_file(tmp_path):
+    """Test that a file without vectors is rejected."""
+    path = tmp_path / "empty.txt"
+    path.write_text("")
+
+    with pytest.raises(ValueError):
+        WordVectorTable.from_text(str(path))
+
+
+def test_pruned_orders_by_frequency(table):
+    """Test that pruning keeps corpus words only, most frequent first."""
+    pruned = table.pruned({"fish": 5, "cat": 2, "bird": 9, "dog": 1}, min_count=2)
+
+    assert pruned.words == ["fish", "cat"]
+    assert np.array_equal(pruned["fish"], table["fish"])
+    assert np.array_equal(pruned["cat"], table["cat"])
+    assert pruned.fallback_dir is None
+
+
+def test_pruned_float16_round_trip(table, tmp_path):
+    """Test that a float16 pruned table is saved as float16 with its fallback directory."""
+    table.save(str(tmp_path / "full"))
+    pruned = table.pruned(
+        {"dog": 1, "cat": 1}, dtype=np.float16, fallback_dir=str(tmp_path / "full")
+    )
+    pruned.save(str(tmp_path / "pruned"))
+
+    loaded = WordVectorTable.load(str(tmp_path / "pruned"))
+
+    assert loaded.words == ["cat", "dog"]
+    assert loaded.vectors.dtype == np.float16
+    assert loaded.fallback_dir == str(tmp_path / "full")
+    assert WordVectorTable.load(str(tmp_path / "full")).fallback_dir is None
+
+
+def test_count_words():
+    """Test that corpus words are counted as the embedding stage tokenizes them."""
+    counts = count_words(["The cat, the dog.", "A cat!"])
+
+    assert counts == {"the": 2, "cat": 2, "dog": 1}